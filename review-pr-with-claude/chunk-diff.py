@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Split a large unified diff into chunks that can be reviewed separately.
+
+Files are kept together and packed, in diff order, into chunks whose
+estimated size stays within a token budget. Since git orders a diff by
+path, files from the same directory tend to land in the same chunk. A
+single file too large for the budget is split between hunks, with its
+file header repeated at the top of each piece.
+
+Usage:
+    chunk-diff.py <input.diff> <output_dir> [--token-budget N]
+
+Writes output_dir/chunk-001.diff, chunk-002.diff, ... and
+output_dir/files.txt (every file changed by the diff, one per line), then
+prints the number of chunks to stdout.
+
+Options:
+    --token-budget N    Approximate number of tokens per chunk
+                        (default: 60000).
+"""
+
+import re
+import sys
+from pathlib import Path
+
+
+DEFAULT_TOKEN_BUDGET = 60000
+
+# A rough but stable estimate: diffs of source code average about four
+# characters per token.
+CHARS_PER_TOKEN = 4
+
+DIFF_HEADER_RE = re.compile(r'^diff --git a/(.*) b/(.*)$')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a piece of text will use."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_files(diff: str) -> list[tuple[str, str]]:
+    """Split a unified diff into (path, section) pairs, one per file.
+
+    Any preamble before the first file header is dropped.
+    """
+    sections: list[tuple[str, str]] = []
+    path = None
+    lines: list[str] = []
+    for line in diff.splitlines(keepends=True):
+        m = DIFF_HEADER_RE.match(line.rstrip('\n'))
+        if m:
+            if path is not None:
+                sections.append((path, ''.join(lines)))
+            path = m.group(2)
+            lines = []
+        if path is not None:
+            lines.append(line)
+    if path is not None:
+        sections.append((path, ''.join(lines)))
+    return sections
+
+
+def split_hunks(section: str, token_budget: int) -> list[str]:
+    """Split one file's section between hunks to fit the token budget.
+
+    Each piece starts with the file header (everything before the first
+    hunk). A single hunk larger than the budget is left whole.
+    """
+    lines = section.splitlines(keepends=True)
+    first_hunk = next(
+        (i for i, line in enumerate(lines) if line.startswith('@@')), None)
+    if first_hunk is None:
+        return [section]
+
+    header = ''.join(lines[:first_hunk])
+    hunks: list[str] = []
+    for line in lines[first_hunk:]:
+        if line.startswith('@@'):
+            hunks.append(line)
+        else:
+            hunks[-1] += line
+
+    pieces: list[str] = []
+    current = ''
+    for hunk in hunks:
+        if current and estimate_tokens(header + current + hunk) > token_budget:
+            pieces.append(header + current)
+            current = ''
+        current += hunk
+    pieces.append(header + current)
+    return pieces
+
+
+def chunk_diff(diff: str, token_budget: int) -> list[str]:
+    """Pack a diff's file sections into chunks within the token budget."""
+    chunks: list[str] = []
+    current = ''
+    for _, section in split_files(diff):
+        if estimate_tokens(section) > token_budget:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.extend(split_hunks(section, token_budget))
+            continue
+
+        if current and estimate_tokens(current + section) > token_budget:
+            chunks.append(current)
+            current = ''
+        current += section
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    token_budget = DEFAULT_TOKEN_BUDGET
+    if '--token-budget' in args:
+        budget_idx = args.index('--token-budget')
+        token_budget = int(args[budget_idx + 1])
+        del args[budget_idx:budget_idx + 2]
+
+    if len(args) != 2 or token_budget < 1:
+        print(__doc__)
+        sys.exit(1)
+
+    input_path = Path(args[0])
+    output_dir = Path(args[1])
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    diff = input_path.read_text(encoding='utf-8', errors='replace')
+    chunks = chunk_diff(diff, token_budget)
+    for i, chunk in enumerate(chunks, 1):
+        (output_dir / f'chunk-{i:03d}.diff').write_text(
+            chunk, encoding='utf-8')
+
+    files = [path for path, _ in split_files(diff)]
+    (output_dir / 'files.txt').write_text(
+        ''.join(f'{path}\n' for path in files), encoding='utf-8')
+
+    print(len(chunks))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,23 +7,75 @@ so they auto-close when the PR merges.
 
 Usage:
     create-review-issues.py <input.json> <output.json> --pr NUMBER
+        [--batch [--concurrency N]] [--no-dedupe]
 
 The output JSON is the same as input but with 'issue_number' and 'issue_url'
 fields added to each actionable item.
 
+Each issue body carries a fingerprint of its item (normalised title, file
+and category). Before filing anything, the repository's open automated
+review issues are listed once and those filed for the same PR are indexed
+by fingerprint; an item whose fingerprint matches one of them (for example
+when a PR is re-reviewed with force) is linked to that issue instead of
+filing a duplicate. Issues from other PRs are never reused, as each says
+it closes when its own PR merges. Items in the same review which share a
+fingerprint share one issue.
+
+Options:
+    --batch          Create the issues through the GitHub REST API with a
+                     small pool of keep-alive connections, instead of
+                     running one `gh issue create` per item in turn. Rate
+                     limit responses pause every worker and are retried.
+    --concurrency N  Number of issues to create at once with --batch
+                     (default: 4).
+    --no-dedupe      Do not look for matching open issues; file an issue
+                     for every actionable item without one.
+
 Environment:
     GITHUB_REPOSITORY: Repository in owner/repo format
     GH_TOKEN or GITHUB_TOKEN: GitHub token for API access
+    GITHUB_API_URL: GitHub API base URL (default: https://api.github.com)
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+import hashlib
+import http.client
 import json
 import os
+import re
 import subprocess
 import sys
+import threading
+import time
+import urllib.parse
 from pathlib import Path
 from typing import Any
 
 
+DEFAULT_API_URL = 'https://api.github.com'
+DEFAULT_CONCURRENCY = 4
+
+# Retry and backoff limits for rate limited API requests. GitHub asks
+# clients hitting a secondary rate limit without a Retry-After header to
+# wait at least a minute, then back off exponentially.
+MAX_RETRIES = 5
+SECONDARY_RATE_LIMIT_WAIT = 60
+MAX_RATE_LIMIT_WAIT = 900
+
+# Methods that are safe to resend when the connection fails after the
+# request may already have reached GitHub. Resending a POST could create
+# a duplicate issue.
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE'})
+
+# Hidden marker carrying an item's fingerprint in the issue body.
+FINGERPRINT_MARKER = '<!-- review-fingerprint: {} -->'
+FINGERPRINT_MARKER_RE = re.compile(r'<!-- review-fingerprint: ([0-9a-f]+) -->')
+
+# The first line of every issue body, naming the PR it was filed for.
+PR_MARKER_RE = re.compile(r'^\*\*From automated review of PR #(\d+)\*\*')
+
+
 def create_issue(
     repo: str,
     title: str,
@@ -66,6 +118,280 @@ def create_issue(
         return None
 
 
+class GitHubClient:
+    """A minimal pooled GitHub REST API client.
+
+    Each worker thread keeps its own keep-alive HTTPS connection, so every
+    request after a thread's first skips the TCP and TLS handshakes. When
+    any request is rate limited every worker pauses until the limit is
+    expected to lift, rather than each one discovering it separately.
+    """
+
+    def __init__(self, token: str, api_url: str = DEFAULT_API_URL):
+        parsed = urllib.parse.urlsplit(api_url)
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip('/')
+        self.token = token
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def _connection(self) -> http.client.HTTPSConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPSConnection(
+                self.host, self.port, timeout=60)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def _pause_all(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _wait_if_paused(self) -> None:
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def request(
+        self, method: str, path: str, payload: Any = None
+    ) -> tuple[int, Any]:
+        """Make an API request and return (status, decoded JSON body).
+
+        Rate limited requests are retried after the delay GitHub asks
+        for. If the connection fails, it is dropped and the request is
+        retried once on a fresh connection, but only when GitHub cannot
+        have acted on it: either sending failed (a kept-alive connection
+        that had been closed), or the method is idempotent. Other failures,
+        such as a POST that timed out waiting for its response, are raised
+        to the caller.
+        """
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {
+            'Accept': 'application/vnd.github+json',
+            'Authorization': f'Bearer {self.token}',
+            'User-Agent': 'shakenfist-create-review-issues',
+            'X-GitHub-Api-Version': '2022-11-28',
+        }
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+
+        reconnected = False
+        attempt = 0
+        while True:
+            self._wait_if_paused()
+            conn = self._connection()
+            sent = False
+            try:
+                conn.request(method, self.base_path + path, body=body,
+                             headers=headers)
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError, TimeoutError):
+                self._drop_connection()
+                if reconnected or (sent and method not in IDEMPOTENT_METHODS):
+                    raise
+                reconnected = True
+                continue
+
+            if response.getheader('Connection', '').lower() == 'close':
+                self._drop_connection()
+
+            try:
+                decoded = json.loads(data) if data else {}
+            except json.JSONDecodeError:
+                decoded = {'message': data.decode('utf-8', 'replace')}
+
+            delay = rate_limit_delay(response.status, response.headers,
+                                     decoded, attempt)
+            if delay is None or attempt >= MAX_RETRIES:
+                return response.status, decoded
+
+            attempt += 1
+            print(f'Rate limited by GitHub, retrying in {delay:.0f}s '
+                  f'(attempt {attempt} of {MAX_RETRIES})', file=sys.stderr)
+            self._pause_all(delay)
+
+
+def rate_limit_delay(
+    status: int, headers: Any, decoded: Any, attempt: int
+) -> float | None:
+    """Return how long to wait before retrying, or None if not rate limited.
+
+    Honours Retry-After, then x-ratelimit-reset when the primary limit is
+    exhausted, and otherwise falls back to exponential backoff for
+    secondary rate limits.
+    """
+    if status not in (403, 429):
+        return None
+
+    retry_after = headers.get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), MAX_RATE_LIMIT_WAIT)
+
+    if headers.get('x-ratelimit-remaining') == '0':
+        reset = headers.get('x-ratelimit-reset', '')
+        if reset.isdigit():
+            return min(max(int(reset) - time.time(), 0) + 1,
+                       MAX_RATE_LIMIT_WAIT)
+
+    message = decoded.get('message', '') if isinstance(decoded, dict) else ''
+    if status == 429 or 'rate limit' in message.lower():
+        return min(SECONDARY_RATE_LIMIT_WAIT * 2 ** attempt,
+                   MAX_RATE_LIMIT_WAIT)
+    return None
+
+
+def create_issue_via_api(
+    client: GitHubClient,
+    repo: str,
+    title: str,
+    body: str,
+    labels: list[str]
+) -> tuple[int, str] | None:
+    """Create a GitHub issue through the REST API.
+
+    Returns (issue_number, issue_url) like create_issue, or None if issue
+    creation fails.
+    """
+    try:
+        status, response = client.request(
+            'POST', f'/repos/{repo}/issues',
+            {'title': title, 'body': body, 'labels': labels})
+    except (http.client.HTTPException, OSError) as e:
+        print(f'Warning: Failed to create issue: {e}', file=sys.stderr)
+        return None
+
+    if status != 201:
+        message = response.get('message') if isinstance(response, dict) else response
+        print(f'Warning: Failed to create issue: HTTP {status}: {message}',
+              file=sys.stderr)
+        return None
+
+    try:
+        return int(response['number']), response['html_url']
+    except (KeyError, TypeError, ValueError) as e:
+        print(f'Warning: Failed to parse issue response: {e}', file=sys.stderr)
+        return None
+
+
+def create_issues_batched(
+    repo: str,
+    pending: list[tuple[dict[str, Any], str, str, list[str]]],
+    concurrency: int
+) -> dict[int, tuple[int, str] | None]:
+    """Create issues for (item, title, body, labels) tuples concurrently.
+
+    Returns a dict mapping the index of each pending entry to its
+    create_issue_via_api result.
+    """
+    token = os.environ.get('GH_TOKEN') or os.environ.get('GITHUB_TOKEN')
+    if not token:
+        print('Error: GH_TOKEN or GITHUB_TOKEN must be set for --batch',
+              file=sys.stderr)
+        sys.exit(1)
+
+    client = GitHubClient(
+        token, os.environ.get('GITHUB_API_URL') or DEFAULT_API_URL)
+
+    results: dict[int, tuple[int, str] | None] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(create_issue_via_api, client, repo, title, body,
+                            labels): i
+            for i, (_, title, body, labels) in enumerate(pending)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def normalise_title(title: str) -> str:
+    """Normalise an item title so trivial rewording does not matter.
+
+    Case, punctuation and whitespace differences are dropped.
+    """
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', title.lower()).split())
+
+
+def item_fingerprint(item: dict[str, Any]) -> str:
+    """Return a stable fingerprint for a review item.
+
+    Hashes the normalised title, the file from the location (without line
+    numbers, which move between revisions of a PR) and the category.
+    """
+    location = item.get('location') or ''
+    path = location.split(':', 1)[0].strip()
+    parts = (normalise_title(item.get('title', '')), path,
+             item.get('category', ''))
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def load_fingerprint_index(
+    repo: str, pr_number: int
+) -> dict[str, tuple[int, str]]:
+    """Index a PR's open automated review issues by fingerprint.
+
+    Lists every open issue labelled automated-review with one paginated
+    API call and returns {fingerprint: (issue_number, issue_url)} for the
+    [FIX] and [DOC] issues filed for pr_number which carry a fingerprint
+    marker. Issues filed for other PRs are left out, since their bodies
+    say they close when that other PR merges. Returns an
+    empty index if the listing fails, so issue creation carries on without
+    deduplication.
+    """
+    cmd = [
+        'gh', 'api', '--paginate',
+        f'repos/{repo}/issues?state=open&labels=automated-review&per_page=100',
+        '--jq', '.[] | select(.pull_request == null) | '
+                '{number, title, body, html_url}',
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f'Warning: Failed to list open issues: {e.stderr}',
+              file=sys.stderr)
+        return {}
+
+    index: dict[str, tuple[int, str]] = {}
+    for line in result.stdout.splitlines():
+        if not line.strip():
+            continue
+        try:
+            issue = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not issue['title'].startswith(('[FIX]', '[DOC]')):
+            continue
+        body = issue.get('body') or ''
+        m = PR_MARKER_RE.match(body)
+        if not m or int(m.group(1)) != pr_number:
+            continue
+        m = FINGERPRINT_MARKER_RE.search(body)
+        if m:
+            # Keep the oldest issue if there are already duplicates
+            fingerprint = m.group(1)
+            if (fingerprint not in index
+                    or issue['number'] < index[fingerprint][0]):
+                index[fingerprint] = (issue['number'], issue['html_url'])
+    return index
+
+
 def build_issue_body(item: dict[str, Any], pr_number: int) -> str:
     """Build the issue body from a review item."""
     lines = []
@@ -95,6 +421,8 @@ def build_issue_body(item: dict[str, Any], pr_number: int) -> str:
                  'is merged.*')
     lines.append('')
     lines.append(f'Closes #{pr_number} addresses this issue.')
+    lines.append('')
+    lines.append(FINGERPRINT_MARKER.format(item_fingerprint(item)))
 
     return '\n'.join(lines)
 
@@ -134,6 +462,16 @@ def main() -> None:
     pr_idx = sys.argv.index('--pr')
     pr_number = int(sys.argv[pr_idx + 1])
 
+    batch = '--batch' in sys.argv
+    dedupe = '--no-dedupe' not in sys.argv
+    concurrency = DEFAULT_CONCURRENCY
+    if '--concurrency' in sys.argv:
+        concurrency_idx = sys.argv.index('--concurrency')
+        concurrency = int(sys.argv[concurrency_idx + 1])
+        if concurrency < 1:
+            print('Error: --concurrency must be at least 1', file=sys.stderr)
+            sys.exit(1)
+
     # Get repository from environment
     repo = os.environ.get('GITHUB_REPOSITORY')
     if not repo:
@@ -145,10 +483,12 @@ def main() -> None:
     with open(input_path) as f:
         review_data = json.load(f)
 
-    # Track created issues
+    # Track created and linked issues
     issues_created = 0
+    issues_linked = 0
 
-    # Process each item
+    # Work out which items need an issue
+    candidates = []
     for item in review_data.get('items', []):
         action = item.get('action', 'none')
 
@@ -171,24 +511,73 @@ def main() -> None:
 
         body = build_issue_body(item, pr_number)
         labels = get_labels_for_item(item)
+        candidates.append((item, title, body, labels))
+
+    # Link items to matching open issues rather than filing them again.
+    # Only the first item with a given fingerprint is filed; the rest are
+    # linked to whatever issue it ends up with.
+    fingerprints: dict[str, tuple[int, str]] = {}
+    if dedupe and candidates:
+        fingerprints = load_fingerprint_index(repo, pr_number)
+        print(f'Found {len(fingerprints)} open review issues for PR #{pr_number} '
+              'to match against')
+
+    pending = []
+    duplicates = []
+    seen = set()
+    for candidate in candidates:
+        item = candidate[0]
+        fingerprint = item_fingerprint(item)
+        if not dedupe:
+            pending.append(candidate)
+        elif fingerprint in fingerprints:
+            issue_number, issue_url = fingerprints[fingerprint]
+            item['issue_number'] = issue_number
+            item['issue_url'] = issue_url
+            issues_linked += 1
+            print(f'Item {item["id"]}: Matches open issue #{issue_number}')
+        elif fingerprint in seen:
+            duplicates.append(item)
+        else:
+            seen.add(fingerprint)
+            pending.append(candidate)
 
-        print(f'Creating issue for item {item["id"]}: {item["title"]}...')
+    if batch and pending:
+        print(f'Creating {len(pending)} issues, {concurrency} at a time...')
+        results = create_issues_batched(repo, pending, concurrency)
+
+    for i, (item, title, body, labels) in enumerate(pending):
+        if batch:
+            print(f'Issue for item {item["id"]}: {item["title"]}...')
+            result = results[i]
+        else:
+            print(f'Creating issue for item {item["id"]}: {item["title"]}...')
+            result = create_issue(repo, title, body, labels, pr_number)
 
-        result = create_issue(repo, title, body, labels, pr_number)
         if result:
             issue_number, issue_url = result
             item['issue_number'] = issue_number
             item['issue_url'] = issue_url
             issues_created += 1
+            fingerprints[item_fingerprint(item)] = result
             print(f'  Created issue #{issue_number}: {issue_url}')
         else:
             print(f'  Failed to create issue')
 
+    for item in duplicates:
+        result = fingerprints.get(item_fingerprint(item))
+        if result:
+            item['issue_number'], item['issue_url'] = result
+            issues_linked += 1
+            print(f'Item {item["id"]}: Shares issue #{result[0]} with an '
+                  'earlier item')
+
     # Save updated JSON
     with open(output_path, 'w') as f:
         json.dump(review_data, f, indent=2)
 
-    print(f'\nCreated {issues_created} issues')
+    print(f'\nCreated {issues_created} issues, linked {issues_linked} '
+          'to existing issues')
     print(f'Updated review JSON saved to {output_path}')
 
 
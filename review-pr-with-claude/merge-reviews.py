@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Merge the reviews of separately reviewed diff chunks into one review.
+
+Large PRs are split by chunk-diff.py and each chunk is reviewed on its own.
+This script combines the per-chunk review JSON into a single review in the
+format described by review-schema.json, so the rest of the pipeline (issue
+creation, rendering) does not need to know the review was chunked.
+
+It also carries items forward into an incremental review, which only
+covers the commits pushed since an earlier review.
+
+Usage:
+    merge-reviews.py <output.json> <chunk-review.json> [...]
+        [--chunk-diff <chunk.diff> ...]
+        [--prior <prior-review.json> --open-issues N,N,...]
+
+Each chunk review is validated with render-review.py's validation before
+it is merged; missing or invalid chunk reviews are reported and left out,
+and the merged summary says which parts of the diff went unreviewed. Items
+are renumbered in chunk order, positive feedback is de-duplicated by title,
+and test coverage is only adequate if every chunk says so. Exits non-zero
+if no chunk review is usable.
+
+Options:
+    --chunk-diff FILE   The diff chunk a review covers, given once per
+                        chunk review and in the same order. Used to list the
+                        files of any chunk which could not be reviewed.
+    --prior FILE        An earlier review of the same PR (as extracted by
+                        prior-review.py). Its fix and document items which
+                        are still open are carried forward ahead of the new
+                        items: those whose issue is listed by --open-issues,
+                        and those which never got an issue.
+    --open-issues LIST  Comma separated numbers of the repository's open
+                        automated review issues. Without it the open issues
+                        are unknown, and every prior fix and document item is
+                        carried forward.
+"""
+
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+
+def load_script(name: str):
+    """Import a sibling script, whose file name is not a module name."""
+    path = Path(__file__).parent / f'{name}.py'
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'),
+                                                  path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+render_review = load_script('render-review')
+chunk_diff = load_script('chunk-diff')
+
+
+def still_open_items(
+    prior: dict, open_issues: set[int] | None
+) -> list[dict]:
+    """Return the prior review's actionable items which are still open.
+
+    If open_issues is None the open issues are unknown, so no item is
+    dropped for having a closed issue.
+    """
+    carried = []
+    for item in prior.get('items', []):
+        if item.get('action') not in ('fix', 'document'):
+            continue
+        if (open_issues is not None and item.get('issue_number')
+                and item['issue_number'] not in open_issues):
+            continue
+        carried.append(item)
+    return carried
+
+
+def chunk_files(diff_path: str | None) -> list[str]:
+    """Return the files a diff chunk changes, or [] if it can't be read."""
+    if not diff_path:
+        return []
+    try:
+        with open(diff_path) as f:
+            diff = f.read()
+    except OSError:
+        return []
+    files = []
+    for path, _ in chunk_diff.split_files(diff):
+        if path not in files:
+            files.append(path)
+    return files
+
+
+def unreviewed_note(unreviewed: list[tuple[int, list[str]]],
+                    total: int) -> str:
+    """Describe the chunks which have no usable review."""
+    parts = ', '.join(str(number) for number, _ in unreviewed)
+    files = []
+    for _, chunk in unreviewed:
+        files.extend(path for path in chunk if path not in files)
+    note = (f'WARNING: part(s) {parts} of {total} could not be reviewed, so '
+            f'this review does not cover all of the diff.')
+    if files:
+        note += ' Unreviewed files: ' + ', '.join(files) + '.'
+    return note
+
+
+def merge_reviews(
+    reviews: list[dict], carried_items: list[dict] | None = None,
+    prior_sha: str | None = None,
+    unreviewed: list[tuple[int, list[str]]] | None = None,
+) -> dict:
+    """Merge validated chunk reviews, in chunk order, into one review.
+
+    carried_items from an earlier review are placed ahead of the new
+    items; prior_sha is the head that earlier review was made against.
+    unreviewed lists the (part number, files) of chunks which have no
+    usable review, and is called out in the summary.
+    """
+    unreviewed = unreviewed or []
+    total = len(reviews) + len(unreviewed)
+    if total == 1:
+        summary = reviews[0]['summary']
+    else:
+        summary = (f'This PR was reviewed in {total} parts. '
+                   + ' '.join(review['summary'] for review in reviews))
+    if unreviewed:
+        summary = f'{unreviewed_note(unreviewed, total)} {summary}'
+
+    items = []
+    if carried_items is not None:
+        reviewed = f' at {prior_sha[:12]}' if prior_sha else ''
+        summary = (f'This review only covers changes since the previous '
+                   f'review{reviewed}; {len(carried_items)} item(s) still '
+                   f'open from that review are carried forward. {summary}')
+        for item in carried_items:
+            items.append(dict(item, id=len(items) + 1))
+
+    for review in reviews:
+        for item in review['items']:
+            items.append(dict(item, id=len(items) + 1))
+
+    positive_feedback = []
+    seen_titles = set()
+    for review in reviews:
+        for entry in review.get('positive_feedback', []):
+            if entry['title'] not in seen_titles:
+                seen_titles.add(entry['title'])
+                positive_feedback.append(entry)
+
+    merged = {'summary': summary, 'items': items}
+    if positive_feedback:
+        merged['positive_feedback'] = positive_feedback
+
+    coverages = [review['test_coverage'] for review in reviews
+                 if review.get('test_coverage')]
+    if coverages:
+        missing = []
+        for coverage in coverages:
+            for scenario in coverage.get('missing', []):
+                if scenario not in missing:
+                    missing.append(scenario)
+        merged['test_coverage'] = {
+            'adequate': all(coverage.get('adequate') for coverage in coverages),
+            'missing': missing,
+        }
+
+    return merged
+
+
+def main() -> None:
+    args = sys.argv[1:]
+
+    prior_path = None
+    if '--prior' in args:
+        prior_idx = args.index('--prior')
+        prior_path = Path(args[prior_idx + 1])
+        del args[prior_idx:prior_idx + 2]
+
+    chunk_diffs: list[str] = []
+    while '--chunk-diff' in args:
+        diff_idx = args.index('--chunk-diff')
+        chunk_diffs.append(args[diff_idx + 1])
+        del args[diff_idx:diff_idx + 2]
+
+    open_issues: set[int] | None = None
+    if '--open-issues' in args:
+        open_idx = args.index('--open-issues')
+        open_issues = {int(n) for n in args[open_idx + 1].split(',') if n}
+        del args[open_idx:open_idx + 2]
+
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    output_path = Path(args[0])
+    input_paths = args[1:]
+    if chunk_diffs and len(chunk_diffs) != len(input_paths):
+        print('Error: --chunk-diff must be given once per chunk review',
+              file=sys.stderr)
+        sys.exit(1)
+
+    carried_items = None
+    prior_sha = None
+    if prior_path is not None:
+        try:
+            with open(prior_path) as f:
+                prior = render_review.strip_nulls(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f'Error: Cannot read prior review {prior_path}: {e}',
+                  file=sys.stderr)
+            sys.exit(1)
+        carried_items = still_open_items(prior, open_issues)
+        prior_sha = prior.get('reviewed_head_sha')
+
+    reviews = []
+    unreviewed = []
+    for number, input_path in enumerate(input_paths, 1):
+        try:
+            with open(input_path) as f:
+                data = render_review.strip_nulls(json.load(f))
+            is_valid, error = render_review.validate_review(data)
+        except (OSError, json.JSONDecodeError) as e:
+            is_valid, error = False, e
+
+        if not is_valid:
+            print(f'Warning: Skipping {input_path}: {error}', file=sys.stderr)
+            diff_path = chunk_diffs[number - 1] if chunk_diffs else None
+            unreviewed.append((number, chunk_files(diff_path)))
+            continue
+        reviews.append(data)
+
+    if not reviews:
+        print('Error: No usable reviews to merge', file=sys.stderr)
+        sys.exit(1)
+
+    merged = merge_reviews(reviews, carried_items, prior_sha, unreviewed)
+    is_valid, error = render_review.validate_review(merged)
+    if not is_valid:
+        print(f'Error: Merged review is invalid: {error}', file=sys.stderr)
+        sys.exit(1)
+
+    with open(output_path, 'w') as f:
+        json.dump(merged, f, indent=2)
+
+    print(f'Merged {len(reviews)} of {len(input_paths)} reviews '
+          f'({len(merged["items"])} items) into {output_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Extract the review JSON embedded in an earlier review comment.
+
+render-review.py --embed-json appends the review JSON to the rendered
+markdown in a collapsed <details> section. This script pulls it back out
+of a posted review so a follow-up run can review only what changed since.
+
+Usage:
+    prior-review.py <comment.md> <output.json>
+
+If the review was split over several comments, comment.md should contain
+all of them, in the order they were posted.
+
+Writes the embedded review JSON to output.json and prints the head SHA the
+review was made against (its 'reviewed_head_sha' field), or an empty line
+if the review predates that field. Exits non-zero if the comment has no
+embedded review JSON.
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+
+EMBEDDED_JSON_RE = re.compile(
+    r'<summary>Machine-readable review data.*?```json( continued)?\n(.*?)\n```',
+    re.DOTALL)
+
+
+def extract_embedded_review(markdown: str) -> dict | None:
+    """Return the review JSON embedded in markdown, or None.
+
+    A review too long for one comment is split by render-review.py, and
+    its JSON may then be spread over several <details> sections; the
+    markdown of every part is expected, in order, and the pieces are
+    joined back together. A section whose fence is marked as continued
+    carries on the previous section's last line.
+    """
+    matches = EMBEDDED_JSON_RE.findall(markdown)
+    if not matches:
+        return None
+    pieces = [matches[0][1]]
+    for continued, piece in matches[1:]:
+        pieces.append(piece if continued else '\n' + piece)
+    try:
+        data = json.loads(''.join(pieces))
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def main() -> None:
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    markdown = Path(sys.argv[1]).read_text(encoding='utf-8')
+    review_data = extract_embedded_review(markdown)
+    if review_data is None:
+        print('Error: No embedded review JSON found', file=sys.stderr)
+        sys.exit(1)
+
+    with open(sys.argv[2], 'w') as f:
+        json.dump(review_data, f, indent=2)
+
+    print(review_data.get('reviewed_head_sha', ''))
+
+
+if __name__ == '__main__':
+    main()
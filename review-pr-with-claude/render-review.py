@@ -5,18 +5,29 @@ This script takes the JSON output from the automated reviewer and converts
 it to a nicely formatted markdown comment suitable for posting on a PR.
 
 Usage:
-    render-review.py [--embed-json] <input.json> [output.md]
+    render-review.py [--embed-json] [--head-sha SHA] [--max-comment-chars N]
+        <input.json> [output.md]
     render-review.py --validate <input.json>
 
 Options:
     --embed-json    Include the raw JSON in a collapsed <details> section
                     at the end of the markdown. This allows the address-comments
                     automation to extract it from the PR comment.
+    --head-sha SHA  Record the PR head commit the review was made against
+                    as 'reviewed_head_sha', so a later run can review only
+                    the commits pushed since.
+    --max-comment-chars N
+                    Split output.md so no part is longer than N characters
+                    (default: 65536, GitHub's comment size limit). Extra
+                    parts are written next to output.md as output.part2.md,
+                    output.part3.md and so on, each starting with a
+                    continuation marker.
     --validate      Validate the JSON against the schema without rendering.
 
-If output.md is not specified, writes to stdout.
+If output.md is not specified, writes to stdout without splitting.
 """
 
+import functools
 import json
 import sys
 from pathlib import Path
@@ -31,6 +42,17 @@ except ImportError:
 
 SCHEMA_PATH = Path(__file__).parent / 'review-schema.json'
 
+# GitHub rejects issue and review comments longer than this many characters.
+GITHUB_COMMENT_LIMIT = 65536
+
+# Added to the info string of a code fence reopened part way through a line
+CONTINUED_FENCE_SUFFIX = ' continued'
+
+# First line of every continuation comment written by CommentWriter.
+CONTINUATION_MARKER = '<!-- review-continuation -->'
+
+JSON_ENCODER = json.JSONEncoder(indent=2)
+
 SEVERITY_EMOJI = {
     'critical': '🔴',
     'high': '🟠',
@@ -65,7 +87,7 @@ def load_schema() -> dict | None:
 
 
 def strip_nulls(value):
-    """Recursively remove null-valued keys from dicts.
+    """Recursively remove null-valued keys from dicts, in place.
 
     The reviewer model sometimes emits an explicit null for an optional
     field it has nothing to say about (e.g. '"rationale": null') instead
@@ -74,14 +96,32 @@ def strip_nulls(value):
     declared type, so an explicit null fails a '"type": "string"' check.
     Throughout this pipeline null and absent mean the same thing, so
     normalise to absent before validating or rendering.
+
+    The value is modified in place rather than copied, and returned for
+    convenience.
     """
     if isinstance(value, dict):
-        return {k: strip_nulls(v) for k, v in value.items() if v is not None}
-    if isinstance(value, list):
-        return [strip_nulls(v) for v in value]
+        for key in [k for k, v in value.items() if v is None]:
+            del value[key]
+        for v in value.values():
+            strip_nulls(v)
+    elif isinstance(value, list):
+        for v in value:
+            strip_nulls(v)
     return value
 
 
+@functools.lru_cache(maxsize=None)
+def get_validator():
+    """Return a schema validator, built and checked once per process."""
+    schema = load_schema()
+    if schema is None:
+        return None
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
 def validate_review(review_data: dict) -> tuple[bool, str]:
     """Validate review data against the schema.
 
@@ -103,15 +143,14 @@ def validate_review(review_data: dict) -> tuple[bool, str]:
                 return False, f"Item {i}: invalid action '{item['action']}'"
         return True, ''
 
-    schema = load_schema()
-    if schema is None:
+    validator = get_validator()
+    if validator is None:
         return True, ''  # No schema available, skip validation
 
-    try:
-        jsonschema.validate(review_data, schema)
-        return True, ''
-    except jsonschema.ValidationError as e:
-        return False, str(e.message)
+    error = jsonschema.exceptions.best_match(validator.iter_errors(review_data))
+    if error is not None:
+        return False, str(error.message)
+    return True, ''
 
 
 def render_markdown(review_data: dict, embed_json: bool = False) -> str:
@@ -122,17 +161,24 @@ def render_markdown(review_data: dict, embed_json: bool = False) -> str:
         embed_json: If True, append the raw JSON in a collapsed details section
                     for machine parsing by the address-comments automation.
     """
-    lines = []
+    return '\n'.join(iter_markdown(review_data, embed_json=embed_json))
+
 
+def iter_markdown(review_data: dict, embed_json: bool = False):
+    """Generate the markdown for render_markdown one line at a time.
+
+    This lets large reviews be streamed to a file without building the
+    whole document (and a second copy of the JSON) in memory.
+    """
     # Header
-    lines.append('## PR Review')
-    lines.append('')
+    yield '## PR Review'
+    yield ''
 
     # Summary
-    lines.append('### Summary')
-    lines.append('')
-    lines.append(review_data.get('summary', 'No summary provided.'))
-    lines.append('')
+    yield '### Summary'
+    yield ''
+    yield review_data.get('summary', 'No summary provided.')
+    yield ''
 
     # Separate items by action type
     fix_items = []
@@ -153,115 +199,233 @@ def render_markdown(review_data: dict, embed_json: bool = False) -> str:
 
     # Action Items (things that must be done)
     if fix_items or doc_items:
-        lines.append('---')
-        lines.append('')
-        lines.append('### Action Items')
-        lines.append('')
+        yield '---'
+        yield ''
+        yield '### Action Items'
+        yield ''
 
         for item in fix_items + doc_items:
-            lines.extend(render_item(item))
-            lines.append('')
+            yield from render_item(item)
+            yield ''
 
     # Suggestions (optional improvements)
     if consider_items:
-        lines.append('---')
-        lines.append('')
-        lines.append('### Suggestions')
-        lines.append('')
-        lines.append('*These are optional improvements to consider:*')
-        lines.append('')
+        yield '---'
+        yield ''
+        yield '### Suggestions'
+        yield ''
+        yield '*These are optional improvements to consider:*'
+        yield ''
 
         for item in consider_items:
-            lines.extend(render_item(item))
-            lines.append('')
+            yield from render_item(item)
+            yield ''
 
     # Observations (informational only)
     if info_items:
-        lines.append('---')
-        lines.append('')
-        lines.append('### Observations')
-        lines.append('')
-        lines.append('*These are informational and do not require action:*')
-        lines.append('')
+        yield '---'
+        yield ''
+        yield '### Observations'
+        yield ''
+        yield '*These are informational and do not require action:*'
+        yield ''
 
         for item in info_items:
-            lines.extend(render_item(item))
-            lines.append('')
+            yield from render_item(item)
+            yield ''
 
     # Positive feedback
     positive = review_data.get('positive_feedback', [])
     if positive:
-        lines.append('---')
-        lines.append('')
-        lines.append('### What\'s Good')
-        lines.append('')
+        yield '---'
+        yield ''
+        yield '### What\'s Good'
+        yield ''
 
         for item in positive:
-            lines.append(f"✅ **{item['title']}**")
-            lines.append('')
-            lines.append(item.get('description', ''))
-            lines.append('')
+            yield f"✅ **{item['title']}**"
+            yield ''
+            yield item.get('description', '')
+            yield ''
 
     # Test coverage
     test_coverage = review_data.get('test_coverage')
     if test_coverage:
-        lines.append('---')
-        lines.append('')
-        lines.append('### Test Coverage')
-        lines.append('')
+        yield '---'
+        yield ''
+        yield '### Test Coverage'
+        yield ''
 
         if test_coverage.get('adequate'):
-            lines.append('✅ Test coverage appears adequate.')
+            yield '✅ Test coverage appears adequate.'
         else:
-            lines.append('⚠️ Test coverage may need improvement.')
+            yield '⚠️ Test coverage may need improvement.'
 
         missing = test_coverage.get('missing', [])
         if missing:
-            lines.append('')
-            lines.append('**Missing test scenarios:**')
+            yield ''
+            yield '**Missing test scenarios:**'
             for scenario in missing:
-                lines.append(f'- {scenario}')
-        lines.append('')
+                yield f'- {scenario}'
+        yield ''
 
-    # Collect issues created for auto-close links
+    # Collect issues created for auto-close links. Several items can be
+    # linked to the same issue, so only list each one once.
     issue_numbers = []
     for item in review_data.get('items', []):
-        if item.get('issue_number'):
+        if item.get('issue_number') and item['issue_number'] not in issue_numbers:
             issue_numbers.append(item['issue_number'])
 
     if issue_numbers:
-        lines.append('---')
-        lines.append('')
-        lines.append('### Related Issues')
-        lines.append('')
-        lines.append('The following issues were created for this review and '
-                     'will be closed when this PR merges:')
-        lines.append('')
+        yield '---'
+        yield ''
+        yield '### Related Issues'
+        yield ''
+        yield ('The following issues were created for this review and '
+               'will be closed when this PR merges:')
+        yield ''
         for num in issue_numbers:
-            lines.append(f'- Closes #{num}')
-        lines.append('')
+            yield f'- Closes #{num}'
+        yield ''
 
     # Footer
-    lines.append('---')
-    lines.append('')
-    lines.append('*🤖 This review was generated by the automated reviewer. '
-                 'Use `@shakenfist-bot please address comments` to have '
-                 'Claude Code address the action items.*')
+    yield '---'
+    yield ''
+    yield ('*🤖 This review was generated by the automated reviewer. '
+           'Use `@shakenfist-bot please address comments` to have '
+           'Claude Code address the action items.*')
 
     # Optionally embed the JSON for machine parsing
     if embed_json:
-        lines.append('')
-        lines.append('<details>')
-        lines.append('<summary>Machine-readable review data (for automation)'
-                     '</summary>')
-        lines.append('')
-        lines.append('```json')
-        lines.append(json.dumps(review_data, indent=2))
-        lines.append('```')
-        lines.append('')
-        lines.append('</details>')
+        yield ''
+        yield '<details>'
+        yield ('<summary>Machine-readable review data (for automation)'
+               '</summary>')
+        yield ''
+        yield '```json'
+        yield from iter_json_lines(review_data)
+        yield '```'
+        yield ''
+        yield '</details>'
+
+
+def iter_json_lines(data: dict):
+    """Generate data as indented JSON one line at a time.
+
+    Uses the encoder's incremental output, so the serialised JSON is never
+    held in memory as a single string.
+    """
+    pending = ''
+    for chunk in JSON_ENCODER.iterencode(data):
+        pending += chunk
+        if '\n' in pending:
+            *complete, pending = pending.split('\n')
+            yield from complete
+    yield pending
+
+
+class CommentWriter:
+    """Stream rendered markdown into one or more comment-sized files.
+
+    Lines are written straight to disk. When the next line would take the
+    current file past max_chars, the file is finished and a continuation
+    file is started: review.md, then review.part2.md, review.part3.md and
+    so on. A fenced code block or <details> section that is split is closed
+    at the end of one part and reopened at the start of the next, so each
+    part renders on its own and prior-review.py can reassemble embedded
+    JSON that spans parts. A line too long for any part is cut at the end
+    of a part, and a fence it was cut inside is reopened with a
+    CONTINUED_FENCE_SUFFIX info string, so that the pieces are rejoined
+    without a newline between them.
+    """
 
-    return '\n'.join(lines)
+    # Room left in each part for the lines which close a split section
+    CLOSING_RESERVE = 200
+
+    def __init__(self, output_path: Path, max_chars: int = GITHUB_COMMENT_LIMIT):
+        self.output_path = output_path
+        self.max_chars = max_chars
+        self.paths: list[Path] = []
+        self.fence: str | None = None
+        self.details_summary: str | None = None
+        self._file = None
+        self._size = 0
+        self._open_part()
+
+    def _open_part(self) -> None:
+        part = len(self.paths) + 1
+        if part == 1:
+            path = self.output_path
+        else:
+            path = self.output_path.with_name(
+                f'{self.output_path.stem}.part{part}{self.output_path.suffix}')
+        self.paths.append(path)
+        self._file = open(path, 'w')
+        self._size = 0
+
+    def _emit(self, line: str) -> None:
+        self._file.write(line)
+        self._file.write('\n')
+        self._size += len(line) + 1
+
+    def _roll_over(self, mid_line: bool = False) -> None:
+        if self.fence is not None:
+            self._emit('```')
+        if self.details_summary is not None:
+            self._emit('')
+            self._emit('</details>')
+        self._file.close()
+
+        self._open_part()
+        self._emit(CONTINUATION_MARKER)
+        self._emit('*(continued from the previous comment)*')
+        self._emit('')
+        if self.details_summary is not None:
+            self._emit('<details>')
+            self._emit(self.details_summary.replace(
+                '</summary>', ' (continued)</summary>'))
+            self._emit('')
+        if self.fence is not None:
+            if mid_line:
+                self._emit(self.fence + CONTINUED_FENCE_SUFFIX)
+            else:
+                self._emit(self.fence)
+
+    def write_line(self, line: str) -> None:
+        limit = self.max_chars - self.CLOSING_RESERVE
+        # A single line too long for a comment is split where it must be,
+        # and every cut falls at the end of a part
+        mid_line = False
+        while len(line) + 1 > limit:
+            if self._size:
+                self._roll_over(mid_line)
+            take = max(limit - self._size - 1, 1)
+            self._emit(line[:take])
+            line = line[take:]
+            mid_line = True
+        if self._size + len(line) + 1 > limit:
+            self._roll_over(mid_line)
+        self._emit(line)
+
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            self.fence = None if self.fence is not None else stripped
+        elif self.fence is None:
+            if stripped.startswith('<summary>') and stripped.endswith('</summary>'):
+                self.details_summary = stripped
+            elif stripped == '</details>':
+                self.details_summary = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'CommentWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 
 def render_item(item: dict) -> list[str]:
@@ -327,6 +491,18 @@ def main() -> None:
         embed_json = True
         args.remove('--embed-json')
 
+    max_chars = GITHUB_COMMENT_LIMIT
+    if '--max-comment-chars' in args:
+        max_idx = args.index('--max-comment-chars')
+        max_chars = int(args[max_idx + 1])
+        del args[max_idx:max_idx + 2]
+
+    head_sha = None
+    if '--head-sha' in args:
+        sha_idx = args.index('--head-sha')
+        head_sha = args[sha_idx + 1]
+        del args[sha_idx:sha_idx + 2]
+
     # Handle --validate flag
     if args and args[0] == '--validate':
         if len(args) < 2:
@@ -359,15 +535,21 @@ def main() -> None:
         print(f'Error: Invalid review JSON: {error}', file=sys.stderr)
         sys.exit(1)
 
-    # Render
-    markdown = render_markdown(data, embed_json=embed_json)
+    if head_sha:
+        data['reviewed_head_sha'] = head_sha
 
-    # Output
+    # Render, streaming straight to the output
+    lines = iter_markdown(data, embed_json=embed_json)
     if output_path:
-        with open(output_path, 'w') as f:
-            f.write(markdown)
+        with CommentWriter(output_path, max_chars) as writer:
+            for line in lines:
+                writer.write_line(line)
+        if len(writer.paths) > 1:
+            print(f'Split review into {len(writer.paths)} comments',
+                  file=sys.stderr)
     else:
-        print(markdown)
+        for line in lines:
+            sys.stdout.write(line + '\n')
 
 
 if __name__ == '__main__':
@@ -9,8 +9,23 @@
 #   INPUT_PR_NUMBER   - PR number to review (required)
 #   INPUT_MAX_TURNS   - Maximum Claude turns (default: 50)
 #   INPUT_FORCE       - Review even if already reviewed (default: false)
+#   INPUT_INCREMENTAL - When forcing a re-review, only review the commits
+#                       pushed since the last review (default: true)
+#   INPUT_LARGE_DIFF_MODE      - What to do with diffs over GitHub's
+#                                20,000-line cap, or over the chunk token
+#                                budget: "skip" (default) or "chunk"
+#   INPUT_CHUNK_TOKEN_BUDGET   - Approximate tokens per chunk (default: 60000)
+#   INPUT_CHUNK_PARALLELISM    - Chunks reviewed at once (default: 3)
+#   INPUT_TELEMETRY_FILE       - JSON-lines file to append this run's
+#                                telemetry to (default: none)
 #   GH_TOKEN          - GitHub token for API access
 #
+# In "chunk" mode a diff too large for the API is built locally with
+# git diff base...head, which needs a checkout of the repository in the
+# current directory. The diff is split into file-grouped chunks by
+# chunk-diff.py, the chunks are reviewed concurrently, and the chunk
+# reviews are merged into one by merge-reviews.py.
+#
 # The review output is structured JSON that is:
 #   1. Validated against review-schema.json
 #   2. Used to create GitHub issues for actionable items
@@ -28,6 +43,11 @@ script_dir="$(cd "$(dirname "$0")" && pwd)"
 pr_number="${INPUT_PR_NUMBER}"
 max_turns="${INPUT_MAX_TURNS:-50}"
 force="${INPUT_FORCE:-false}"
+incremental="${INPUT_INCREMENTAL:-true}"
+large_diff_mode="${INPUT_LARGE_DIFF_MODE:-skip}"
+chunk_token_budget="${INPUT_CHUNK_TOKEN_BUDGET:-60000}"
+chunk_parallelism="${INPUT_CHUNK_PARALLELISM:-3}"
+telemetry_file="${INPUT_TELEMETRY_FILE:-}"
 
 # CI mode is always true when running as an action
 ci_mode=true
@@ -53,6 +73,105 @@ ci_output() {
     echo "${key}=${value}"
 }
 
+# Append this run's telemetry to the history file, if one was requested.
+# $1 is how the run ended; the rest are extra review-telemetry.py
+# options. Failing to record telemetry never fails the review.
+record_telemetry() {
+    local outcome="$1"
+    shift
+    if [ -z "${telemetry_file}" ]; then
+        return 0
+    fi
+
+    local review_mode=full
+    if [ "${chunked}" = "true" ]; then
+        review_mode=chunked
+    elif [ "${incremental_review}" = "true" ]; then
+        review_mode=incremental
+    fi
+
+    python3 "${script_dir}/review-telemetry.py" record "${telemetry_file}" \
+        --pr "${pr_number}" --outcome "${outcome}" --mode "${review_mode}" \
+        --head-sha "${head_sha}" --diff-lines "${diff_lines}" \
+        --chunks "${chunk_count:-1}" --max-turns "${max_turns}" \
+        --claude-output "${claude_output}" "$@" \
+        || echo "Warning: Failed to record review telemetry"
+}
+
+# Build the PR diff locally as git diff base...head, for diffs the API
+# refuses to return. Needs the repository checked out in the current
+# directory; a shallow checkout is deepened so the merge base exists.
+build_local_diff() {
+    local fetch_args=(--no-tags)
+    if [ "$(git rev-parse --is-shallow-repository 2>/dev/null)" = "true" ]; then
+        fetch_args+=(--unshallow)
+    fi
+    git fetch "${fetch_args[@]}" origin \
+            "+refs/heads/${base_branch}:refs/remotes/origin/review-base" \
+            "+refs/pull/${pr_number}/head:refs/remotes/origin/review-head" \
+        && git diff origin/review-base...origin/review-head \
+            > "${output_dir}/pr-diff.txt"
+}
+
+# Extract the review JSON from a claude --output-format json file ($1)
+# and write it to $2. Returns non-zero if no review JSON can be found.
+extract_review_json() {
+    local claude_output_file="$1"
+    local dest="$2"
+    local claude_result review_json
+
+    claude_result=$(jq -r '.result // empty' "${claude_output_file}" \
+        2>/dev/null || true)
+    if [ -z "${claude_result}" ]; then
+        echo "Error: No result from Claude"
+        return 1
+    fi
+
+    # Extract JSON from code block (between ```json and ```)
+    # Allow for whitespace variations in the markers
+    local json_start='^[[:space:]]*```json[[:space:]]*$'
+    local json_end='^[[:space:]]*```[[:space:]]*$'
+    review_json=$(echo "${claude_result}" | \
+        sed -n "/${json_start}/,/${json_end}/p" | sed '1d;$d')
+
+    if [ -z "${review_json}" ]; then
+        echo "Warning: No JSON code block found with standard markers"
+        echo "Attempting fallback extraction..."
+
+        # Fallback: use Python for portable JSON extraction
+        review_json=$(echo "${claude_result}" | python3 -c '
+import sys
+import re
+import json
+
+content = sys.stdin.read()
+
+# Try to find a JSON object with summary and items fields
+match = re.search(
+    r"\{[^{}]*\"summary\"[^{}]*\"items\".*\}",
+    content,
+    re.DOTALL
+)
+if match:
+    try:
+        candidate = match.group(0)
+        json.loads(candidate)
+        print(candidate)
+    except json.JSONDecodeError:
+        pass
+' 2>/dev/null || true)
+
+        if [ -z "${review_json}" ]; then
+            echo "Error: Could not extract JSON from Claude's response"
+            echo "Response was:"
+            echo "${claude_result}" | head -50
+            return 1
+        fi
+    fi
+
+    echo "${review_json}" > "${dest}"
+}
+
 echo "========================================"
 echo "Shaken Fist PR Reviewer"
 echo "========================================"
@@ -100,7 +219,7 @@ echo
 echo "Step 2: Fetching PR information..."
 
 gh pr view "${pr_number}" \
-    --json title,body,author,baseRefName,headRefName \
+    --json title,body,author,baseRefName,headRefName,headRefOid \
     > "${output_dir}/pr-info.json"
 
 pr_title=$(jq -r '.title' "${output_dir}/pr-info.json")
@@ -110,10 +229,13 @@ base_branch=$(jq -r '.baseRefName' \
     "${output_dir}/pr-info.json")
 head_branch=$(jq -r '.headRefName' \
     "${output_dir}/pr-info.json")
+head_sha=$(jq -r '.headRefOid' \
+    "${output_dir}/pr-info.json")
 
 echo "Title: ${pr_title}"
 echo "Author: ${pr_author}"
 echo "Branch: ${head_branch} -> ${base_branch}"
+echo "Head: ${head_sha}"
 echo
 
 # Step 3: Get the diff
@@ -138,8 +260,25 @@ if [ "${diff_fetch_ok}" = "false" ]; then
     diff_err=$(cat "${diff_stderr_file}")
     echo "Diff fetch failed: ${diff_err}"
 
+    diff_too_large=false
     if echo "${diff_err}" | \
             grep -qiE 'exceeded the maximum number of lines'; then
+        diff_too_large=true
+    fi
+
+    if [ "${diff_too_large}" = "true" ] && \
+            [ "${large_diff_mode}" = "chunk" ]; then
+        echo "Building the diff locally for a chunked review..."
+        if build_local_diff; then
+            diff_fetch_ok=true
+        else
+            echo "Warning: Failed to build the diff locally"
+        fi
+    fi
+fi
+
+if [ "${diff_fetch_ok}" = "false" ]; then
+    if [ "${diff_too_large}" = "true" ]; then
         # Diff too big for the API. Post a polite "review
         # skipped" comment so PR readers know why the bot didn't
         # weigh in, and exit success so the workflow step is
@@ -157,10 +296,11 @@ Options for getting an automated review:
 
 * **Split the PR.** Smaller PRs review faster and are easier
   for humans to read too.
-* **Run the reviewer manually.** A maintainer can invoke
-  ``shakenfist/actions/review-pr-with-claude`` against the
-  branch with a locally-generated diff (``git diff
-  develop...HEAD``) and post the result.
+* **Review in chunks.** Run
+  ``shakenfist/actions/review-pr-with-claude`` with
+  ``large-diff-mode: chunk`` from a job with the repository
+  checked out. It builds the diff locally and reviews it in
+  parts.
 * **Skip automated review.** Land relying on the merge-queue
   CI and human review.
 
@@ -190,11 +330,6 @@ diff_lines=$(wc -l < "${output_dir}/pr-diff.txt")
 echo "Diff size: ${diff_lines} lines"
 echo
 
-if [ "${diff_lines}" -gt 5000 ]; then
-    echo "Warning: Large diff (${diff_lines} lines)," \
-        "review may be limited"
-fi
-
 # Step 4: Check for existing bot reviews
 echo "Step 4: Checking for existing reviews..."
 
@@ -206,6 +341,7 @@ existing_review=$(gh pr view "${pr_number}" --json reviews \
         ) | .id' \
     2>/dev/null | head -1 || true)
 
+incremental_review=false
 if [ -n "${existing_review}" ]; then
     if [ "${force}" = "true" ]; then
         echo "Note: Bot has already reviewed this PR"
@@ -215,9 +351,80 @@ if [ -n "${existing_review}" ]; then
         ci_output "review_skipped" "already_reviewed"
         exit 0
     fi
+
+    # Where the last review recorded the head it reviewed, and the PR has
+    # only gained commits since, review just the interdiff and carry the
+    # still-open items of the last review forward.
+    if [ "${incremental}" = "true" ]; then
+        # A review too long for one comment was posted as the review plus
+        # continuation comments, so collect those too.
+        gh pr view "${pr_number}" --json reviews,comments \
+            --jq '
+                def bot: .author.login == "github-actions" or
+                    .author.login == "shakenfist-bot";
+                ([.reviews[] | select(bot)] | last) as $r |
+                if $r == null then empty else
+                    $r.body,
+                    (.comments[] | select(bot) |
+                        select(.createdAt >= $r.submittedAt) |
+                        select(.body | startswith("<!-- review-continuation -->")) |
+                        .body)
+                end' \
+            > "${output_dir}/prior-review.md" 2>/dev/null || true
+        prior_sha=$(python3 "${script_dir}/prior-review.py" \
+            "${output_dir}/prior-review.md" \
+            "${output_dir}/prior-review.json" 2>/dev/null || true)
+
+        if [ -z "${prior_sha}" ]; then
+            echo "Last review did not record its head, reviewing the whole PR"
+        elif [ "${prior_sha}" = "${head_sha}" ]; then
+            echo "No commits since the last review at ${prior_sha}"
+            ci_output "review_skipped" "no_new_commits"
+            exit 0
+        else
+            compare_path="repos/${GITHUB_REPOSITORY}/compare"
+            compare_path="${compare_path}/${prior_sha}...${head_sha}"
+            compare_status=$(gh api "${compare_path}" --jq '.status' \
+                2>/dev/null || true)
+            if [ "${compare_status}" = "ahead" ] && \
+                    gh api -H 'Accept: application/vnd.github.diff' \
+                        "${compare_path}" \
+                        > "${output_dir}/interdiff.txt" 2>/dev/null; then
+                incremental_review=true
+                mv "${output_dir}/interdiff.txt" "${output_dir}/pr-diff.txt"
+                diff_lines=$(wc -l < "${output_dir}/pr-diff.txt")
+                echo "Reviewing only the changes since ${prior_sha}" \
+                    "(${diff_lines} lines)"
+            else
+                echo "Head ${head_sha} does not simply extend the last" \
+                    "reviewed head ${prior_sha} (${compare_status:-unknown})," \
+                    "reviewing the whole PR"
+            fi
+        fi
+    fi
 fi
 echo
 
+# In chunk mode, split any diff over the token budget into file-grouped
+# chunks which are reviewed separately and merged afterwards.
+chunked=false
+chunk_dir="${output_dir}/chunks"
+if [ "${large_diff_mode}" = "chunk" ]; then
+    chunk_count=$(python3 "${script_dir}/chunk-diff.py" \
+        "${output_dir}/pr-diff.txt" "${chunk_dir}" \
+        --token-budget "${chunk_token_budget}")
+    if [ "${chunk_count}" -gt 1 ]; then
+        chunked=true
+        echo "Split diff into ${chunk_count} chunks" \
+            "(${chunk_parallelism} reviewed at a time)"
+    fi
+fi
+
+if [ "${chunked}" = "false" ] && [ "${diff_lines}" -gt 5000 ]; then
+    echo "Warning: Large diff (${diff_lines} lines)," \
+        "review may be limited"
+fi
+
 # Step 5: Run Claude Code for review
 echo "Step 5: Running Claude Code for review..."
 echo
@@ -332,19 +539,82 @@ content = content.replace('${base_branch}', base_branch)
 prompt_file.write_text(content)
 PYSUBST
 
-# Append the diff
-cat "${output_dir}/pr-diff.txt" >> "${prompt_file}"
+if [ "${incremental_review}" = "true" ]; then
+    {
+        echo "This is a follow-up review. The diff below only contains the"
+        echo "commits pushed since the last automated review, at ${prior_sha}."
+        echo "Items still open from that review are carried forward"
+        echo "automatically, so only report items about these changes."
+        echo
+    } >> "${prompt_file}"
+fi
+
+claude_output="${output_dir}/claude-output.json"
 
-# Run Claude Code to get JSON review
-echo "Running Claude to generate review JSON..."
-cat "${prompt_file}" | "${claude_bin}" -p - \
-    --dangerously-skip-permissions \
-    --max-turns "${max_turns}" \
-    --output-format json \
-    > "${output_dir}/claude-output.json" || true
+# Review one chunk of a chunked diff: $1 is the chunk number.
+review_chunk() {
+    local index="$1"
+    local chunk_prompt="${chunk_dir}/prompt-${index}.txt"
+
+    cp "${prompt_file}" "${chunk_prompt}"
+    {
+        echo "This PR is too large to review in one pass, so its diff has"
+        echo "been split into ${chunk_count} parts which are reviewed"
+        echo "separately. This is part $((10#${index})) of ${chunk_count}."
+        echo "Only report items for the files in this part; the other parts"
+        echo "are reviewed separately. Every file changed by the PR is:"
+        echo
+        cat "${chunk_dir}/files.txt"
+        echo
+        cat "${chunk_dir}/chunk-${index}.diff"
+    } >> "${chunk_prompt}"
+
+    "${claude_bin}" -p - \
+        --dangerously-skip-permissions \
+        --max-turns "${max_turns}" \
+        --output-format json \
+        < "${chunk_prompt}" \
+        > "${chunk_dir}/claude-output-${index}.json" || true
+}
+
+if [ "${chunked}" = "true" ]; then
+    # Review the chunks with at most chunk_parallelism running at once
+    echo "Running Claude to generate review JSON for each chunk..."
+    for chunk in "${chunk_dir}"/chunk-*.diff; do
+        index=$(basename "${chunk}" .diff)
+        index="${index#chunk-}"
+        while [ "$(jobs -rp | wc -l)" -ge "${chunk_parallelism}" ]; do
+            wait -n || true
+        done
+        echo "  Reviewing chunk ${index}..."
+        review_chunk "${index}" &
+    done
+    wait
+
+    # Combine the per-chunk stats: turns and cost add up, while the
+    # duration that matters is the slowest chunk. Each chunk has its own
+    # turn limit, so the busiest chunk's turns are kept too.
+    jq -s '{
+            num_turns: (map(.num_turns // 0) | add),
+            max_chunk_turns: (map(.num_turns // 0) | max),
+            duration_ms: (map(.duration_ms // 0) | max),
+            total_cost_usd: (map(.total_cost_usd // 0) | add)
+        }' "${chunk_dir}"/claude-output-*.json \
+        > "${claude_output}" || true
+else
+    # Append the diff
+    cat "${output_dir}/pr-diff.txt" >> "${prompt_file}"
+
+    # Run Claude Code to get JSON review
+    echo "Running Claude to generate review JSON..."
+    cat "${prompt_file}" | "${claude_bin}" -p - \
+        --dangerously-skip-permissions \
+        --max-turns "${max_turns}" \
+        --output-format json \
+        > "${claude_output}" || true
+fi
 
 # Extract metadata for CI output
-claude_output="${output_dir}/claude-output.json"
 if [ -f "${claude_output}" ]; then
     num_turns=$(jq -r '.num_turns // "unknown"' \
         "${claude_output}")
@@ -368,56 +638,6 @@ fi
 echo
 echo "Step 6: Extracting and validating review JSON..."
 
-claude_result=$(jq -r '.result // empty' "${claude_output}")
-if [ -z "${claude_result}" ]; then
-    echo "Error: No result from Claude"
-    ci_output "review_posted" "false"
-    exit 1
-fi
-
-# Extract JSON from code block (between ```json and ```)
-# Allow for whitespace variations in the markers
-json_start='^[[:space:]]*```json[[:space:]]*$'
-json_end='^[[:space:]]*```[[:space:]]*$'
-review_json=$(echo "${claude_result}" | \
-    sed -n "/${json_start}/,/${json_end}/p" | sed '1d;$d')
-
-if [ -z "${review_json}" ]; then
-    echo "Warning: No JSON code block found with standard markers"
-    echo "Attempting fallback extraction..."
-
-    # Fallback: use Python for portable JSON extraction
-    review_json=$(echo "${claude_result}" | python3 -c '
-import sys
-import re
-import json
-
-content = sys.stdin.read()
-
-# Try to find a JSON object with summary and items fields
-match = re.search(
-    r"\{[^{}]*\"summary\"[^{}]*\"items\".*\}",
-    content,
-    re.DOTALL
-)
-if match:
-    try:
-        candidate = match.group(0)
-        json.loads(candidate)
-        print(candidate)
-    except json.JSONDecodeError:
-        pass
-' 2>/dev/null || true)
-
-    if [ -z "${review_json}" ]; then
-        echo "Error: Could not extract JSON from Claude's response"
-        echo "Response was:"
-        echo "${claude_result}" | head -50
-        ci_output "review_posted" "false"
-        exit 1
-    fi
-fi
-
 # Save the extracted JSON
 review_json_file="${output_dir}/review.json"
 review_json_with_issues="${output_dir}/review-with-issues.json"
@@ -425,9 +645,64 @@ review_md_file="${output_dir}/review.md"
 render_script="${script_dir}/render-review.py"
 create_issues_script="${script_dir}/create-review-issues.py"
 
-echo "${review_json}" > "${review_json_file}"
+if [ "${chunked}" = "true" ]; then
+    # Extract each chunk's review, then merge them into a single review.
+    # Every chunk is passed to the merge with its diff: one whose review
+    # can't be extracted is left out, and the merged summary lists the
+    # files it covered as unreviewed.
+    chunk_reviews=()
+    chunk_diffs=()
+    for chunk_output in "${chunk_dir}"/claude-output-*.json; do
+        index=$(basename "${chunk_output}" .json)
+        index="${index#claude-output-}"
+        echo "Chunk ${index}:"
+        if ! extract_review_json "${chunk_output}" \
+                "${chunk_dir}/review-${index}.json"; then
+            echo "Warning: Leaving chunk ${index} out of the review"
+            rm -f "${chunk_dir}/review-${index}.json"
+        fi
+        chunk_reviews+=("${chunk_dir}/review-${index}.json")
+        chunk_diffs+=(--chunk-diff "${chunk_dir}/chunk-${index}.diff")
+    done
+
+    if ! python3 "${script_dir}/merge-reviews.py" \
+            "${review_json_file}" "${chunk_reviews[@]}" "${chunk_diffs[@]}"; then
+        echo "Error: Could not build a review from the chunk reviews"
+        ci_output "review_posted" "false"
+        record_telemetry "no_review"
+        exit 1
+    fi
+elif ! extract_review_json "${claude_output}" "${review_json_file}"; then
+    ci_output "review_posted" "false"
+    record_telemetry "no_review"
+    exit 1
+fi
 echo "Extracted review JSON to ${review_json_file}"
 
+if [ "${incremental_review}" = "true" ]; then
+    echo "Carrying forward open items from the last review..."
+    # If the open issues can't be listed, carry every prior item forward
+    # rather than treating them all as closed.
+    open_issues_args=()
+    if open_issues=$(gh issue list --label automated-review --state open \
+            --limit 1000 --json number \
+            --jq 'map(.number | tostring) | join(",")' 2>/dev/null); then
+        open_issues_args=(--open-issues "${open_issues}")
+    else
+        echo "Warning: Could not list open review issues," \
+            "carrying forward every open item"
+    fi
+    if python3 "${script_dir}/merge-reviews.py" \
+            "${output_dir}/review-incremental.json" "${review_json_file}" \
+            --prior "${output_dir}/prior-review.json" \
+            "${open_issues_args[@]}"; then
+        mv "${output_dir}/review-incremental.json" "${review_json_file}"
+    else
+        echo "Warning: Could not carry forward the last review's items," \
+            "posting the incremental review on its own"
+    fi
+fi
+
 # Validate the JSON
 echo "Validating JSON..."
 if ! python3 "${render_script}" --validate "${review_json_file}"; then
@@ -435,6 +710,7 @@ if ! python3 "${render_script}" --validate "${review_json_file}"; then
     echo "JSON content:"
     cat "${review_json_file}"
     ci_output "review_posted" "false"
+    record_telemetry "invalid_review" --review "${review_json_file}"
     exit 1
 fi
 echo "JSON validation passed"
@@ -442,19 +718,23 @@ echo "JSON validation passed"
 # Step 7: Create GitHub issues for actionable items
 echo
 echo "Step 7: Creating GitHub issues for action items..."
+issues_started_ms=$(date +%s%3N)
 python3 "${create_issues_script}" \
     "${review_json_file}" \
     "${review_json_with_issues}" \
-    --pr "${pr_number}" || {
+    --pr "${pr_number}" --batch || {
     echo "Warning: Issue creation failed, continuing without issues"
     cp "${review_json_file}" "${review_json_with_issues}"
 }
+issue_latency_ms=$(( $(date +%s%3N) - issues_started_ms ))
+echo "Issue creation took ${issue_latency_ms}ms"
+ci_output "issue_latency_ms" "${issue_latency_ms}"
 
 # Step 8: Render to markdown (with embedded JSON for address-comments
 # automation)
 echo
 echo "Step 8: Rendering review to markdown..."
-python3 "${render_script}" --embed-json \
+python3 "${render_script}" --embed-json --head-sha "${head_sha}" \
     "${review_json_with_issues}" "${review_md_file}"
 echo "Rendered review to ${review_md_file}"
 
@@ -466,13 +746,30 @@ review_size=$(wc -c < "${review_md_file}")
 if [ "${review_size}" -gt 0 ]; then
     gh pr review "${pr_number}" --comment \
         --body-file "${review_md_file}"
-    echo "Review posted successfully"
+
+    # A review longer than GitHub's comment limit was split by the
+    # renderer; post the rest, in order, as continuation comments.
+    part=2
+    while [ -f "${output_dir}/review.part${part}.md" ]; do
+        gh pr comment "${pr_number}" \
+            --body-file "${output_dir}/review.part${part}.md"
+        part=$((part + 1))
+    done
+    echo "Review posted successfully ($((part - 1)) comment(s))"
     ci_output "review_posted" "true"
+    review_outcome=posted
+    review_comments=$((part - 1))
 else
     echo "Warning: Rendered review is empty"
     ci_output "review_posted" "false"
+    review_outcome=empty
+    review_comments=0
 fi
 
+record_telemetry "${review_outcome}" \
+    --review "${review_json_with_issues}" \
+    --issue-latency-ms "${issue_latency_ms}" --comments "${review_comments}"
+
 echo
 echo "========================================"
 echo "PR review complete!"
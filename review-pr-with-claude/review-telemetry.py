@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Record and summarise telemetry about automated review runs.
+
+Each review run appends one JSON object to a JSON-lines history file:
+Claude's turns, duration and cost, the size of the reviewed diff, the
+review's item counts by severity and action, and how long issue creation
+took. The summariser reads one or more history files (for example the
+artifacts of many workflow runs) and reports percentiles and the cost per
+thousand diff lines, so max-turns can be tuned and runaway reviews spotted
+from data.
+
+Usage:
+    review-telemetry.py record <history.jsonl> --pr NUMBER
+        [--outcome OUTCOME] [--mode full|incremental|chunked]
+        [--head-sha SHA] [--diff-lines N] [--chunks N] [--max-turns N]
+        [--claude-output FILE] [--review FILE] [--issue-latency-ms N]
+        [--comments N]
+    review-telemetry.py summarise <history.jsonl> [...] [--json]
+
+record options:
+    --outcome OUTCOME     How the run ended, e.g. "posted" or "failed"
+                          (default: posted).
+    --mode MODE           How the diff was reviewed (default: full).
+    --head-sha SHA        The PR head commit that was reviewed.
+    --diff-lines N        Lines in the reviewed diff.
+    --chunks N            Number of chunks a chunked review used.
+    --max-turns N         The turn limit Claude was run with.
+    --claude-output FILE  claude --output-format json output, or the
+                          combined stats of a chunked review (which add
+                          max_chunk_turns, the most turns any chunk took).
+    --review FILE         The review JSON, with issue numbers if issues
+                          were created.
+    --issue-latency-ms N  Wall clock time spent creating issues.
+    --comments N          Number of comments the review was posted as.
+
+summarise options:
+    --json                Print the summary as JSON instead of a table.
+
+Missing or unreadable inputs are recorded as null rather than failing the
+run; telemetry should never stop a review from being posted.
+
+Environment:
+    GITHUB_REPOSITORY: Repository in owner/repo format, recorded with
+                       each run.
+"""
+
+import datetime
+import json
+import math
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+ACTIONS = ('fix', 'document', 'consider', 'none')
+PERCENTILES = (50, 90, 99)
+
+# Fields summarised with percentiles, and how to label them
+SUMMARY_FIELDS = {
+    'num_turns': 'Turns',
+    'duration_ms': 'Duration (ms)',
+    'cost_usd': 'Cost (USD)',
+    'diff_lines': 'Diff lines',
+    'items': 'Items',
+    'issue_latency_ms': 'Issue creation (ms)',
+}
+
+# How many of the most expensive reviews to list
+TOP_COST_COUNT = 5
+
+
+def load_json(path: str | None) -> Any:
+    """Load a JSON file, returning None if it is missing or invalid."""
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f'Warning: Could not read {path}: {e}', file=sys.stderr)
+        return None
+
+
+def as_number(value: Any) -> int | float | None:
+    """Return value if it is a number, otherwise None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def build_record(options: dict[str, str]) -> dict:
+    """Build the telemetry record for one review run."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    record: dict[str, Any] = {
+        'timestamp': now.isoformat(timespec='seconds'),
+        'repository': os.environ.get('GITHUB_REPOSITORY'),
+        'pr': int(options['--pr']),
+        'head_sha': options.get('--head-sha'),
+        'outcome': options.get('--outcome', 'posted'),
+        'mode': options.get('--mode', 'full'),
+    }
+    for option in ('--diff-lines', '--chunks', '--max-turns',
+                   '--issue-latency-ms', '--comments'):
+        value = options.get(option)
+        record[option[2:].replace('-', '_')] = (
+            int(value) if value else None)
+
+    claude = load_json(options.get('--claude-output'))
+    if not isinstance(claude, dict):
+        claude = {}
+    record['num_turns'] = as_number(claude.get('num_turns'))
+    record['duration_ms'] = as_number(claude.get('duration_ms'))
+    record['cost_usd'] = as_number(claude.get('total_cost_usd'))
+    # A chunked review's turns are summed over its chunks, each of which had
+    # its own turn limit, so compare the busiest chunk against the limit
+    turns = as_number(claude.get('max_chunk_turns', claude.get('num_turns')))
+    record['hit_max_turns'] = (
+        turns is not None and record['max_turns'] is not None
+        and turns >= record['max_turns'])
+
+    review = load_json(options.get('--review'))
+    items = review.get('items', []) if isinstance(review, dict) else None
+    if items is None:
+        record['items'] = None
+    else:
+        record['items'] = len(items)
+        record['severity'] = {
+            severity: sum(1 for item in items
+                          if item.get('severity') == severity)
+            for severity in SEVERITIES}
+        record['action'] = {
+            action: sum(1 for item in items if item.get('action') == action)
+            for action in ACTIONS}
+        record['issues'] = sum(1 for item in items
+                               if item.get('issue_number'))
+    return record
+
+
+def append_record(history_path: Path, record: dict) -> None:
+    """Append one record to a JSON-lines history file."""
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def load_history(paths: list[Path]) -> list[dict]:
+    """Load the records from JSON-lines history files.
+
+    Lines which are not valid JSON objects (for example a record truncated
+    by a cancelled run) are reported and skipped.
+    """
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                if not isinstance(record, dict):
+                    print(f'Warning: Skipping {path}:{line_number}: '
+                          f'not a JSON object', file=sys.stderr)
+                    continue
+                records.append(record)
+    return records
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Return the nearest-rank percentile of a non-empty list of values."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarise(records: list[dict]) -> dict:
+    """Summarise review records into percentiles and cost figures."""
+    summary: dict[str, Any] = {
+        'runs': len(records),
+        'outcomes': {},
+        'modes': {},
+        'fields': {},
+    }
+    for record in records:
+        for key, counts in (('outcome', summary['outcomes']),
+                            ('mode', summary['modes'])):
+            value = record.get(key) or 'unknown'
+            counts[value] = counts.get(value, 0) + 1
+
+    for field in SUMMARY_FIELDS:
+        values = [record[field] for record in records
+                  if as_number(record.get(field)) is not None]
+        if not values:
+            continue
+        stats = {'count': len(values)}
+        for pct in PERCENTILES:
+            stats[f'p{pct}'] = percentile(values, pct)
+        stats['max'] = max(values)
+        summary['fields'][field] = stats
+
+    # Cost per thousand diff lines, over the runs which recorded both
+    costed = [record for record in records
+              if as_number(record.get('cost_usd')) is not None
+              and as_number(record.get('diff_lines'))]
+    if costed:
+        total_cost = sum(record['cost_usd'] for record in costed)
+        total_lines = sum(record['diff_lines'] for record in costed)
+        per_run = [record['cost_usd'] * 1000 / record['diff_lines']
+                   for record in costed]
+        summary['cost_per_1k_lines'] = {
+            'overall': total_cost * 1000 / total_lines,
+            'p50': percentile(per_run, 50),
+            'p90': percentile(per_run, 90),
+        }
+
+    summary['hit_max_turns'] = [
+        describe_run(record) for record in records
+        if record.get('hit_max_turns')]
+    by_cost = sorted(
+        (record for record in records
+         if as_number(record.get('cost_usd')) is not None),
+        key=lambda record: record['cost_usd'], reverse=True)
+    summary['most_expensive'] = [
+        describe_run(record) for record in by_cost[:TOP_COST_COUNT]]
+    return summary
+
+
+def describe_run(record: dict) -> dict:
+    """Return the fields which identify a run and what it cost."""
+    return {key: record.get(key) for key in (
+        'timestamp', 'repository', 'pr', 'head_sha', 'outcome', 'mode',
+        'diff_lines', 'num_turns', 'max_turns', 'cost_usd')}
+
+
+def format_value(value: float) -> str:
+    """Format a number for the summary table."""
+    if isinstance(value, float) and not value.is_integer():
+        return f'{value:.4f}' if value < 1 else f'{value:.2f}'
+    return str(int(value))
+
+
+def format_run(run: dict) -> str:
+    """Format a run from describe_run() as a single line."""
+    repository = f'{run["repository"]}#' if run.get('repository') else '#'
+    cost = run.get('cost_usd')
+    cost_text = f'${cost:.2f}' if cost is not None else '$?'
+    return (f'{repository}{run["pr"]} at {run.get("timestamp") or "?"}: '
+            f'{cost_text}, {run.get("num_turns")}/{run.get("max_turns")} '
+            f'turns, {run.get("diff_lines")} diff lines '
+            f'({run.get("mode")}, {run.get("outcome")})')
+
+
+def print_summary(summary: dict) -> None:
+    """Print a summary from summarise() as a plain text report."""
+    print(f'Review runs: {summary["runs"]}')
+    for key in ('outcomes', 'modes'):
+        counts = ', '.join(f'{name} {count}'
+                           for name, count in sorted(summary[key].items()))
+        print(f'  {key.capitalize()}: {counts or "none"}')
+    print()
+
+    header = ['Metric', 'Count'] + [f'p{pct}' for pct in PERCENTILES] + ['Max']
+    rows = [header]
+    for field, label in SUMMARY_FIELDS.items():
+        stats = summary['fields'].get(field)
+        if stats is None:
+            continue
+        rows.append([label, str(stats['count'])]
+                    + [format_value(stats[f'p{pct}']) for pct in PERCENTILES]
+                    + [format_value(stats['max'])])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        print('  '.join([row[0].ljust(widths[0])]
+                        + [cell.rjust(width)
+                           for cell, width in zip(row[1:], widths[1:])]))
+
+    cost = summary.get('cost_per_1k_lines')
+    if cost:
+        print()
+        print(f'Cost per 1k diff lines: ${cost["overall"]:.4f} overall, '
+              f'${cost["p50"]:.4f} p50, ${cost["p90"]:.4f} p90')
+
+    for key, title in (('hit_max_turns', 'Runs which hit max-turns'),
+                       ('most_expensive', 'Most expensive runs')):
+        if summary[key]:
+            print()
+            print(f'{title}:')
+            for run in summary[key]:
+                print(f'  {format_run(run)}')
+
+
+def parse_options(args: list[str]) -> tuple[list[str], dict[str, str]]:
+    """Split arguments into positional arguments and --option values."""
+    positional = []
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i] == '--json':
+            options['--json'] = 'true'
+        elif args[i].startswith('--'):
+            if i + 1 >= len(args):
+                print(f'Error: {args[i]} needs a value', file=sys.stderr)
+                sys.exit(1)
+            options[args[i]] = args[i + 1]
+            i += 1
+        else:
+            positional.append(args[i])
+        i += 1
+    return positional, options
+
+
+def main() -> None:
+    if len(sys.argv) < 3 or sys.argv[1] not in ('record', 'summarise'):
+        print(__doc__)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    paths, options = parse_options(sys.argv[2:])
+
+    if command == 'record':
+        if len(paths) != 1 or '--pr' not in options:
+            print(__doc__)
+            sys.exit(1)
+        record = build_record(options)
+        append_record(Path(paths[0]), record)
+        print(f'Recorded review telemetry for PR #{record["pr"]} '
+              f'in {paths[0]}')
+        return
+
+    if not paths:
+        print(__doc__)
+        sys.exit(1)
+    records = load_history([Path(path) for path in paths])
+    if not records:
+        print('Error: No review runs recorded', file=sys.stderr)
+        sys.exit(1)
+
+    summary = summarise(records)
+    if '--json' in options:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
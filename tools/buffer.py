@@ -1,6 +1,39 @@
 #!/usr/bin/python
+"""Non-blocking safe, buffered output for CI tools.
+
+GitHub Actions sometimes leaves a job's stdout and stderr in non-blocking
+mode. When the log pipe is full a write then fails with EAGAIN: Python
+raises BlockingIOError, and whatever did not fit is lost from the log, or
+the tool dies part way through. Chatty tools hit this most.
+
+install() replaces sys.stdout and sys.stderr with NonBlockingWriters. A
+write only appends to an in-memory buffer, and a background thread writes
+the buffer to the real file descriptor. It writes as soon as a line is
+complete, and at least every flush interval. If the descriptor is not
+ready the thread waits for it with poll() and retries, so nothing is
+dropped and the tool does not stall on its output. Everything is written
+out at exit. Only if the buffer grows past its high water mark, because
+nothing is reading the pipe at all, does a write wait.
+
+Run directly, this reports whether stdin, stdout and stderr are blocking.
+With --benchmark it instead compares a plain writer and a NonBlockingWriter
+on a non-blocking pipe with a slow reader.
+"""
+import argparse
+import atexit
+import io
 import os
+import select
 import sys
+import threading
+import time
+
+
+DEFAULT_FLUSH_INTERVAL = 0.1
+DEFAULT_HIGH_WATER = 64 * 1024 * 1024
+
+# How long to wait for a descriptor to become writable before trying again
+POLL_TIMEOUT_MS = 1000
 
 
 def get_status(fd):
@@ -10,10 +43,229 @@ def get_status(fd):
         return 'non-blocking'
 
 
+class NonBlockingWriter(io.TextIOBase):
+    """A line buffered text stream written out by a background thread."""
+
+    def __init__(self, fd, encoding='utf-8',
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 high_water=DEFAULT_HIGH_WATER):
+        self._fd = fd
+        self._encoding = encoding
+        self.flush_interval = flush_interval
+        self.high_water = high_water
+
+        self._buffer = bytearray()
+        self._writing = False
+        self._closing = False
+        self._broken = False
+        self._cond = threading.Condition()
+
+        self._poller = select.poll()
+        self._poller.register(fd, select.POLLOUT)
+
+        self._start_thread()
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _start_thread(self):
+        self._thread = threading.Thread(
+            target=self._run, name='NonBlockingWriter-%d' % self._fd,
+            daemon=True)
+        self._thread.start()
+
+    def _after_fork_in_child(self):
+        # Only the forking thread survives a fork. The parent still owns
+        # whatever was buffered, so start the child afresh.
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._writing = False
+        if not self._closing:
+            self._start_thread()
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    @property
+    def errors(self):
+        return 'backslashreplace'
+
+    @property
+    def line_buffering(self):
+        return True
+
+    def fileno(self):
+        return self._fd
+
+    def isatty(self):
+        return os.isatty(self._fd)
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        data = s.encode(self._encoding, errors='backslashreplace')
+        with self._cond:
+            if self._closing:
+                raise ValueError('I/O operation on closed file.')
+            self._buffer += data
+            if b'\n' in data:
+                self._cond.notify_all()
+
+            # Only wait if nothing is draining the pipe at all
+            while (len(self._buffer) > self.high_water and not self._broken
+                   and self._thread.is_alive()):
+                self._cond.notify_all()
+                self._cond.wait(self.flush_interval)
+        return len(s)
+
+    def flush(self):
+        """Wait until everything written so far is out."""
+        with self._cond:
+            self._cond.notify_all()
+            while ((self._buffer or self._writing) and not self._broken
+                   and self._thread.is_alive()):
+                self._cond.wait(self.flush_interval)
+
+    def close(self):
+        """Write out anything buffered and stop the writer thread."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        super().close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._buffer and not self._closing:
+                    self._cond.wait(self.flush_interval)
+                if not self._buffer:
+                    if self._closing:
+                        return
+                    continue
+                data = self._buffer
+                self._buffer = bytearray()
+                self._writing = True
+
+            self._write_all(data)
+
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        while view and not self._broken:
+            try:
+                written = os.write(self._fd, view)
+                view = view[written:]
+            except BlockingIOError:
+                self._poller.poll(POLL_TIMEOUT_MS)
+            except OSError:
+                # Nobody is listening any more, so there is nowhere to report
+                # this. Discard output from here on rather than blocking.
+                self._broken = True
+
+
+def install(flush_interval=DEFAULT_FLUSH_INTERVAL):
+    """Replace sys.stdout and sys.stderr with NonBlockingWriters.
+
+    Safe to call more than once. Returns the (stdout, stderr) writers.
+    """
+    writers = []
+    for name in ('stdout', 'stderr'):
+        stream = getattr(sys, name)
+        if not isinstance(stream, NonBlockingWriter):
+            stream.flush()
+            stream = NonBlockingWriter(
+                stream.fileno(), encoding=stream.encoding or 'utf-8',
+                flush_interval=flush_interval)
+            setattr(sys, name, stream)
+            atexit.register(stream.close)
+        writers.append(stream)
+    return tuple(writers)
+
+
+def _slow_reader(fd, delay, received):
+    while True:
+        data = os.read(fd, 4096)
+        if not data:
+            return
+        received[0] += len(data)
+        time.sleep(delay)
+
+
+def _benchmark_one(label, make_writer, lines, line, delay):
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(write_fd, False)
+    received = [0]
+    reader = threading.Thread(target=_slow_reader,
+                              args=(read_fd, delay, received),
+                              daemon=True)
+    reader.start()
+
+    writer = make_writer(write_fd)
+    errors = 0
+    start = time.monotonic()
+    for _ in range(lines):
+        try:
+            writer.write(line)
+        except BlockingIOError:
+            errors += 1
+    produced = time.monotonic() - start
+    try:
+        writer.close()
+    except BlockingIOError:
+        errors += 1
+    drained = time.monotonic() - start
+    os.close(write_fd)
+    reader.join()
+    os.close(read_fd)
+
+    sent = lines * len(line)
+    print('%-20s %9.0f lines/s written, %6.2fs to drain, '
+          '%6d EAGAIN errors, %5.1f%% of output lost'
+          % (label, lines / produced, drained, errors,
+             100.0 * (sent - received[0]) / sent))
+
+
+def benchmark(lines, line_length, delay):
+    """Write lines to a non-blocking pipe with a slow reader, both ways."""
+    line = 'x' * (line_length - 1) + '\n'
+    print('Writing %d lines of %d bytes to a non-blocking pipe, read 4KiB '
+          'at a time every %.1fms' % (lines, line_length, delay * 1000))
+    _benchmark_one(
+        'plain writer',
+        lambda fd: io.open(fd, 'w', buffering=1, closefd=False),
+        lines, line, delay)
+    _benchmark_one('NonBlockingWriter', NonBlockingWriter, lines, line, delay)
+
+
 if __name__ == '__main__':
-    stdin = sys.stdin.fileno()
-    stdout = sys.stdout.fileno()
-    stderr = sys.stderr.fileno()
+    parser = argparse.ArgumentParser(
+        description='Report whether stdin, stdout and stderr are blocking.')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare a plain writer and a NonBlockingWriter '
+                             'on a non-blocking pipe instead.')
+    parser.add_argument('--lines', type=int, default=100000,
+                        help='Lines to write in the benchmark '
+                             '(default: %(default)s).')
+    parser.add_argument('--line-length', type=int, default=100,
+                        help='Bytes per line in the benchmark '
+                             '(default: %(default)s).')
+    parser.add_argument('--reader-delay', type=float, default=0.0001,
+                        help='Seconds the benchmark reader sleeps between '
+                             'reads (default: %(default)s).')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.lines, args.line_length, args.reader_delay)
+    else:
+        stdin = sys.stdin.fileno()
+        stdout = sys.stdout.fileno()
+        stderr = sys.stderr.fileno()
 
-    print('stdin: %s, stdout: %s, stderr: %s'
-          % (get_status(stdin), get_status(stdout), get_status(stderr)))
+        print('stdin: %s, stdout: %s, stderr: %s'
+              % (get_status(stdin), get_status(stdout), get_status(stderr)))
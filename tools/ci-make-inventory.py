@@ -18,34 +18,225 @@
 # any node count: the single-node "smoke" (localhost) topology and the
 # multi-node slim-primary / slim-tier topologies all flow through the same code.
 #
-# The output is plain YAML built by hand (no PyYAML dependency assumed).
+# The output is plain YAML built by hand (no PyYAML dependency assumed), and
+# is written out line by line as it is rendered rather than joined into one
+# string first, so large topologies cost no more memory than small ones.
+#
+# Two options keep ansible's inventory parse time flat as the node count grows
+# into the hundreds:
+#
+#   --compact hoists the connection vars every node shares onto the allsf
+#       group, and writes consecutively numbered bare group members
+#       (hv-1, hv-2, ... hv-200) as a single ansible host range (hv-[1:200]).
+#   --layout directory writes --output as a directory holding inventory.yaml,
+#       with the shared vars in group_vars/allsf.yml and each node's own vars
+#       in host_vars/<name>.yml. The inventory itself is then bare membership,
+#       compacted into host ranges throughout. Pass the directory to
+#       ansible-playbook -i.
+#
+# Further options bake SSH connection speedups into the inventory, so every
+# playbook run against it benefits without changes to the playbooks:
+#
+#   --ssh-multiplex reuses one SSH connection per node across tasks
+#       (ControlMaster / ControlPersist) instead of a handshake per task.
+#   --ssh-compression compresses SSH traffic, for slow links.
+#   --pipelining runs modules over the existing SSH session instead of
+#       copying each one to the node first.
+#   --jump-host NAME reaches every other multi-node node on its mesh IP,
+#       through NAME, so only NAME's egress address is dialled directly.
+#
+# The multiplexing and compression options are written as ansible_ssh_args,
+# replacing ansible's default ssh_args, so that they are the first values ssh
+# sees for those options and take effect.
+#
+# The script is also an ansible dynamic inventory. Run with --list (or
+# --host NAME) instead of --output, it prints the inventory as JSON with every
+# host's vars in _meta.hostvars, so ansible neither re-parses YAML nor calls
+# back per host. As ansible passes only --list or --host, the other arguments
+# are read from the CI_INVENTORY_ARGS environment variable when they are not
+# on the command line:
+#
+#     export CI_INVENTORY_ARGS="--facts-file /srv/github/ci-topology-facts.json
+#         --ssh-user debian --ssh-key /tmp/ci_id_key --ssh-multiplex"
+#     ansible-playbook -i tools/ci-make-inventory.py ...
+#
+# The JSON is cached in CI_INVENTORY_CACHE_DIR (default: a directory under the
+# system temporary directory), keyed by a hash of the facts file and the
+# arguments, so the many playbook runs of one CI job only build it once.
 import argparse
+import hashlib
 import json
+import os
+import re
+import shlex
 import sys
+import tempfile
 
 
-def render_node_vars(node, indent):
-    """Render the per-host variable block for a single node.
+# The capability groups, and the facts-file flag which puts a node in each.
+# A node only appears in a group when its corresponding flag is set, so a
+# hypervisor that is not the network node (etc.) lands only where it should.
+# The database tier is emitted into BOTH database_node and the legacy
+# etcd_master group for one release cycle: actions@main is consumed at
+# runtime by every shakenfist branch, and pre-phase-7 copies of
+# examples/_shared/site.yml only read groups['etcd_master']. The dual
+# emission also exercises the deploy playbook's compatibility union and
+# deprecation warning on every CI run. Remove etcd_master here when the
+# fallback is removed from site.yml next release.
+GROUP_FLAGS = (
+    ('hypervisors', 'is_hypervisor'),
+    ('network_node', 'is_network_node'),
+    ('database_node', 'is_database_node'),
+    ('etcd_master', 'is_database_node'),
+)
+
+# Connection vars which are usually the same for every node, and so can be
+# set once on the allsf group instead of on each host when they are.
+SHARED_VARS = (
+    'ansible_user',
+    'ansible_ssh_private_key_file',
+    'ansible_ssh_args',
+    'ansible_ssh_common_args',
+    'ansible_pipelining',
+)
+
+SSH_BASE_ARGS = '-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null'
+DEFAULT_CONTROL_PERSIST = 600
+
+# ansible's own multiplexing defaults, kept when only compression is asked for
+ANSIBLE_DEFAULT_MULTIPLEX = '-o ControlMaster=auto -o ControlPersist=60s'
+
+# Values which can be written as a plain YAML scalar without quoting
+PLAIN_SCALAR_RE = re.compile(r'^[A-Za-z0-9_./@-][A-Za-z0-9_./:@-]*$')
+
+# A host name ending in a number, which can be part of a host range
+NUMBERED_HOST_RE = re.compile(r'^(.*?)([0-9]+)$')
+
+
+def yaml_scalar(value):
+    """Render a string as a YAML scalar, single-quoting it if necessary."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    value = str(value)
+    if PLAIN_SCALAR_RE.match(value):
+        return value
+    return "'%s'" % value.replace("'", "''")
+
+
+def ssh_speedup_args(connection):
+    """Return the SSH arguments for the connection speedups requested.
+
+    `connection` is a dict of the connection options from the command line;
+    see connection_options(). These are emitted as ansible_ssh_args, which
+    replace ansible's default ssh_args (-C -o ControlMaster=auto
+    -o ControlPersist=60s). ssh keeps the first value it sees for an option
+    and the defaults come first on the command line, so the same options in
+    ansible_ssh_common_args would be ignored. Returns None when no speedup
+    is requested, leaving ansible's defaults alone.
+    """
+    args = []
+    if connection.get('multiplex'):
+        args.append('-o ControlMaster=auto -o ControlPersist=%ds'
+                    % connection['control_persist'])
+        if connection.get('control_path'):
+            args.append('-o ControlPath=%s' % connection['control_path'])
+    elif connection.get('compression'):
+        args.append(ANSIBLE_DEFAULT_MULTIPLEX)
+    if connection.get('compression'):
+        args.append('-o Compression=yes')
+    return ' '.join(args) or None
+
+
+def proxy_command(jump, connection):
+    """Return the ProxyCommand option which reaches a node through `jump`.
+
+    The jump connection is multiplexed too when a control path is set;
+    without one, the nested ssh has nowhere to keep its master socket. The
+    outer ssh expands % tokens in ProxyCommand, so those meant for the
+    nested ssh (such as %C in the control path) are escaped as %%.
+    """
+    args = SSH_BASE_ARGS
+    if connection.get('multiplex') and connection.get('control_path'):
+        args += ' ' + ssh_speedup_args(connection)
+    elif connection.get('compression'):
+        args += ' -o Compression=yes'
+    return ('-o ProxyCommand="ssh -W %%h:%%p -q -i %s %s %s@%s"'
+            % (jump['ssh_key'], args.replace('%', '%%'), jump['ssh_user'],
+               jump['egress_ip']))
+
+
+def node_vars(node, connection=None):
+    """Return the per-host variables for a single node, in render order.
 
     `node` is a dict with the keys name, egress_ip, egress_nic, mesh_ip,
-    mesh_nic, ssh_user, ssh_key. `indent` is the leading whitespace for the
-    host key (the vars sit two spaces deeper).
+    mesh_nic, ssh_user, ssh_key. `connection` holds the optional connection
+    speedups from connection_options().
     """
-    pad = indent + '  '
-    lines = [
-        '%s%s:' % (indent, node['name']),
-        '%sansible_host: %s' % (pad, node['egress_ip']),
-        '%sansible_user: %s' % (pad, node['ssh_user']),
-        '%sansible_ssh_private_key_file: %s' % (pad, node['ssh_key']),
-        "%sansible_ssh_common_args: '-o StrictHostKeyChecking=no "
-        "-o UserKnownHostsFile=/dev/null'" % pad,
-        '%snode_name: %s' % (pad, node['name']),
-        '%snode_egress_ip: %s' % (pad, node['egress_ip']),
-        '%snode_egress_nic: %s' % (pad, node['egress_nic']),
-        '%snode_mesh_ip: %s' % (pad, node['mesh_ip']),
-        '%snode_mesh_nic: %s' % (pad, node['mesh_nic']),
+    connection = connection or {}
+    host = node['egress_ip']
+    common_args = SSH_BASE_ARGS
+
+    # Nodes behind the jump host are reached on their mesh IP. A node without
+    # a separate mesh interface (single-node) is always dialled directly.
+    jump = connection.get('jump_host')
+    if (jump and node['name'] != jump['name']
+            and node['mesh_ip'] != node['egress_ip']):
+        host = node['mesh_ip']
+        common_args += ' ' + proxy_command(jump, connection)
+
+    variables = [
+        ('ansible_host', host),
+        ('ansible_user', node['ssh_user']),
+        ('ansible_ssh_private_key_file', node['ssh_key']),
     ]
-    return lines
+    speedup_args = ssh_speedup_args(connection)
+    if speedup_args:
+        variables.append(('ansible_ssh_args', speedup_args))
+    variables.append(('ansible_ssh_common_args', common_args))
+    if connection.get('pipelining'):
+        variables.append(('ansible_pipelining', True))
+    return variables + [
+        ('node_name', node['name']),
+        ('node_egress_ip', node['egress_ip']),
+        ('node_egress_nic', node['egress_nic']),
+        ('node_mesh_ip', node['mesh_ip']),
+        ('node_mesh_nic', node['mesh_nic']),
+    ]
+
+
+def render_vars(variables, indent):
+    """Render (name, value) pairs as YAML mapping lines at `indent`."""
+    for name, value in variables:
+        yield '%s%s: %s' % (indent, name, yaml_scalar(value))
+
+
+def render_node_vars(node, indent, connection=None, exclude=()):
+    """Render the per-host variable block for a single node.
+
+    `indent` is the leading whitespace for the host key (the vars sit two
+    spaces deeper). Vars named in `exclude` are left out, for when they are
+    set on a group instead.
+    """
+    yield '%s%s:' % (indent, node['name'])
+    yield from render_vars(
+        [(name, value) for name, value in node_vars(node, connection)
+         if name not in exclude],
+        indent + '  ')
+
+
+def shared_vars(nodes, connection=None):
+    """Return the SHARED_VARS which have the same value on every node.
+
+    A jump host layout gives the jump host different SSH arguments to the
+    nodes behind it, for example, so those stay per host.
+    """
+    shared = None
+    for node in nodes:
+        candidates = {(name, value) for name, value
+                      in node_vars(node, connection) if name in SHARED_VARS}
+        shared = candidates if shared is None else shared & candidates
+    return [(name, value) for name, value in node_vars(nodes[0], connection)
+            if (name, value) in (shared or set())]
 
 
 def render_group_member(node_name, indent):
@@ -53,47 +244,152 @@ def render_group_member(node_name, indent):
     return ['%s%s:' % (indent, node_name)]
 
 
-def render_inventory(nodes):
-    """Render the complete inventory YAML for the given list of nodes.
+def bucket_nodes(nodes):
+    """Sort nodes into their capability groups in a single pass.
+
+    Returns a dict of group name to the names of its member nodes, in node
+    order.
+    """
+    groups = {group: [] for group, _ in GROUP_FLAGS}
+    for node in nodes:
+        for group, flag in GROUP_FLAGS:
+            if node[flag]:
+                groups[group].append(node['name'])
+    return groups
+
+
+def compact_hosts(names):
+    """Collapse runs of consecutively numbered hosts into host ranges.
+
+    Only neighbouring names are merged, so the host order is unchanged. A
+    run must share its prefix and, if zero padded, its number width; this
+    is what ansible's [start:end] range syntax expands back into. Runs of
+    fewer than three hosts are left as they are.
+    """
+    patterns = []
+    run = []
+
+    def flush():
+        if len(run) >= 3:
+            prefix, first = run[0]
+            patterns.append('%s[%s:%s]' % (prefix, first, run[-1][1]))
+        else:
+            patterns.extend(prefix + number for prefix, number in run)
+        run.clear()
+
+    for name in names:
+        m = NUMBERED_HOST_RE.match(name)
+        if not m:
+            flush()
+            patterns.append(name)
+            continue
+
+        prefix, number = m.groups()
+        if run:
+            last_prefix, last_number = run[-1]
+            padded = last_number.startswith('0') and len(last_number) > 1
+            follows = (
+                prefix == last_prefix
+                and int(number) == int(last_number) + 1
+                and (len(number) == len(last_number) if padded
+                     else not number.startswith('0')))
+            if not follows:
+                flush()
+        run.append((prefix, number))
+    flush()
+    return patterns
+
+
+def render_inventory_lines(nodes, connection=None, compact=False,
+                           host_vars=False):
+    """Generate the inventory YAML for the given nodes, one line at a time.
 
     Every node lands in allsf (with its full var block) and in each of the
     hypervisors / network_node / database_node groups it belongs to (bare
     membership; vars live on allsf). This matches the group shape of
     examples/cluster/inventory.yaml and collapses to a single node in every
     group for the single-node smoke case.
+
+    With `compact`, the vars every node shares are set once on allsf, and
+    bare group members are compacted into host ranges. With `host_vars`, no
+    vars are rendered at all (they are written to group_vars / host_vars
+    files instead) and allsf is bare membership too.
     """
-    lines = ['---', 'all:', '  children:']
+    def members(names):
+        if compact or host_vars:
+            names = compact_hosts(names)
+        for name in names:
+            yield from render_group_member(name, '        ')
+
+    yield '---'
+    yield 'all:'
+    yield '  children:'
 
     # allsf carries the per-host variable blocks.
-    lines.append('    allsf:')
-    lines.append('      hosts:')
-    for node in nodes:
-        lines.extend(render_node_vars(node, '        '))
+    yield '    allsf:'
+    exclude = ()
+    if compact and not host_vars and nodes:
+        hoisted = shared_vars(nodes, connection)
+        exclude = {name for name, _ in hoisted}
+        if hoisted:
+            yield '      vars:'
+            yield from render_vars(hoisted, '        ')
+    yield '      hosts:'
+    if host_vars:
+        yield from members([node['name'] for node in nodes])
+    else:
+        for node in nodes:
+            yield from render_node_vars(
+                node, '        ', connection=connection, exclude=exclude)
 
     # The capability groups carry bare membership; vars live on allsf above.
-    # A node only appears in a group when its corresponding flag is set, so a
-    # hypervisor that is not the network node (etc.) lands only where it should.
-    # The database tier is emitted into BOTH database_node and the legacy
-    # etcd_master group for one release cycle: actions@main is consumed at
-    # runtime by every shakenfist branch, and pre-phase-7 copies of
-    # examples/_shared/site.yml only read groups['etcd_master']. The dual
-    # emission also exercises the deploy playbook's compatibility union and
-    # deprecation warning on every CI run. Remove etcd_master here when the
-    # fallback is removed from site.yml next release.
-    group_flags = (
-        ('hypervisors', 'is_hypervisor'),
-        ('network_node', 'is_network_node'),
-        ('database_node', 'is_database_node'),
-        ('etcd_master', 'is_database_node'),
-    )
-    for group, flag in group_flags:
-        lines.append('    %s:' % group)
-        lines.append('      hosts:')
-        for node in nodes:
-            if node[flag]:
-                lines.extend(render_group_member(node['name'], '        '))
+    groups = bucket_nodes(nodes)
+    for group, _ in GROUP_FLAGS:
+        yield '    %s:' % group
+        yield '      hosts:'
+        yield from members(groups[group])
+
+
+def render_inventory(nodes, connection=None, compact=False):
+    """Render the complete inventory YAML for the given list of nodes."""
+    return '\n'.join(render_inventory_lines(
+        nodes, connection=connection, compact=compact)) + '\n'
 
-    return '\n'.join(lines) + '\n'
+
+def write_lines(lines, path, echo=None):
+    """Write generated lines to path as they are produced, and to echo."""
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(line + '\n')
+            if echo:
+                echo.write(line + '\n')
+
+
+def write_vars_layout(nodes, output_dir, connection=None, echo=None):
+    """Write a directory inventory: inventory.yaml plus group and host vars.
+
+    Ansible reads group_vars/ and host_vars/ from beside the inventory file,
+    so the inventory itself only describes group membership.
+    """
+    for subdir in ('group_vars', 'host_vars'):
+        os.makedirs(os.path.join(output_dir, subdir), exist_ok=True)
+
+    inventory_path = os.path.join(output_dir, 'inventory.yaml')
+    write_lines(render_inventory_lines(nodes, host_vars=True),
+                inventory_path, echo=echo)
+
+    hoisted = shared_vars(nodes, connection)
+    exclude = {name for name, _ in hoisted}
+    write_lines(['---'] + list(render_vars(hoisted, '')),
+                os.path.join(output_dir, 'group_vars', 'allsf.yml'))
+
+    for node in nodes:
+        write_lines(
+            ['---'] + list(render_vars(
+                [(name, value) for name, value in node_vars(node, connection)
+                 if name not in exclude], '')),
+            os.path.join(output_dir, 'host_vars', '%s.yml' % node['name']))
+    return inventory_path
 
 
 def build_node(spec, ssh_user, ssh_key):
@@ -120,37 +416,178 @@ def build_node(spec, ssh_user, ssh_key):
     }
 
 
+def render_json_inventory(nodes, connection=None):
+    """Build the inventory as an ansible dynamic inventory JSON document.
+
+    Every host's vars are in _meta.hostvars, which tells ansible not to call
+    the script again with --host for each one.
+    """
+    groups = bucket_nodes(nodes)
+    inventory = {
+        '_meta': {
+            'hostvars': {
+                node['name']: dict(node_vars(node, connection))
+                for node in nodes
+            },
+        },
+        'all': {'children': ['allsf'] + [group for group, _ in GROUP_FLAGS]},
+        'allsf': {'hosts': [node['name'] for node in nodes]},
+    }
+    for group, _ in GROUP_FLAGS:
+        inventory[group] = {'hosts': groups[group]}
+    return inventory
+
+
+def inventory_cache_path(facts_data, args):
+    """Return the cache file for an inventory built from these inputs."""
+    key = hashlib.sha256(facts_data)
+    settings = {name: value for name, value in sorted(vars(args).items())
+                if name not in ('list', 'host')}
+    key.update(json.dumps(settings, sort_keys=True).encode())
+    cache_dir = os.environ.get(
+        'CI_INVENTORY_CACHE_DIR',
+        os.path.join(tempfile.gettempdir(), 'ci-make-inventory'))
+    return os.path.join(cache_dir, '%s.json' % key.hexdigest())
+
+
+def dynamic_inventory(args, facts_data, parser):
+    """Return the JSON inventory, from the cache if it has been built before.
+
+    The cache file is written to a temporary name and renamed into place, so
+    concurrent ansible runs never read a partial file.
+    """
+    cache_path = inventory_cache_path(facts_data, args)
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    nodes = load_nodes(facts_data, args, parser)
+    inventory = render_json_inventory(
+        nodes, connection_options(args, nodes, parser))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = '%s.%d' % (cache_path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(inventory, f)
+    os.replace(temp_path, cache_path)
+    return inventory
+
+
+def load_nodes(facts_data, args, parser):
+    """Parse the facts file contents into render-ready node dicts."""
+    facts = json.loads(facts_data)
+
+    node_specs = facts['nodes']
+    if not node_specs:
+        parser.error('The facts file lists no nodes.')
+
+    return [build_node(spec, args.ssh_user, args.ssh_key)
+            for spec in node_specs]
+
+
+def connection_options(args, nodes, parser):
+    """Build the connection options dict from the parsed command line."""
+    connection = {
+        'multiplex': args.ssh_multiplex,
+        'control_persist': args.ssh_control_persist,
+        'control_path': args.ssh_control_path,
+        'compression': args.ssh_compression,
+        'pipelining': args.pipelining,
+        'jump_host': None,
+    }
+    if args.jump_host:
+        jump = [node for node in nodes if node['name'] == args.jump_host]
+        if not jump:
+            parser.error('Jump host %s is not in the facts file.'
+                         % args.jump_host)
+        connection['jump_host'] = jump[0]
+    return connection
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Generate an ansible inventory for the collection deploy.')
-    parser.add_argument('--facts-file', required=True,
+    parser.add_argument('--facts-file',
                         help='Path to the JSON topology facts file written by '
                              'the topology playbook.')
-    parser.add_argument('--ssh-user', required=True,
+    parser.add_argument('--ssh-user',
                         help='SSH user for the provisioned node(s).')
-    parser.add_argument('--ssh-key', required=True,
+    parser.add_argument('--ssh-key',
                         help='Path to the SSH private key file.')
-    parser.add_argument('--output', required=True,
-                        help='Path to write the generated inventory to.')
-
-    args = parser.parse_args()
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--output',
+                        help='Path to write the generated inventory to. With '
+                             '--layout directory, the directory to write the '
+                             'inventory and its vars files into.')
+    output.add_argument('--list', action='store_true',
+                        help='Print the inventory as dynamic inventory JSON.')
+    output.add_argument('--host',
+                        help='Print the vars of one host as JSON.')
+    parser.add_argument('--layout', choices=('file', 'directory'),
+                        default='file',
+                        help='Write a single inventory file (the default), or '
+                             'a directory with group_vars and host_vars.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Set shared vars once on allsf and write '
+                             'numbered group members as host ranges.')
+    parser.add_argument('--ssh-multiplex', action='store_true',
+                        help='Reuse one SSH connection per node across tasks '
+                             '(ControlMaster / ControlPersist).')
+    parser.add_argument('--ssh-control-persist', type=int,
+                        default=DEFAULT_CONTROL_PERSIST,
+                        help='Seconds an idle multiplexed connection is kept '
+                             'open (default %(default)s).')
+    parser.add_argument('--ssh-control-path',
+                        help='ControlPath for multiplexed connections, e.g. '
+                             '/tmp/ci-ssh-%%C. Needed to multiplex the jump '
+                             'host connection; ansible picks its own path '
+                             'for direct connections otherwise.')
+    parser.add_argument('--ssh-compression', action='store_true',
+                        help='Compress SSH traffic.')
+    parser.add_argument('--pipelining', action='store_true',
+                        help='Enable ansible pipelining.')
+    parser.add_argument('--jump-host',
+                        help='Name of the node to reach every other node '
+                             'through, on its mesh IP.')
 
-    with open(args.facts_file) as f:
-        facts = json.load(f)
+    # Ansible runs a dynamic inventory with only --list or --host, so the
+    # rest of the arguments can come from the environment.
+    argv = sys.argv[1:]
+    if '--list' in argv or '--host' in argv:
+        argv = shlex.split(os.environ.get('CI_INVENTORY_ARGS', '')) + argv
+    args = parser.parse_args(argv)
 
-    node_specs = facts['nodes']
-    if not node_specs:
-        parser.error('The facts file lists no nodes.')
+    for required in ('facts_file', 'ssh_user', 'ssh_key'):
+        if not getattr(args, required):
+            parser.error('--%s is required.' % required.replace('_', '-'))
 
-    nodes = [build_node(spec, args.ssh_user, args.ssh_key) for spec in node_specs]
+    with open(args.facts_file, 'rb') as f:
+        facts_data = f.read()
 
-    inventory = render_inventory(nodes)
+    if args.list or args.host:
+        inventory = dynamic_inventory(args, facts_data, parser)
+        if args.list:
+            json.dump(inventory, sys.stdout)
+        else:
+            json.dump(inventory['_meta']['hostvars'].get(args.host, {}),
+                      sys.stdout)
+        sys.stdout.write('\n')
+        return
 
-    with open(args.output, 'w') as f:
-        f.write(inventory)
+    nodes = load_nodes(facts_data, args, parser)
+    connection = connection_options(args, nodes, parser)
 
-    sys.stderr.write('Wrote inventory for %d node(s) to %s\n' % (len(nodes), args.output))
-    sys.stderr.write(inventory)
+    sys.stderr.write('Writing inventory for %d node(s) to %s\n'
+                     % (len(nodes), args.output))
+    if args.layout == 'directory':
+        write_vars_layout(nodes, args.output, connection=connection,
+                          echo=sys.stderr)
+    else:
+        write_lines(render_inventory_lines(nodes, connection=connection,
+                                           compact=args.compact),
+                    args.output, echo=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Measure the sf-api SIGTERM drain under load on a live cluster node.
+#
+# ci_drain_check.sh proves /readyz flips to 503 before sf-api exits, using
+# single probes. This drives a steady concurrent request load at the API
+# while sf-api is stopped via systemd, records the latency and outcome of
+# every request across the drain, and watches /readyz throughout. A zero
+# downtime restart means that no request the node accepted was lost:
+#
+#   dropped  -- the connection was reset, closed without a response, or
+#               timed out.
+#   failed   -- a 5xx response.
+#   refused  -- the connection was refused.
+#   slow     -- answered, but slower than --slow-ms. Reported, not failed.
+#
+# A load balancer stops routing to the node once it sees /readyz say 503,
+# which takes it up to a health check interval (--lb-delay). Dropped, failed
+# or refused requests started before then fail the check. Those started
+# later are reported, but are requests no load balancer would have sent.
+#
+# Afterwards sf-api is started again and must return to /readyz 200, so the
+# node is left in rotation. The report gives counts and latencies before
+# /readyz flipped and while draining, and when /readyz flipped relative to
+# the SIGTERM; --output also writes one JSON record per request.
+#
+# Intended to be run as root on a cluster node via run_remote. Standard
+# library only, so it runs under the system python3.
+import argparse
+import concurrent.futures
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class DrainLoad(object):
+    def __init__(self, url, paths, timeout):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.paths = paths
+        self.timeout = timeout
+
+        self.start = time.monotonic()
+        self.records = []
+        self.readyz = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def now(self):
+        return time.monotonic() - self.start
+
+    def request(self, path):
+        """Make one request, returning (status or None, outcome)."""
+        connection = http.client.HTTPConnection(self.host, self.port,
+                                                timeout=self.timeout)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                return response.status, 'failed'
+            return response.status, 'ok'
+        except ConnectionRefusedError:
+            return None, 'refused'
+        except (ConnectionError, http.client.HTTPException, socket.timeout,
+                OSError):
+            return None, 'dropped'
+        finally:
+            connection.close()
+
+    def worker(self, index):
+        path = self.paths[index % len(self.paths)]
+        while not self.stopping.is_set():
+            started = self.now()
+            status, outcome = self.request(path)
+            record = {'path': path, 'start': round(started, 4),
+                      'latency': round(self.now() - started, 4),
+                      'status': status, 'outcome': outcome}
+            with self.lock:
+                self.records.append(record)
+            if outcome == 'refused':
+                # Nothing is listening, so do not spin
+                time.sleep(0.05)
+
+    def watch_readyz(self, interval):
+        last = None
+        while not self.stopping.is_set():
+            status, _ = self.request('/readyz')
+            if status != last:
+                self.readyz.append((round(self.now(), 4), status))
+                print('    %7.2fs: /readyz=%s' % (self.now(), status or '-'),
+                      flush=True)
+                last = status
+            time.sleep(interval)
+
+    def first_readyz_after(self, when, status):
+        for at, seen in self.readyz:
+            if at >= when and seen == status:
+                return at
+        return None
+
+
+def wait_ready(load, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, _ = load.request('/readyz')
+        if status == 200:
+            return True
+        time.sleep(1)
+    return False
+
+
+def summarise(label, records, slow):
+    latencies = [r['latency'] for r in records if r['outcome'] == 'ok']
+    by_outcome = {}
+    for r in records:
+        by_outcome[r['outcome']] = by_outcome.get(r['outcome'], 0) + 1
+    print('    %-10s %6d requests: %5d ok, %4d dropped, %4d failed, '
+          '%4d refused, %4d slow; latency p50 %.3fs p99 %.3fs max %.3fs'
+          % (label, len(records), by_outcome.get('ok', 0),
+             by_outcome.get('dropped', 0), by_outcome.get('failed', 0),
+             by_outcome.get('refused', 0),
+             len([lat for lat in latencies if lat > slow]),
+             percentile(latencies, 0.5), percentile(latencies, 0.99),
+             max(latencies or [0])))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure the sf-api SIGTERM drain under request load.')
+    parser.add_argument('--url', default='http://localhost:13000',
+                        help='sf-api to load (default: %(default)s).')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='Path to request, may be repeated '
+                             '(default: /).')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Concurrent requests (default: %(default)s).')
+    parser.add_argument('--warmup', type=float, default=5,
+                        help='Seconds of load before the SIGTERM '
+                             '(default: %(default)s).')
+    parser.add_argument('--stop-timeout', type=float, default=80,
+                        help='Seconds to wait for the stop to complete '
+                             '(default: %(default)s).')
+    parser.add_argument('--request-timeout', type=float, default=10,
+                        help='Seconds before a request counts as dropped '
+                             '(default: %(default)s).')
+    parser.add_argument('--slow-ms', type=int, default=1000,
+                        help='Milliseconds after which an answered request '
+                             'is slow (default: %(default)s).')
+    parser.add_argument('--lb-delay', type=float, default=1,
+                        help='Seconds a load balancer takes to stop routing '
+                             'after /readyz says 503 (default: '
+                             '%(default)s).')
+    parser.add_argument('--readyz-interval', type=float, default=0.1,
+                        help='Seconds between /readyz checks '
+                             '(default: %(default)s).')
+    parser.add_argument('--output',
+                        help='Write a JSON record per request to this file.')
+    args = parser.parse_args()
+
+    load = DrainLoad(args.url, args.paths or ['/'], args.request_timeout)
+    slow = args.slow_ms / 1000.0
+    failures = 0
+
+    print()
+    print('=== sf-api SIGTERM drain under load ===')
+    print()
+
+    print('Step 1: assert baseline health.')
+    if not wait_ready(load, 10):
+        print('FAILURE: baseline /readyz is not 200. Node not healthy, '
+              'aborting.')
+        sys.exit(1)
+    print()
+
+    print('Step 2: %d concurrent clients for %.0fs, then stopping sf-api '
+          '(SIGTERM).' % (args.concurrency, args.warmup))
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=args.concurrency + 1) as pool:
+        pool.submit(load.watch_readyz, args.readyz_interval)
+        for index in range(args.concurrency):
+            pool.submit(load.worker, index)
+
+        time.sleep(args.warmup)
+        sigterm_at = load.now()
+        try:
+            stop = subprocess.Popen(['systemctl', 'stop', 'sf-api'])
+            try:
+                stop.wait(timeout=args.stop_timeout)
+            except subprocess.TimeoutExpired:
+                print('    stop did not complete within %.0fs.'
+                      % args.stop_timeout)
+            stopped_at = load.now()
+        finally:
+            load.stopping.set()
+            # Whatever happened, never leave the node out of rotation
+            subprocess.run(['systemctl', 'start', 'sf-api'])
+    print()
+
+    flipped_at = load.first_readyz_after(sigterm_at, 503)
+    print('Step 3: results.')
+    print('    SIGTERM at %.2fs, stop finished after %.2fs.'
+          % (sigterm_at, stopped_at - sigterm_at))
+    if flipped_at is None:
+        print('FAILURE: never observed /readyz=503 after the SIGTERM.')
+        failures += 1
+        flipped_at = stopped_at
+    else:
+        print('    /readyz flipped to 503 %.3fs after the SIGTERM.'
+              % (flipped_at - sigterm_at))
+
+    phases = (
+        ('before', [r for r in load.records if r['start'] < flipped_at]),
+        ('draining', [r for r in load.records if r['start'] >= flipped_at]),
+    )
+    for label, records in phases:
+        summarise(label, records, slow)
+
+    routed_until = flipped_at + args.lb_delay
+    lost = [r for r in load.records
+            if r['outcome'] in ('dropped', 'failed', 'refused')]
+    for outcome in ('dropped', 'failed', 'refused'):
+        bad = [r for r in lost
+               if r['outcome'] == outcome and r['start'] < routed_until]
+        if bad:
+            print('FAILURE: %d requests %s while still routed to, the first '
+                  'at %.2fs.' % (len(bad), outcome,
+                                 min(r['start'] for r in bad)))
+            failures += 1
+    unrouted = len([r for r in lost if r['start'] >= routed_until])
+    if unrouted:
+        print('    %d requests not answered after %.2fs, when a load '
+              'balancer would have stopped routing (not failures).'
+              % (unrouted, routed_until))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            for record in load.records:
+                f.write(json.dumps(record) + '\n')
+    print()
+
+    print('Step 4: sf-api started again, waiting for /readyz=200.')
+    if wait_ready(load, 60):
+        print('    /readyz=200, node recovered.')
+    else:
+        print('FAILURE: sf-api did not return /readyz=200 within 60s after '
+              'restart.')
+        failures += 1
+    print()
+
+    if failures:
+        print('DRAIN LOAD CHECK FAILED: %d failure(s) detected.' % failures)
+        sys.exit(1)
+    print('DRAIN LOAD CHECK PASSED: no request was lost while sf-api '
+          'drained.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Collect clingwrap log bundles from every CI node at once.
+#
+# clingwrap is started on all nodes at the same time. Each node then streams
+# its bundle back as a compressed tar on the ssh session's stdout (over the
+# node's multiplexed connection, see remote_exec.py), and the stream is
+# extracted into <bundle-dir>/<node>/ as it arrives, so there is no zip to
+# fetch and unpack afterwards. The bundle is compressed with zstd if both
+# ends have it, and gzip otherwise.
+#
+# Each node has its own timeout, so a hung node only loses its own bundle.
+# Collection is best effort: failures are reported, and the node's stderr
+# kept in <bundle-dir>/<node>/gather.log, but the exit status is only
+# non-zero if the arguments are wrong.
+#
+# Nodes are given either as NODE=ADDRESS arguments, reached with --user and
+# --key, or with --nodes-json as a JSON list of objects with the keys name
+# and host, and optionally user, key and ssh_args. The gather playbooks pass
+# each node's connection details from the inventory this way (ansible_user,
+# ansible_ssh_private_key_file and ansible_ssh_common_args, which carries
+# the ProxyCommand for nodes only reachable through a jump host).
+#
+# Usage:
+#     ci_gather_bundles.py --bundle-dir DIR [--cwd-file FILE] NODE=ADDRESS...
+#     ci_gather_bundles.py --bundle-dir DIR [--cwd-file FILE] --nodes-json JSON
+import argparse
+import base64
+import concurrent.futures
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+
+from remote_exec import DEFAULT_KEY, DEFAULT_USER, RemoteExecutor
+
+
+CLINGWRAP_SOURCE = 'git+https://github.com/shakenfist/clingwrap'
+DEFAULT_TARGET = 'shakenfist-ci-failure'
+DEFAULT_TIMEOUT = 900
+COPY_SIZE = 1024 * 1024
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Passed through to the nodes, which may need the proxy to install clingwrap
+FORWARDED_ENVIRONMENT = ('http_proxy', 'https_proxy', 'HTTP_PROXY',
+                         'HTTPS_PROXY', 'no_proxy', 'NO_PROXY',
+                         'PIP_INDEX_URL')
+
+# Runs as root on each node with bash -s. Everything but the bundle goes to
+# stderr, as stdout carries the tar stream.
+REMOTE_SCRIPT = """set -e
+%(environment)s
+work=$(mktemp -d)
+trap 'rm -rf "${work}"' EXIT
+{
+  %(write_cwd)s
+  python3 -mvenv /tmp/clingwrap
+  /tmp/clingwrap/bin/pip3 install -q %(source)s
+  /tmp/clingwrap/bin/clingwrap gather --target %(target)s \\
+      --output "${work}/bundle.zip"
+  mkdir "${work}/bundle"
+  python3 -m zipfile -e "${work}/bundle.zip" "${work}/bundle"
+} >&2
+cd "${work}/bundle"
+if %(use_zstd)s && command -v zstd > /dev/null; then
+  tar -cf - . | zstd -q -c -T0
+else
+  tar -czf - .
+fi
+"""
+
+
+def remote_script(target, cwd_file, use_zstd):
+    """Return the script which gathers and streams a node's bundle."""
+    environment = '\n'.join(
+        'export %s=%s' % (name, shlex.quote(os.environ[name]))
+        for name in FORWARDED_ENVIRONMENT if name in os.environ)
+
+    write_cwd = ''
+    if cwd_file:
+        with open(cwd_file, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode()
+        target = '/tmp/%s' % os.path.basename(cwd_file)
+        write_cwd = 'echo %s | base64 -d > %s' % (encoded, target)
+
+    return (REMOTE_SCRIPT % {
+        'environment': environment,
+        'write_cwd': write_cwd,
+        'source': CLINGWRAP_SOURCE,
+        'target': shlex.quote(target),
+        'use_zstd': 'true' if use_zstd else 'false',
+    }).encode()
+
+
+def extract_command(magic, dest):
+    """Return the tar command which extracts a stream starting with magic."""
+    if magic.startswith(ZSTD_MAGIC):
+        return ['tar', '-I', 'zstd', '-xf', '-', '-C', dest]
+    if magic.startswith(GZIP_MAGIC):
+        return ['tar', '-xzf', '-', '-C', dest]
+    return None
+
+
+def collect(executor, node, address, script, bundle_dir, timeout):
+    """Stream one node's bundle into bundle_dir/node.
+
+    Returns (status, bytes received, seconds taken).
+    """
+    start = time.monotonic()
+    dest = os.path.join(bundle_dir, node)
+    os.makedirs(dest, exist_ok=True)
+
+    with open(os.path.join(dest, 'gather.log'), 'wb') as log:
+        executor.connect(address)
+        ssh = subprocess.Popen(
+            executor.ssh_args(address) + ['sudo', 'bash', '-s'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log)
+        processes = [ssh]
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            for process in processes:
+                process.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        received = 0
+        command = tar = None
+        try:
+            ssh.stdin.write(script)
+            ssh.stdin.close()
+
+            magic = ssh.stdout.read(len(ZSTD_MAGIC))
+            command = extract_command(magic, dest)
+            if command:
+                tar = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                       stderr=log)
+                processes.append(tar)
+                tar.stdin.write(magic)
+                received = len(magic)
+                while data := ssh.stdout.read1(COPY_SIZE):
+                    tar.stdin.write(data)
+                    received += len(data)
+                tar.stdin.close()
+                tar.wait()
+            ssh.wait()
+        except (BrokenPipeError, ValueError):
+            # A process was killed part way through
+            pass
+        finally:
+            timer.cancel()
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+    if timed_out.is_set():
+        status = 'timed out after %d seconds' % timeout
+    elif not command:
+        status = 'failed, no bundle (ssh exit %d)' % ssh.returncode
+    elif ssh.returncode != 0 or tar.returncode != 0:
+        status = 'incomplete (ssh exit %d, tar exit %d)' % (ssh.returncode,
+                                                            tar.returncode)
+    else:
+        status = 'ok'
+    return status, received, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Collect clingwrap log bundles from CI nodes at once.')
+    parser.add_argument('--bundle-dir', required=True,
+                        help='Directory to extract each node\'s bundle '
+                             'under.')
+    parser.add_argument('--target', default=DEFAULT_TARGET,
+                        help='clingwrap target to gather '
+                             '(default: %(default)s).')
+    parser.add_argument('--cwd-file',
+                        help='Local clingwrap configuration to copy to each '
+                             'node and gather with, instead of --target.')
+    parser.add_argument('--user', default=os.environ.get('baseuser',
+                                                         DEFAULT_USER),
+                        help='Remote user (default: $baseuser, or '
+                             '%s).' % DEFAULT_USER)
+    parser.add_argument('--key', default=DEFAULT_KEY,
+                        help='SSH private key (default: %(default)s).')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
+                        help='Seconds to allow each node '
+                             '(default: %(default)s).')
+    parser.add_argument('--nodes-json',
+                        help='JSON list of the nodes to collect from, each '
+                             'with a name and host, and optionally a user, '
+                             'key and ssh_args.')
+    parser.add_argument('nodes', nargs='*', metavar='NODE=ADDRESS',
+                        help='Nodes to collect from, by inventory name and '
+                             'address.')
+    args = parser.parse_args()
+
+    # Each node gets an executor with its own connection details
+    nodes = {}
+    for spec in args.nodes:
+        node, _, address = spec.partition('=')
+        nodes[node] = (address or node,
+                       RemoteExecutor(user=args.user, key=args.key))
+    if args.nodes_json:
+        for spec in json.loads(args.nodes_json):
+            nodes[spec['name']] = (
+                spec.get('host') or spec['name'],
+                RemoteExecutor(user=spec.get('user') or args.user,
+                               key=spec.get('key') or args.key,
+                               extra_args=spec.get('ssh_args')))
+    if not nodes:
+        parser.error('No nodes given.')
+
+    script = remote_script(args.target, args.cwd_file,
+                           use_zstd=bool(shutil.which('zstd')))
+
+    print('Collecting bundles from %s' % ', '.join(sorted(nodes)), flush=True)
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(nodes)) as pool:
+        futures = {
+            pool.submit(collect, executor, node, address, script,
+                        args.bundle_dir, args.timeout): node
+            for node, (address, executor) in nodes.items()}
+        for future in concurrent.futures.as_completed(futures):
+            node = futures[future]
+            try:
+                status, received, duration = future.result()
+            except Exception as e:
+                status, received, duration = 'failed: %s' % e, 0, 0
+            print('%-20s %-40s %10d bytes in %6.1f seconds'
+                  % (node, status, received, duration), flush=True)
+
+
+if __name__ == '__main__':
+    main()
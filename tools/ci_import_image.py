@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Import a CI image into a cluster as an artifact, without uploading it
+# again when the cluster already has its content.
+#
+# Runs on the upload target, under the Shaken Fist venv with /etc/sf/sfrc
+# sourced. A blob can only have the image's content if it has the image's
+# size, so the cluster's blobs are listed first: if none is the right size,
+# as on a freshly built cluster, the image is uploaded straight away without
+# being hashed. Otherwise the image's sha512 is computed once and cached next
+# to it (in <image>.sha512, keyed by the image's size and modification time,
+# falling back to ~/.cache/sf-ci-image-digests if the image's directory is
+# not writable), so repeat runs against an unchanged image do not read it
+# again. Then:
+#
+#   * if the artifact already exists and its current version is a blob with
+#     that digest, nothing is done;
+#   * if the cluster has a blob with that digest, the artifact is pointed at
+#     it without transferring any data;
+#   * otherwise the image is uploaded as a new blob.
+import argparse
+import hashlib
+import json
+import os
+
+from shakenfist_client import apiclient
+from shakenfist_client import util
+
+
+READ_SIZE = 8 * 1024 * 1024
+
+
+def digest_cache_path(source):
+    """Return where the digest of source is cached."""
+    if os.access(os.path.dirname(os.path.abspath(source)), os.W_OK):
+        return source + '.sha512'
+    cache_dir = os.path.expanduser('~/.cache/sf-ci-image-digests')
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, '%s.sha512'
+                        % os.path.abspath(source).strip('/').replace('/', '_'))
+
+
+def image_digest(source):
+    """Return the sha512 of source, computing it only if it has changed."""
+    st = os.stat(source)
+    key = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    cache_path = digest_cache_path(source)
+
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if {k: cached.get(k) for k in key} == key:
+            print('Using cached sha512 from %s' % cache_path)
+            return cached['sha512']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    print('Calculating sha512 of %s (%d bytes)' % (source, st.st_size))
+    sha512 = hashlib.sha512()
+    with open(source, 'rb') as f:
+        while d := f.read(READ_SIZE):
+            sha512.update(d)
+    key['sha512'] = sha512.hexdigest()
+
+    # Failing to cache the digest only costs a rehash next time
+    tmp = cache_path + '.tmp'
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(key, f)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print('Unable to cache sha512 in %s: %s' % (cache_path, e))
+    return key['sha512']
+
+
+def may_have_blob(client, size):
+    """Return False if the cluster certainly has no blob of this size."""
+    try:
+        blobs = client.get_blobs()
+    except apiclient.APIException:
+        return True
+    for blob in blobs:
+        try:
+            if (blob.get('state') != 'deleted'
+                    and int(blob.get('size') or -1) == size):
+                return True
+        except (TypeError, ValueError):
+            return True
+    return False
+
+
+def upload(client, args):
+    """Upload the image as a new blob for the artifact."""
+    artifact = util.upload_artifact_with_progress(
+        client, args.name, args.source, None,
+        namespace=args.namespace, shared=args.shared)
+    print('Created artifact %s' % artifact['uuid'])
+
+
+def existing_blob(client, sha512):
+    """Return the cluster's blob with this sha512, or None."""
+    if not client.check_capability('blob-search-by-hash'):
+        return None
+    try:
+        return client.get_blob_by_sha512(sha512) or None
+    except apiclient.ResourceNotFoundException:
+        return None
+
+
+def current_blob_uuid(client, name):
+    """Return the blob uuid of the artifact's current version, or None."""
+    try:
+        artifact = client.get_artifact(name)
+    except apiclient.APIException:
+        return None
+    return (artifact or {}).get('blob_uuid')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import an image as an artifact, skipping the upload '
+                    'if the cluster already has its content.')
+    parser.add_argument('name', help='The artifact name.')
+    parser.add_argument('source', help='The image file to import.')
+    parser.add_argument('--shared', action='store_true',
+                        help='Share the artifact with all namespaces.')
+    parser.add_argument('--namespace',
+                        help='Create the artifact in this namespace.')
+    args = parser.parse_args()
+
+    client = apiclient.Client()
+    size = os.stat(args.source).st_size
+    if not may_have_blob(client, size):
+        print('No blob of %d bytes, uploading %s without hashing it'
+              % (size, args.source))
+        upload(client, args)
+        return
+
+    sha512 = image_digest(args.source)
+    blob = existing_blob(client, sha512)
+    if not blob:
+        print('No blob with this content, uploading %s' % args.source)
+        upload(client, args)
+        return
+
+    if current_blob_uuid(client, args.name) == blob['uuid']:
+        print('Artifact %s is already blob %s, nothing to do'
+              % (args.name, blob['uuid']))
+        return
+
+    print('Reusing existing blob %s' % blob['uuid'])
+    artifact = client.blob_artifact(
+        args.name, blob['uuid'], shared=args.shared,
+        namespace=args.namespace)
+    print('Created artifact %s' % artifact['uuid'])
+
+
+if __name__ == '__main__':
+    main()
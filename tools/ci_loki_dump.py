@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Dump everything the CI Loki holds into the CI bundle.
+#
+# A single query_range returns at most one page of lines, so a long run
+# loses most of its logs from a one-shot dump. Instead this lists the
+# streams matching the selector (one per daemon and host in CI), splits the
+# window into time slices, and for each stream pages through each slice with
+# direction=forward, restarting every page at the last timestamp seen.
+# Slices are fetched concurrently, and each is written straight to its own
+# gzip member, so memory use is bounded by the page size however long the
+# run was. The members are then joined, in order, into one gzipped JSON-lines
+# file per stream:
+#
+#     <output-dir>/<daemon>-<host>.jsonl.gz
+#
+# with one {"ts": <nanoseconds>, "line": <log line>} object per line, and an
+# index.json describing each stream's labels, file and line count. Streams
+# which differ only in labels other than daemon and host have a short hash
+# of their labels added to the file name, so each keeps its own file.
+#
+# Standard library only, so it runs on the CI worker without a venv.
+import argparse
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+DEFAULT_SELECTOR = '{job="shakenfist"}'
+DEFAULT_WINDOW = 6 * 60 * 60
+DEFAULT_SLICE = 10 * 60
+DEFAULT_LIMIT = 5000
+REQUEST_TIMEOUT = 60
+RETRIES = 3
+
+
+def loki_get(base_url, path, params):
+    """GET a Loki API path, returning its data, retrying transient errors."""
+    url = '%s%s?%s' % (base_url, path, urllib.parse.urlencode(params))
+    for attempt in range(RETRIES):
+        try:
+            with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as r:
+                return json.load(r)['data']
+        except (urllib.error.URLError, OSError, ValueError):
+            if attempt == RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def stream_selector(labels):
+    """Return a selector matching exactly the stream with these labels."""
+    return '{%s}' % ', '.join(
+        '%s=%s' % (name, json.dumps(value))
+        for name, value in sorted(labels.items()))
+
+
+def stream_filename(labels, disambiguate=False):
+    """Return the dump file name for a stream.
+
+    With disambiguate, a short hash of all the stream's labels is added, for
+    streams which would otherwise share a name.
+    """
+    if 'daemon' in labels and 'host' in labels:
+        name = '%s-%s' % (labels['daemon'], labels['host'])
+    else:
+        name = '-'.join(value for _, value in sorted(labels.items()))
+    if disambiguate:
+        name += '-' + hashlib.sha256(
+            stream_selector(labels).encode()).hexdigest()[:8]
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name) + '.jsonl.gz'
+
+
+def stream_filenames(series):
+    """Return {filename: labels} for streams, giving each its own file."""
+    names = [stream_filename(labels) for labels in series]
+    return {
+        (stream_filename(labels, disambiguate=True)
+         if names.count(name) > 1 else name): labels
+        for name, labels in zip(names, series)}
+
+
+def query_page(base_url, selector, start_ns, end_ns, limit, direction):
+    """Return one page of (ts, line) for selector, sorted by time."""
+    data = loki_get(base_url, '/loki/api/v1/query_range', {
+        'query': selector,
+        'start': start_ns,
+        'end': end_ns,
+        'limit': limit,
+        'direction': direction,
+    })
+    return sorted(
+        (int(ts), line)
+        for stream in data.get('result', [])
+        for ts, line in stream.get('values', []))
+
+
+def dump_slice(base_url, selector, start_ns, end_ns, limit, path):
+    """Write every line of one stream in [start_ns, end_ns) to path.
+
+    Returns the number of lines written.
+    """
+    count = 0
+    cursor = start_ns
+    # Lines at the cursor timestamp which have already been written. Loki's
+    # start is inclusive, so the next page repeats them.
+    seen_at_cursor = set()
+
+    with gzip.open(path, 'wt', encoding='utf-8') as out:
+        def write(values):
+            for ts, line in values:
+                out.write(json.dumps({'ts': ts, 'line': line}) + '\n')
+            return len(values)
+
+        while cursor < end_ns:
+            values = query_page(base_url, selector, cursor, end_ns, limit,
+                                'forward')
+            new = [v for v in values if v not in seen_at_cursor]
+            count += write(new)
+
+            if len(values) < limit:
+                break
+
+            last_ts = values[-1][0]
+            if last_ts == cursor and not new:
+                # The same full page again, all at one timestamp, so there
+                # are at least limit lines at cursor. Fetch that nanosecond
+                # from the other end too: if the two pages overlap they hold
+                # every line there, and only if they do not can lines
+                # between them be missing. Then step past it.
+                tail = query_page(base_url, selector, cursor, cursor + 1,
+                                  limit, 'backward')
+                missed = [v for v in tail if v not in seen_at_cursor]
+                count += write(missed)
+                if len(missed) >= limit:
+                    print('WARNING: at least %d lines at %d in %s, some '
+                          'may be missing' % (2 * limit, cursor, selector),
+                          flush=True)
+                cursor += 1
+                seen_at_cursor = set()
+                continue
+
+            if last_ts != cursor:
+                seen_at_cursor = set()
+            cursor = last_ts
+            seen_at_cursor.update(v for v in values if v[0] == last_ts)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Dump the CI Loki into per-stream JSON-lines files.')
+    parser.add_argument('--base-url',
+                        default=os.environ.get('LOKI_BASE_URL',
+                                               'http://localhost:3100'),
+                        help='Loki to dump (default: $LOKI_BASE_URL, or '
+                             '%(default)s).')
+    parser.add_argument('--selector', default=DEFAULT_SELECTOR,
+                        help='Stream selector to dump '
+                             '(default: %(default)s).')
+    parser.add_argument('--window-seconds', type=int, default=DEFAULT_WINDOW,
+                        help='How far back to dump, in seconds '
+                             '(default: %(default)s).')
+    parser.add_argument('--slice-seconds', type=int, default=DEFAULT_SLICE,
+                        help='Length of each time slice, in seconds '
+                             '(default: %(default)s).')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT,
+                        help='Lines per query page (default: %(default)s).')
+    parser.add_argument('--parallel', type=int, default=8,
+                        help='Slices to fetch at once '
+                             '(default: %(default)s).')
+    parser.add_argument('--output-dir', required=True,
+                        help='Directory to write the dump to.')
+    args = parser.parse_args()
+
+    end_ns = time.time_ns()
+    start_ns = end_ns - args.window_seconds * 1000000000
+    slice_ns = args.slice_seconds * 1000000000
+    slices = [(s, min(s + slice_ns, end_ns))
+              for s in range(start_ns, end_ns, slice_ns)]
+
+    series = loki_get(args.base_url, '/loki/api/v1/series', {
+        'match[]': args.selector,
+        'start': start_ns,
+        'end': end_ns,
+    })
+    os.makedirs(args.output_dir, exist_ok=True)
+    streams = stream_filenames(series)
+    print('Dumping %d streams from %s in %d slices of %d seconds'
+          % (len(streams), args.base_url, len(slices), args.slice_seconds),
+          flush=True)
+
+    failures = 0
+    counts = {filename: 0 for filename in streams}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=args.parallel) as pool:
+        futures = {}
+        for filename, labels in streams.items():
+            selector = stream_selector(labels)
+            for index, (s, e) in enumerate(slices):
+                part = os.path.join(args.output_dir,
+                                    '%s.part%05d' % (filename, index))
+                futures[pool.submit(dump_slice, args.base_url, selector, s,
+                                    e, args.limit, part)] = filename
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                counts[futures[future]] += future.result()
+            except Exception as e:
+                failures += 1
+                print('ERROR: failed to dump a slice of %s: %s'
+                      % (futures[future], e), flush=True)
+
+    # Concatenated gzip members are a valid gzip file
+    index = []
+    for filename, labels in sorted(streams.items()):
+        path = os.path.join(args.output_dir, filename)
+        with open(path, 'wb') as out:
+            for i in range(len(slices)):
+                part = '%s.part%05d' % (path, i)
+                if os.path.exists(part):
+                    with open(part, 'rb') as f:
+                        while d := f.read(1024 * 1024):
+                            out.write(d)
+                    os.unlink(part)
+        index.append({'labels': labels, 'file': filename,
+                      'lines': counts[filename]})
+        print('%-50s %9d lines' % (filename, counts[filename]), flush=True)
+
+    with open(os.path.join(args.output_dir, 'index.json'), 'w') as f:
+        json.dump({'selector': args.selector, 'start_ns': start_ns,
+                   'end_ns': end_ns, 'failed_slices': failures,
+                   'streams': index}, f, indent=4, sort_keys=True)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
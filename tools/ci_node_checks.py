@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# ci_node_checks.py -- the per-node, GATING system-level health check of
+# ci_node_checks.sh, reading the journal once.
+#
+# ci_node_checks.sh greps this boot's journal once per kernel-origin pattern
+# and the sf-*.service journal once per systemd pattern, each grep working
+# over a full journalctl dump. This reads the boot's journal a single time,
+# as JSON from journalctl (or through python-systemd when it is installed),
+# decides which entries belong to sf-*.service units from their unit fields,
+# and matches every pattern against each entry in the same pass. Entries
+# which cannot contain any pattern are skipped before they are parsed.
+#
+# The checks, arguments, output and exit status are exactly those of
+# ci_node_checks.sh (see its header for why each check exists), which runs
+# this when python3 is available. Matching lines are printed as journalctl's
+# default short format would print them.
+import datetime
+import fnmatch
+import json
+import re
+import socket
+import subprocess
+import sys
+
+try:
+    from systemd import journal
+except ImportError:
+    journal = None
+
+
+MAX_MATCHES = 20
+
+SF_UNITS = 'sf-*.service'
+
+# A MESSAGE which journalctl's JSON gives as an array of bytes, because it is
+# not valid UTF-8 or has control characters. A pattern's text cannot be found
+# in the raw line of such an entry, so it is always parsed.
+BYTES_MESSAGE_RE = re.compile(r'"MESSAGE"\s*:\s*\[')
+
+# Fields which tie a journal entry to a unit, as journalctl -u matches them
+UNIT_FIELDS = ('_SYSTEMD_UNIT', 'UNIT', 'OBJECT_SYSTEMD_UNIT',
+               'COREDUMP_UNIT')
+
+BOOT_SCOPE = "this boot's journal"
+SF_SCOPE = 'the sf-*.service journal'
+
+# Kernel-origin patterns, checked against the whole boot journal
+KERNEL_PATTERNS = ('apparmor="DENIED"', 'segfault')
+
+# Process-fatal pattern, checked against the sf-*.service journal
+PROCESS_PATTERNS = ('*** Check failure stack trace: ***',)
+
+# systemd unit-exit patterns, checked against the sf-*.service journal
+UNIT_EXIT_PATTERNS = ("State 'stop-sigterm' timed out. Killing.",
+                      'Main process exited, code=exited',
+                      "Failed with result 'exit-code'.")
+
+
+def field_text(value):
+    """Return a journal field as text, however it was encoded."""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        # journalctl -o json gives non-UTF-8 and very long fields as bytes
+        value = bytes(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def is_sf_entry(entry):
+    return any(fnmatch.fnmatchcase(field_text(entry.get(field)), SF_UNITS)
+               for field in UNIT_FIELDS)
+
+
+def short_lines(entry):
+    """Return an entry's message as journalctl's short format lines."""
+    timestamp = entry.get('__REALTIME_TIMESTAMP')
+    if not isinstance(timestamp, datetime.datetime):
+        timestamp = datetime.datetime.fromtimestamp(
+            int(timestamp or 0) / 1000000)
+
+    identifier = field_text(entry.get('SYSLOG_IDENTIFIER')
+                            or entry.get('_COMM')) or 'unknown'
+    pid = field_text(entry.get('SYSLOG_PID') or entry.get('_PID'))
+    if pid:
+        identifier = '%s[%s]' % (identifier, pid)
+
+    prefix = '%s %s %s: ' % (timestamp.strftime('%b %d %H:%M:%S'),
+                             field_text(entry.get('_HOSTNAME')), identifier)
+    message = field_text(entry.get('MESSAGE')).split('\n')
+    return ([prefix + message[0]]
+            + [' ' * len(prefix) + line for line in message[1:]])
+
+
+def journal_entries(patterns):
+    """Yield this boot's journal entries which might contain a pattern."""
+    if journal:
+        reader = journal.Reader()
+        # Return fields whole, however long they are
+        reader.threshold = 0
+        reader.this_boot()
+        for entry in reader:
+            message = field_text(entry.get('MESSAGE'))
+            if any(pattern in message for pattern in patterns):
+                yield entry
+        return
+
+    # The patterns as they appear inside journalctl's JSON strings, so most
+    # entries can be passed over without parsing them. --all, as otherwise
+    # journalctl gives any field of 4096 bytes or more as null.
+    escaped = [json.dumps(pattern)[1:-1] for pattern in patterns]
+    process = subprocess.Popen(
+        ['journalctl', '--no-pager', '--all', '-b', '-o', 'json'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    for raw in process.stdout:
+        line = raw.decode('utf-8', errors='replace')
+        if (not any(pattern in line for pattern in escaped)
+                and not BYTES_MESSAGE_RE.search(line)):
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+    process.wait()
+
+
+def scan_journal(checks):
+    """Match every (scope, pattern) check against the journal in one pass.
+
+    Returns {(scope, pattern): (count, first MAX_MATCHES lines)}.
+    """
+    found = {check: [0, []] for check in checks}
+    patterns = sorted({pattern for _, pattern in checks})
+
+    for entry in journal_entries(patterns):
+        scopes = {BOOT_SCOPE}
+        if is_sf_entry(entry):
+            scopes.add(SF_SCOPE)
+
+        for line in short_lines(entry):
+            for scope, pattern in checks:
+                if scope in scopes and pattern in line:
+                    matches = found[(scope, pattern)]
+                    matches[0] += 1
+                    if len(matches[1]) < MAX_MATCHES:
+                        matches[1].append(line)
+    return found
+
+
+def main():
+    job_name = sys.argv[2] if len(sys.argv) > 2 else ''
+    relax_unit_exits = fnmatch.fnmatchcase(job_name, '*lifecycle*')
+    hostname = socket.gethostname()
+    failures = 0
+
+    print()
+    print('Running per-node system checks on %s.' % hostname)
+    if relax_unit_exits:
+        print("(job '%s' kills nodes by design: skipping the" % job_name)
+        print(' systemd-exit / failed-unit checks; kernel/abseil checks '
+              'still run.)')
+    print()
+
+    # (a) Failed Shaken Fist systemd units
+    if relax_unit_exits:
+        print('    Skipping failed sf-*.service unit check (node-killing '
+              'job).')
+    else:
+        print('    Check for failed sf-*.service systemd units.')
+        result = subprocess.run(
+            ['systemctl', 'list-units', '--failed', SF_UNITS, '--no-legend',
+             '--plain'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        failed_units = result.stdout.decode(errors='replace').rstrip('\n')
+        if failed_units:
+            print('FAILURE: systemd reports failed sf-*.service units on '
+                  '%s:' % hostname)
+            print('\n'.join(failed_units.split('\n')[:MAX_MATCHES]))
+            failures += 1
+
+    # (b) journald, read once for every pattern
+    checks = ([(BOOT_SCOPE, pattern) for pattern in KERNEL_PATTERNS]
+              + [(SF_SCOPE, pattern) for pattern in PROCESS_PATTERNS])
+    if not relax_unit_exits:
+        checks += [(SF_SCOPE, pattern) for pattern in UNIT_EXIT_PATTERNS]
+    found = scan_journal(checks)
+
+    for scope, pattern in checks:
+        print('    Check for >>%s<< in %s.' % (pattern, scope))
+        count, lines = found[(scope, pattern)]
+        if count:
+            print('FAILURE: Forbidden journald condition found %d times: %s'
+                  % (count, pattern))
+            for line in lines:
+                print(line)
+            failures += 1
+    if relax_unit_exits:
+        print('    Skipping systemd unit-exit checks (node-killing job).')
+
+    print()
+    if failures:
+        print('...%d system-level failures detected on %s.'
+              % (failures, hostname))
+        sys.exit(1)
+
+    print('No system-level failures detected on %s.' % hostname)
+
+
+if __name__ == '__main__':
+    main()
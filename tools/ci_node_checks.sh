@@ -51,6 +51,15 @@ set -euo pipefail
 # so `journalctl -u sf-*.service` still catches a genuine sf-database crash
 # while ignoring dnsmasq and friends.
 
+# tools/ci_node_checks.py runs exactly these checks with the same output and
+# exit status, but reads the journal once rather than once per pattern. Use
+# it when it was shipped alongside this script and python3 is available; the
+# shell implementation below remains the fallback.
+checker="$(dirname "${0}")/ci_node_checks.py"
+if [ -f "${checker}" ] && command -v python3 > /dev/null; then
+    exec python3 "${checker}" "$@"
+fi
+
 # shellcheck disable=SC2034  # BRANCH is intentionally unused; see the header
 # -- it exists only to match ci_log_checks.sh's argument shape.
 BRANCH="${1:-}"
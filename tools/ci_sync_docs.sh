@@ -21,22 +21,38 @@ cp ${GITHUB_WORKSPACE}/shakenfist/mkdocs.yml.tmpl ${GITHUB_WORKSPACE}/mkdocs.yml
 # Sync external docs and generate mkdocs.yml from template. Note that these
 # are in the order they appear in the components nav bar, and that their
 # component names might have been overridden by a component.yml file in
-# the target repo's docs directory.
-for external in \
-        cloudgood \
-        clingwrap \
-        development \
-        agent-python \
-	instar \
-        kerbside \
-        occystrap \
-        ryll; do
-    python3 "${SYNC_SCRIPT}" "${external}" \
-        "${GITHUB_WORKSPACE}/${external}/docs" \
-        "${GITHUB_WORKSPACE}/shakenfist/docs/components/${external}" \
+# the target repo's docs directory. All components are synced by a single
+# run of the sync script from a generated manifest, which fails if any
+# synced page links to a missing page or anchor. A component whose
+# repository has no docs directory is skipped.
+EXTERNALS="cloudgood clingwrap development agent-python instar kerbside occystrap ryll"
+MANIFEST="${GITHUB_WORKSPACE}/sync-docs-manifest.yml"
+rm -f ${MANIFEST}
+for external in ${EXTERNALS}; do
+    echo "- name: ${external}" >> ${MANIFEST}
+    echo "  source: ${GITHUB_WORKSPACE}/${external}/docs" >> ${MANIFEST}
+    echo "  dest: ${GITHUB_WORKSPACE}/shakenfist/docs/components/${external}" >> ${MANIFEST}
+done
+
+# The sync exits non-zero on broken links even though it has rendered
+# everything, so check its status rather than just its output: nothing is
+# committed or proposed from a failed sync.
+if ! python3 "${SYNC_SCRIPT}" --manifest ${MANIFEST} --fail-on-broken-links \
         --template ${GITHUB_WORKSPACE}/mkdocs.yml \
-        --output ${GITHUB_WORKSPACE}/mkdocs.yml.new
-    mv ${GITHUB_WORKSPACE}/mkdocs.yml.new ${GITHUB_WORKSPACE}/mkdocs.yml
+        --output ${GITHUB_WORKSPACE}/mkdocs.yml.new; then
+    echo "Error: the documentation sync failed, see above"
+    exit 1
+fi
+
+# Never commit the unrendered template
+if [ ! -f ${GITHUB_WORKSPACE}/mkdocs.yml.new ]; then
+    echo "Error: the documentation sync did not render mkdocs.yml"
+    exit 1
+fi
+mv ${GITHUB_WORKSPACE}/mkdocs.yml.new ${GITHUB_WORKSPACE}/mkdocs.yml
+rm -f ${MANIFEST}
+
+for external in ${EXTERNALS}; do
     git add docs/components/${external}
 done
 
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Wait for a freshly deployed CI cluster to become schedulable.
+#
+# Runs on the primary, under the Shaken Fist venv with /etc/sf/sfrc sourced
+# so the client can find the API and its credentials. Unlike starting a new
+# ssh session and interpreter for every check, this is one long-lived
+# process: it polls the API in-process, starting at a short interval and
+# backing off exponentially while nothing changes (or the API is not yet
+# answering), dropping back to the short interval whenever the cluster makes
+# progress. It returns as soon as the cluster is ready.
+#
+# The cluster is ready once the API answers and at least --expect-nodes
+# nodes have registered, are in the created state and have been seen
+# recently, including at least one hypervisor and one network node.
+#
+# On success the last line of output is a JSON metric record carrying the
+# time to schedulable in seconds, measured from when this started.
+import argparse
+import json
+import logging
+import sys
+import time
+
+from shakenfist_client import apiclient
+
+
+# A node which has not checked in for this long is not counted as ready
+NODE_FRESHNESS = 60
+
+
+def cluster_status(client, expect_nodes):
+    """Return (ready, summary) for the cluster as the API reports it."""
+    nodes = client.get_nodes()
+    now = time.time()
+    created = [
+        n for n in nodes
+        if n.get('state') == 'created'
+        and now - (n.get('lastseen') or 0) < NODE_FRESHNESS]
+    hypervisors = [n for n in created if n.get('is_hypervisor')]
+    network_nodes = [n for n in created if n.get('is_network_node')]
+
+    summary = ('%d of %d nodes created (%d expected), %d hypervisors, '
+               '%d network nodes'
+               % (len(created), len(nodes), expect_nodes, len(hypervisors),
+                  len(network_nodes)))
+    ready = (len(created) >= expect_nodes and hypervisors
+             and network_nodes)
+    return bool(ready), summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Wait for a CI cluster to become schedulable.')
+    parser.add_argument('--expect-nodes', type=int, default=1,
+                        help='Number of nodes which must be created '
+                             '(default: %(default)s).')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='Seconds to wait before giving up '
+                             '(default: %(default)s).')
+    parser.add_argument('--min-interval', type=float, default=0.25,
+                        help='Shortest time between checks, in seconds '
+                             '(default: %(default)s).')
+    parser.add_argument('--max-interval', type=float, default=5,
+                        help='Longest time between checks, in seconds '
+                             '(default: %(default)s).')
+    parser.add_argument('--request-timeout', type=float, default=10,
+                        help='Seconds to allow each API request '
+                             '(default: %(default)s).')
+    args = parser.parse_args()
+
+    # The client logs every failed request, which is expected while the API
+    # is still starting
+    logging.getLogger('shakenfist_client').setLevel(logging.CRITICAL)
+
+    start = time.monotonic()
+    deadline = start + args.timeout
+    interval = args.min_interval
+    client = None
+    last_summary = None
+    checks = 0
+
+    while True:
+        checks += 1
+        try:
+            if not client:
+                client = apiclient.Client(
+                    sync_request_timeout=args.request_timeout)
+            ready, summary = cluster_status(client, args.expect_nodes)
+        except Exception as e:
+            ready = False
+            summary = 'API not ready: %s' % (str(e).split('\n')[0] or
+                                             type(e).__name__)
+            client = None
+
+        elapsed = time.monotonic() - start
+        if summary != last_summary:
+            print('%7.2fs: %s' % (elapsed, summary), flush=True)
+            # Progress, so look again soon
+            interval = args.min_interval
+            last_summary = summary
+        else:
+            interval = min(interval * 2, args.max_interval)
+
+        if ready:
+            print(json.dumps({
+                'metric': 'time_to_schedulable',
+                'seconds': round(elapsed, 2),
+                'checks': checks,
+            }), flush=True)
+            return
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print('Cluster not schedulable after %.0f seconds (%d checks)'
+                  % (elapsed, checks), flush=True)
+            sys.exit(1)
+        time.sleep(min(interval, remaining))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
 #!/usr/bin/python3
+from concurrent.futures import ThreadPoolExecutor
+import fcntl
 import os
 import re
 import sys
+import threading
+import time
 
 import git
+import yaml
 
 # Clone all the required repositories, with handling for dependencies between
 # them. This script assumes it is being called by a github action and that
@@ -14,37 +19,335 @@ import git
 #     export GITHUB_WORKSPACE=/srv/github/_work/shakenfist/shakenfist
 #     export SF_PRIMARY_REPO='shakenfist'
 #     export SF_HEAD_SHA=e8f50179329b21741c190ba2c08acf46aa3fc721
+#
+# The repositories to set up are listed in etc/clone-repositories.yml, or the
+# file named by SF_CLONE_CONFIG. "Depends on" lines are followed
+# transitively: a dependent PR's head commit can itself depend on PRs in
+# other repositories. Each repository is checked out at the first PR found
+# for it, walking outwards from the primary commit; a later, conflicting PR
+# for the same repository is reported and ignored, which also stops cycles.
+#
+# Missing repositories are cloned in full by default. These optional
+# environment variables make that cheaper:
+#
+#     SF_CLONE_MODE: "full" (the default), "blobless" to clone every commit
+#         but fetch file contents only as they are checked out, or "shallow"
+#         to clone only the most recent SF_CLONE_DEPTH commits of each
+#         branch. Dependent PR heads are then also fetched to that depth.
+#     SF_CLONE_DEPTH: the depth used by "shallow" mode (default 50).
+#     SF_CLONE_CACHE: a directory of bare mirrors, one per repository,
+#         which persists between jobs on a self-hosted runner. Each mirror
+#         is created or updated, then used as a --reference for the clone.
+#         --dissociate copies the objects the clone needs, so the workspace
+#         does not break if the cache is later pruned or removed.
+#     SF_CLONE_CONCURRENCY: how many repositories to set up at once (default
+#         all of them).
+#
+# By default an existing checkout is used as it is. On a runner which keeps
+# its workspace between jobs, set SF_REUSE_WORKSPACE=true to bring existing
+# checkouts up to date instead: each is fetched once (all branches plus any
+# dependent PR heads), hard reset and cleaned of untracked files, and the
+# dependson branch and PR refs left by earlier jobs are pruned. The primary
+# repository is left alone, as the workflow has already checked it out.
 
-REPOS = {
-    'agent-python': {
-        'github': 'https://github.com/shakenfist/agent-python'
-    },
-    'client-python': {
-        'github': 'https://github.com/shakenfist/client-python'
-    },
-    'shakenfist': {
-        'github': 'https://github.com/shakenfist/shakenfist'
-    },
-}
-
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'etc',
+    'clone-repositories.yml')
 
 DEPENDS_RE = re.compile(
-    'Depends on https://github.com/shakenfist/([^/]*)/(.*)')
+    'Depends on https://github.com/shakenfist/([^/]*)/pull/([0-9]+)')
+
+CLONE_MODES = ['full', 'blobless', 'shallow']
+DEFAULT_CLONE_DEPTH = 50
+
+# Repositories cloned, and fetched, by this run
+CLONED = set()
+FETCHED = set()
+
+
+LOG_LOCK = threading.Lock()
+
+
+def log(message):
+    # Repositories are set up concurrently, so write each message in one go
+    # to stop output from different threads interleaving.
+    with LOG_LOCK:
+        sys.stdout.write(message + '\n')
+        sys.stdout.flush()
+
+
+def clone_mode():
+    mode = os.environ.get('SF_CLONE_MODE', 'full')
+    if mode not in CLONE_MODES:
+        log('Unknown clone mode %s, using a full clone' % mode)
+        mode = 'full'
+    return mode
+
+
+def clone_depth():
+    return int(os.environ.get('SF_CLONE_DEPTH', DEFAULT_CLONE_DEPTH))
+
+
+def reuse_workspace():
+    return os.environ.get('SF_REUSE_WORKSPACE', 'false') == 'true'
+
+
+def update_mirror(repo, url):
+    # Create or refresh the cached bare mirror of a repository, returning its
+    # path, or None if no cache is configured. Jobs on the same runner can
+    # share the cache, so updates are serialised with a lock file.
+    cache_dir = os.environ.get('SF_CLONE_CACHE')
+    if not cache_dir:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    mirror_path = os.path.join(cache_dir, '%s.git' % repo)
+    with open('%s.lock' % mirror_path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(mirror_path):
+                log('Updating cached mirror %s' % mirror_path)
+                git.Repo(mirror_path).git.remote('update', '--prune')
+            else:
+                log('Creating cached mirror %s' % mirror_path)
+                git.Repo.clone_from(url, mirror_path, mirror=True)
+        except git.GitCommandError as e:
+            log('Failed to update cached mirror %s: %s' % (mirror_path, e))
+            log('...will clone without the cache')
+            return None
+    return mirror_path
+
+
+def clone_repo(repo, url, repo_path):
+    options = []
+    mode = clone_mode()
+    if mode == 'blobless':
+        options.append('--filter=blob:none')
+    elif mode == 'shallow':
+        # A shallow clone only fetches the default branch unless told
+        # otherwise, and we may need to check out another one.
+        options.extend(['--depth=%d' % clone_depth(), '--no-single-branch'])
+
+    mirror_path = update_mirror(repo, url)
+    if mirror_path:
+        options.extend(['--reference=%s' % mirror_path, '--dissociate'])
+
+    log('Cloning %s (%s clone%s)'
+        % (repo, mode, ', using cache' if mirror_path else ''))
+    git.Repo.clone_from(url, repo_path, multi_options=options)
+
+
+def load_repos():
+    config_path = os.environ.get('SF_CLONE_CONFIG', CONFIG_PATH)
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    return config['repositories']
+
+
+def repo_path(repo):
+    return os.path.join(os.environ['GITHUB_WORKSPACE'], repo)
+
+
+def pull_ref(pr):
+    return 'refs/dependson/pull/%d' % pr
+
+
+def parse_depends(message):
+    # Return the (repository, PR number) pairs named by "Depends on" lines in
+    # a commit message, in the order they appear.
+    depends = []
+    for line in message.split('\n'):
+        m = DEPENDS_RE.match(line.lstrip(' '))
+        if m:
+            depends.append((m.group(1), int(m.group(2))))
+    return depends
+
+
+def ensure_clone(repo, repos):
+    if os.path.exists(repo_path(repo)):
+        return
+    if repo not in repos:
+        raise Exception('no checkout of %s and no known URL to clone it from'
+                        % repo)
+    clone_repo(repo, repos[repo]['github'], repo_path(repo))
+    CLONED.add(repo)
+
+
+def fetch_refs(repo, prs):
+    # Fetch everything a repository needs with a single fetch: the heads of
+    # its dependent PRs and, when reusing a workspace, all of its branches.
+    names = []
+    refspecs = []
+    if reuse_workspace():
+        names.append('branches')
+        refspecs.append('+refs/heads/*:refs/remotes/origin/*')
+    for pr in prs.get(repo, []):
+        names.append('pull/%d' % pr)
+        refspecs.append('+refs/pull/%d/head:%s' % (pr, pull_ref(pr)))
+    if not refspecs:
+        return
+
+    log('%s: fetching %s' % (repo, ', '.join(names)))
+    fetch = ['git', 'fetch', '--prune']
+    if clone_mode() == 'shallow':
+        fetch.append('--depth=%d' % clone_depth())
+    git.Git(repo_path(repo)).execute(fetch + ['origin'] + refspecs)
+    FETCHED.add(repo)
+
+
+def reset_workspace(repo):
+    # Throw away anything an earlier job left in a reused checkout
+    log('%s: resetting and cleaning the workspace' % repo)
+    repo_git = git.Git(repo_path(repo))
+    repo_git.execute(['git', 'reset', '--hard', '--quiet'])
+    repo_git.execute(['git', 'clean', '-ffdx', '--quiet'])
+
+
+def prune_dependson(repo, dep_pr):
+    # Remove the dependson branch and PR refs of earlier jobs, except those
+    # for the PR this job is using
+    keep = set()
+    if dep_pr is not None:
+        keep = {'refs/heads/dependson', pull_ref(dep_pr)}
+
+    repo_git = git.Git(repo_path(repo))
+    refs = repo_git.execute(
+        ['git', 'for-each-ref', '--format=%(refname)',
+         'refs/heads/dependson', 'refs/dependson/']).split('\n')
+    stale = [ref for ref in refs if ref and ref not in keep]
+    for ref in stale:
+        repo_git.execute(['git', 'update-ref', '-d', ref])
+    if stale:
+        log('%s: pruned %d stale dependson refs' % (repo, len(stale)))
+
+
+def resolve_dependencies(primary_repo_name, primary_commit, repos):
+    # Walk "Depends on" lines outwards from the primary commit, one level at a
+    # time, returning the PR to check out for each repository. Each level's
+    # PRs are fetched with one fetch per repository, and as a repository only
+    # ever gets one PR, each remote is contacted at most once.
+    dependencies = {}
+    level = [(primary_repo_name, dep) for dep in parse_depends(
+        primary_commit.message)]
+    while level:
+        pending = {}
+        for parent, (repo, pr) in level:
+            print('Depends on detected: %s requires %s/pull/%d'
+                  % (parent, repo, pr))
+            if repo == primary_repo_name:
+                print('...ignoring, %s is the primary repository' % repo)
+            elif repo in dependencies:
+                if dependencies[repo] != pr:
+                    print('...ignoring, already using %s/pull/%d'
+                          % (repo, dependencies[repo]))
+            else:
+                dependencies[repo] = pr
+                pending.setdefault(repo, []).append(pr)
+
+        if not pending:
+            break
+
+        pending_repos = sorted(pending)
+        failed = run_concurrently(ensure_clone, pending_repos, repos)
+        if not failed:
+            failed = run_concurrently(fetch_refs, pending_repos, pending)
+        if failed:
+            print('Failed to fetch dependencies from: %s'
+                  % ', '.join(sorted(failed)))
+            sys.exit(1)
+
+        level = []
+        for repo in pending_repos:
+            pr = pending[repo][0]
+            commit = git.Repo(repo_path(repo)).commit(pull_ref(pr))
+            for dep in parse_depends(commit.message):
+                level.append(('%s/pull/%d' % (repo, pr), dep))
+    return dependencies
+
+
+def checkout_dependson(repo, dep_pr):
+    log('%s: checking out pull/%d' % (repo, dep_pr))
+    dep_git = git.Git(repo_path(repo))
+    dep_git.execute(['git', 'checkout', '-f', '-B', 'dependson',
+                     pull_ref(dep_pr)])
+
+
+def checkout_base_reference(repo, base_reference):
+    log('%s: checking out the %s branch' % (repo, base_reference))
+    dep_git = git.Git(repo_path(repo))
+    try:
+        if reuse_workspace():
+            # Move the local branch to what was just fetched, rather than
+            # trusting whatever an earlier job left it pointing at
+            dep_git.execute(['git', 'checkout', '-f', '-B', base_reference,
+                             'refs/remotes/origin/%s' % base_reference])
+        else:
+            dep_git.execute(['git', 'checkout', base_reference])
+    except Exception as e:
+        log('Failed to checkout %s on %s: %s' % (base_reference, repo, e))
+        log('...will use repository default branch')
+        if reuse_workspace():
+            dep_git.execute(['git', 'checkout', '-f', '--detach',
+                             'refs/remotes/origin/HEAD'])
+
+
+def setup_repo(repo, repos, dependencies, base_reference):
+    # Everything one repository needs: clone it if it is missing, then check
+    # out either the PR it was named in by a "Depends on" line, or the same
+    # base reference as the primary repository.
+    ensure_clone(repo, repos)
+    reuse = reuse_workspace() and repo not in CLONED
+    if reuse:
+        if repo not in FETCHED:
+            fetch_refs(repo, {})
+        reset_workspace(repo)
+
+    if repo in dependencies:
+        checkout_dependson(repo, dependencies[repo])
+    elif base_reference:
+        checkout_base_reference(repo, base_reference)
+
+    if reuse:
+        prune_dependson(repo, dependencies.get(repo))
+
+
+def run_concurrently(task, repos, *args):
+    # Run task(repo, *args) for each repository in a thread pool, as these
+    # are independent network operations. Returns the repositories which
+    # failed, after reporting how long each one took.
+    workers = int(os.environ.get('SF_CLONE_CONCURRENCY', len(repos) or 1))
+    timings = {}
+    failed = {}
+
+    def timed(repo):
+        start = time.monotonic()
+        try:
+            task(repo, *args)
+        except Exception as e:
+            failed[repo] = e
+        timings[repo] = time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(timed, repos))
+
+    for repo in repos:
+        log('%s: %s in %.1f seconds'
+            % (repo, 'failed' if repo in failed else 'done', timings[repo]))
+    for repo, e in failed.items():
+        log('%s: %s' % (repo, e))
+    return failed
 
 
 def main():
-    # Ensure we have a checkout of all repositories
-    for repo in REPOS:
-        repo_path = os.path.join(os.environ['GITHUB_WORKSPACE'], repo)
-        if not os.path.exists(repo_path):
-            repo = git.Repo.clone_from(REPOS[repo]['github'], repo_path)
+    repos = load_repos()
 
     # Determine if the primary repository has any dependent PRs. We use formatted
     # comments in the git commit message like this:
-    #     Depends on https://github.com/shakenfist/$project/
-    primary_repo_path = os.path.join(
-        os.environ['GITHUB_WORKSPACE'], os.environ['SF_PRIMARY_REPO'])
+    #     Depends on https://github.com/shakenfist/$project/pull/$number
+    primary_repo_name = os.environ['SF_PRIMARY_REPO']
+    primary_repo_path = repo_path(primary_repo_name)
     print('Primary repo path: %s' % primary_repo_path)
+    ensure_clone(primary_repo_name, repos)
     primary_repo = git.Repo(primary_repo_path)
 
     if len(sys.argv) > 1:
@@ -53,14 +356,13 @@ def main():
         primary_base_reference = os.environ.get('GITHUB_BASE_REF')
 
     print('Run with arguments: %s' % sys.argv)
-    print('Primary repo: %s' % os.environ['SF_PRIMARY_REPO'])
+    print('Primary repo: %s' % primary_repo_name)
     print('Primary commit: %s' % os.environ['SF_HEAD_SHA'])
     print('Primary base reference: %s' % primary_base_reference)
     print('Github event name: %s' % os.environ.get('GITHUB_EVENT_NAME'))
 
     primary_commit_sha = os.environ['SF_HEAD_SHA']
     primary_commit = primary_repo.commit(primary_commit_sha)
-    handled_repos = [os.environ['SF_PRIMARY_REPO']]
 
     if not primary_base_reference:
         print('No github provided base ref, using the current branch')
@@ -69,45 +371,23 @@ def main():
 
     # We looks for depends on syntax, but only for PRs. Otherwise we just
     # make sure that we have matching branches ("develop", "v0.6-releases", etc).
+    start = time.monotonic()
+    dependencies = {}
     if os.environ.get('GITHUB_EVENT_NAME') in ['pull_request', 'push']:
-        for line in primary_commit.message.split('\n'):
-            line = line.lstrip(' ')
-            if line.startswith('Depends on '):
-                m = DEPENDS_RE.match(line)
-                if m:
-                    print('Depends on detected: %s' % line)
-                    dep_repo_name = m.group(1)
-                    dep_pr = m.group(2)
-
-                    handled_repos.append(dep_repo_name)
-                    dep_repo_path = os.path.join(
-                        os.environ['GITHUB_WORKSPACE'], dep_repo_name)
-                    dep_git = git.Git(dep_repo_path)
-
-                    dep_git.execute(['git', 'fetch', 'origin',
-                                     '%s/head:dependson' % dep_pr])
-                    dep_git.execute(['git', 'checkout', 'dependson'])
-
-    # Then for any repo which hasn't been handled, we should use the base
-    # reference
-    for repo in REPOS:
-        if repo in handled_repos:
-            continue
-
-        dep_repo_path = os.path.join(
-            os.environ['GITHUB_WORKSPACE'], repo)
-        dep_git = git.Git(dep_repo_path)
-
-        print('Checking out the %s branch for repo %s'
-              % (primary_base_reference, repo))
-        try:
-            dep_git.execute(['git', 'checkout', primary_base_reference])
-        except Exception as e:
-            print('Failed to checkout %s on %s: %s'
-                  % (primary_base_reference, repo, e))
-            print('...will use repository default branch')
+        dependencies = resolve_dependencies(
+            primary_repo_name, primary_commit, repos)
+
+    # Then set up every other repository at once. Those without a dependent
+    # PR use the base reference.
+    other_repos = [repo for repo in repos if repo != primary_repo_name]
+    other_repos.extend(repo for repo in dependencies if repo not in repos)
+    failed = run_concurrently(
+        setup_repo, other_repos, repos, dependencies, primary_base_reference)
+    if failed:
+        print('Failed to set up: %s' % ', '.join(sorted(failed)))
+        sys.exit(1)
 
-    print('Done')
+    print('Done in %.1f seconds' % (time.monotonic() - start))
 
 
 if __name__ == '__main__':
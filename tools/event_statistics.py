@@ -7,8 +7,11 @@ import sys
 from shakenfist import eventlog
 from shakenfist.config import config
 
+import buffer
+
 
 if __name__ == '__main__':
+    buffer.install()
     failures = 0
 
     event_path = os.path.join(config.STORAGE_PATH, 'events')
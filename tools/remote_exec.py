@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Run commands on CI nodes over persistent, multiplexed SSH connections.
+#
+# Each node gets one SSH master connection (ControlMaster), started in the
+# background the first time the node is used and kept alive for the rest of
+# the job (ControlPersist). Every later command, from this process or any
+# other run of this script in the same job, opens a channel on that
+# connection instead of doing a fresh TCP and SSH handshake.
+#
+# A command can be run on many nodes at once: each node's output is captured
+# and printed as a block once it finishes, and the exit status is non-zero if
+# any node failed. With --copy, the script named as the command is copied to
+# each node first, to a path named by a hash of its content, so an unchanged
+# script is only copied to a node once however many times it is run.
+#
+# Master sockets live in a control directory keyed by the GitHub Actions job,
+# so a later job on the same runner never reuses a master to a node which has
+# since been replaced, even if the new node has the same address.
+#
+# Usage:
+#     remote_exec.py [options] HOST[,HOST...] COMMAND [ARGS...]
+#     remote_exec.py --close HOST[,HOST...]
+#
+# The command and its arguments are joined with spaces and run by the remote
+# user's shell, exactly as ssh does. "localhost" and this machine's own
+# hostname run the command locally instead. tools/run_remote is a wrapper
+# around this script which keeps its older interface.
+import argparse
+import concurrent.futures
+import hashlib
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+
+DEFAULT_USER = 'debian'
+DEFAULT_KEY = '/srv/github/id_ci'
+DEFAULT_CONTROL_PERSIST = 1800
+
+# Where copied scripts are kept on each node
+REMOTE_SCRIPT_DIR = '/tmp/sf-remote-scripts'
+
+SSH_BASE_ARGS = [
+    '-o', 'StrictHostKeyChecking=no',
+    '-o', 'UserKnownHostsFile=/dev/null',
+    '-o', 'LogLevel=ERROR',
+    '-o', 'BatchMode=yes',
+    # A master to a node which has gone away exits instead of hanging
+    '-o', 'ServerAliveInterval=15',
+    '-o', 'ServerAliveCountMax=3',
+]
+
+# Environment variables which together identify one GitHub Actions job
+JOB_ENVIRONMENT = ('GITHUB_RUN_ID', 'GITHUB_RUN_ATTEMPT', 'GITHUB_JOB',
+                   'RUNNER_NAME')
+
+
+def default_control_dir():
+    """Return the directory for master sockets.
+
+    Socket paths are limited to about a hundred characters, so this is kept
+    short. It is per user so runners sharing a machine do not collide, and
+    per job, from a hash of the job's GitHub environment, so that masters
+    left behind by an earlier job are never used.
+    """
+    if 'SF_SSH_CONTROL_DIR' in os.environ:
+        return os.environ['SF_SSH_CONTROL_DIR']
+    control_dir = '/tmp/sf-ssh-%d' % os.getuid()
+    if os.environ.get('GITHUB_RUN_ID'):
+        job = '/'.join(os.environ.get(name, '') for name in JOB_ENVIRONMENT)
+        control_dir += '-' + hashlib.sha256(job.encode()).hexdigest()[:12]
+    return control_dir
+
+
+class Result(object):
+    """The outcome of running a command on one host."""
+
+    def __init__(self, host, returncode, stdout, stderr, duration):
+        self.host = host
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+class RemoteExecutor(object):
+    """Run commands on hosts over one multiplexed SSH connection per host."""
+
+    def __init__(self, user=DEFAULT_USER, key=DEFAULT_KEY, control_dir=None,
+                 control_persist=DEFAULT_CONTROL_PERSIST, extra_args=None):
+        self.user = user
+        self.key = key
+        # Further ssh options, such as an inventory's ansible_ssh_common_args
+        # (which may carry a ProxyCommand through a jump host)
+        self.extra_args = shlex.split(extra_args or '')
+        self.control_dir = control_dir or default_control_dir()
+        self.control_persist = control_persist
+        self.local_names = {'localhost', socket.gethostname()}
+
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+
+    def _host_lock(self, host):
+        with self._locks_lock:
+            return self._locks.setdefault(host, threading.Lock())
+
+    def is_local(self, host):
+        return host in self.local_names
+
+    def ssh_args(self, host, master='no'):
+        """Return the ssh command line for a host, up to the remote command.
+
+        Commands never become the master themselves (ControlMaster=no): a
+        master started by a command whose output is being captured would keep
+        the output pipes open, and the command would appear to hang until the
+        master exited. Without a master they simply connect directly.
+        """
+        return (['ssh', '-i', self.key] + SSH_BASE_ARGS + self.extra_args
+                + ['-o', 'ControlMaster=%s' % master,
+                   '-o', 'ControlPath=%s' % os.path.join(
+                       self.control_dir, '%C'),
+                   '%s@%s' % (self.user, host)])
+
+    def connect(self, host):
+        """Make sure a master connection to host is running.
+
+        The master is started with -f, so this returns once it has
+        authenticated and gone into the background. If it cannot be started
+        (for example another process won the race to start it), commands
+        use whichever master exists, or connect directly.
+        """
+        if self.is_local(host):
+            return
+        with self._host_lock(host):
+            check = subprocess.run(
+                self.ssh_args(host)[:-1]
+                + ['-O', 'check', '%s@%s' % (self.user, host)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL)
+            if check.returncode == 0:
+                return
+            subprocess.run(
+                self.ssh_args(host, master='yes')[:-1]
+                + ['-o', 'ControlPersist=%d' % self.control_persist,
+                   '-f', '-N', '%s@%s' % (self.user, host)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL)
+
+    def close(self, host):
+        """Stop the master connection to host, if there is one."""
+        if self.is_local(host):
+            return
+        subprocess.run(
+            self.ssh_args(host)[:-1]
+            + ['-O', 'exit', '%s@%s' % (self.user, host)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+
+    def run(self, host, command, stdin=None, capture=True, timeout=None):
+        """Run command (a list of words) on host, returning a Result.
+
+        stdin is bytes to send to the command, or None for no input. When
+        capture is False the command's output goes straight to this
+        process's stdout and stderr, and its stdin is inherited unless stdin
+        is given.
+        """
+        if self.is_local(host):
+            args = ['sh', '-c', ' '.join(command)]
+        else:
+            self.connect(host)
+            args = self.ssh_args(host) + list(command)
+
+        kwargs = {}
+        if stdin is not None:
+            kwargs['input'] = stdin
+        elif capture:
+            kwargs['stdin'] = subprocess.DEVNULL
+
+        start = time.monotonic()
+        try:
+            completed = subprocess.run(
+                args, **kwargs,
+                stdout=subprocess.PIPE if capture else None,
+                stderr=subprocess.PIPE if capture else None,
+                timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            return Result(host, -1, e.stdout or b'',
+                          (e.stderr or b'') + b'Timed out\n',
+                          time.monotonic() - start)
+        return Result(host, completed.returncode, completed.stdout or b'',
+                      completed.stderr or b'', time.monotonic() - start)
+
+    def run_many(self, hosts, command, stdin=None, parallel=None,
+                 timeout=None):
+        """Run command on every host at once, returning Results by host."""
+        results = {}
+        workers = parallel or len(hosts) or 1
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.run, host, command, stdin=stdin,
+                                timeout=timeout): host
+                for host in hosts}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
+
+    def copy_script(self, host, path):
+        """Copy a local script to host, returning its path there.
+
+        The remote path includes a hash of the script's content, so it is
+        only copied if that content is not already on the node. Checking
+        for it is a single command over the node's master connection. That
+        is always done, rather than remembering copies locally, as a
+        replaced node may reuse an address.
+        """
+        if self.is_local(host):
+            return path
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        remote_path = '%s/%s-%s' % (REMOTE_SCRIPT_DIR, digest,
+                                    os.path.basename(path))
+        present = self.run(host, ['test', '-x', remote_path])
+        if not present.ok:
+            copied = self.run(
+                host,
+                ["sh -c 'mkdir -p %s && cat > %s.tmp && chmod 755 %s.tmp && "
+                 "mv %s.tmp %s'" % (REMOTE_SCRIPT_DIR, remote_path,
+                                    remote_path, remote_path, remote_path)],
+                stdin=content)
+            if not copied.ok:
+                raise IOError('Failed to copy %s to %s: %s'
+                              % (path, host,
+                                 copied.stderr.decode(errors='replace')))
+        return remote_path
+
+
+def print_result(result):
+    """Print one host's captured output as a block."""
+    sys.stdout.write('===== %s: exit %d in %.1f seconds =====\n'
+                     % (result.host, result.returncode, result.duration))
+    sys.stdout.flush()
+    sys.stdout.buffer.write(result.stdout)
+    if result.stderr:
+        sys.stdout.write('----- %s: stderr -----\n' % result.host)
+        sys.stdout.flush()
+        sys.stdout.buffer.write(result.stderr)
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run a command on CI nodes over multiplexed SSH.')
+    parser.add_argument('--user', default=os.environ.get('baseuser',
+                                                         DEFAULT_USER),
+                        help='Remote user (default: $baseuser, or '
+                             '%s).' % DEFAULT_USER)
+    parser.add_argument('--key', default=DEFAULT_KEY,
+                        help='SSH private key (default: %(default)s).')
+    parser.add_argument('--control-dir', default=default_control_dir(),
+                        help='Directory for master connection sockets '
+                             '(default: $SF_SSH_CONTROL_DIR, or '
+                             '%(default)s).')
+    parser.add_argument('--control-persist', type=int,
+                        default=DEFAULT_CONTROL_PERSIST,
+                        help='Seconds an idle master connection is kept '
+                             '(default: %(default)s).')
+    parser.add_argument('--copy', action='store_true',
+                        help='Copy the script named as the command to each '
+                             'host before running it.')
+    parser.add_argument('--stdin',
+                        help='File to send to the command as its input. A '
+                             'single host otherwise inherits this process\'s '
+                             'input; several hosts get none.')
+    parser.add_argument('--parallel', type=int,
+                        help='Maximum number of hosts to run on at once '
+                             '(default: all of them).')
+    parser.add_argument('--timeout', type=float,
+                        help='Seconds to allow the command on each host.')
+    parser.add_argument('--output-dir',
+                        help='Also write each host\'s output to '
+                             '<host>.stdout and <host>.stderr here.')
+    parser.add_argument('--close', action='store_true',
+                        help='Stop the master connections to the hosts '
+                             'instead of running a command.')
+    parser.add_argument('hosts',
+                        help='Host, or comma separated hosts, to run on.')
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='The command and its arguments.')
+    args = parser.parse_args()
+
+    hosts = [host for host in args.hosts.split(',') if host]
+    executor = RemoteExecutor(
+        user=args.user, key=args.key, control_dir=args.control_dir,
+        control_persist=args.control_persist)
+
+    if args.close:
+        for host in hosts:
+            executor.close(host)
+        return
+    if not args.command:
+        parser.error('No command given.')
+
+    stdin = None
+    if args.stdin:
+        with open(args.stdin, 'rb') as f:
+            stdin = f.read()
+
+    # Copy scripts to every host up front, concurrently
+    commands = {host: list(args.command) for host in hosts}
+    if args.copy:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=args.parallel or len(hosts)) as pool:
+            remote_paths = dict(zip(hosts, pool.map(
+                lambda host: executor.copy_script(host, args.command[0]),
+                hosts)))
+        for host in hosts:
+            commands[host][0] = remote_paths[host]
+
+    # A single host streams its output as it is produced, like ssh does
+    if len(hosts) == 1 and not args.output_dir:
+        host = hosts[0]
+        sys.stderr.write('Executing %s on %s\n'
+                         % (' '.join(commands[host]), host))
+        result = executor.run(host, commands[host], stdin=stdin,
+                              capture=False, timeout=args.timeout)
+        sys.exit(result.returncode if result.returncode >= 0 else 1)
+
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=args.parallel or len(hosts)) as pool:
+        futures = {
+            pool.submit(executor.run, host, commands[host], stdin=stdin,
+                        timeout=args.timeout): host
+            for host in hosts}
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results[result.host] = result
+            print_result(result)
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+                for stream in ('stdout', 'stderr'):
+                    with open(os.path.join(args.output_dir, '%s.%s'
+                                           % (result.host, stream)),
+                              'wb') as f:
+                        f.write(getattr(result, stream))
+
+    failed = sorted(host for host, result in results.items() if not result.ok)
+    if failed:
+        sys.stderr.write('Failed on: %s\n' % ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
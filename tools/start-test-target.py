@@ -29,6 +29,8 @@ import time
 import ovirtsdk4 as sdk
 import ovirtsdk4.types as types
 
+import buffer
+
 
 DEFAULT_WAIT_MINS = 30
 DEFAULT_TEMPLATE_NAME = 'smoke-test'
@@ -828,6 +830,7 @@ def create_and_start_vm(system_service, vm_name, template_name, cluster_name, me
 
 
 def main():
+    buffer.install()
     args = parse_args()
     vm_name = args.vm_name or f'smoke-test-{random.randint(0, 9999):04d}'
     timeout_secs = args.timeout_mins * 60
@@ -37,6 +37,29 @@ Per-directory `order.yml`:
     every `.md` file is navigable, sorted alphabetically by title, and
     every subdirectory containing markdown is recursed into.
 
+Multi-component mode:
+    Use --manifest to sync several components in one run. The manifest is
+    a YAML list of {name, source, dest} mappings; components are synced in
+    parallel worker processes and every nav snippet is substituted into
+    the template in a single pass. A component whose source directory is
+    missing is skipped with a warning, and its placeholder is removed.
+
+    sync_component_docs.py --manifest components.yml \\
+        --template mkdocs.yml.tmpl --output mkdocs.yml
+
+Logging:
+    Log output is buffered and written once at the end of the run. By
+    default it holds a per-component summary (files copied and skipped,
+    links rewritten) plus any warnings. --verbose adds a line per copied
+    file and rewritten link; --quiet only keeps warnings.
+
+Link validation:
+    Every relative link between synced pages is checked against an index
+    of the published pages and their heading anchors, and each dangling
+    link or anchor is reported as a warning. With --fail-on-broken-links
+    the script exits non-zero when any are found, so the docs job fails
+    before the much slower mkdocs site build.
+
 Template substitution:
     Use --template and --output to substitute placeholders in a template file.
     The placeholder %%<component_name>%% will be replaced with the nav snippet.
@@ -46,16 +69,112 @@ Template substitution:
 """
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 import filecmp
+import functools
+import os
 import re
 import shutil
 import sys
+import unicodedata
 from pathlib import Path
+from pathlib import PurePosixPath
 
 import yaml
 
+import buffer
+
+
+# Matches markdown links to relative .md targets: ](path.md) or
+# ](path.md#anchor). Captures the path (including .md) and any anchor.
+# Excludes links that start with http://, https://, or /. Compiled once at
+# import so every file, and every component in --manifest mode, shares it.
+LINK_RE = re.compile(r'\]\((?!https?://)(?!/)([^)#]+\.md)(#[^)]*)?\)')
+
+# Same-page anchor links: ](#anchor).
+ANCHOR_LINK_RE = re.compile(r'\]\(#([^)]+)\)')
+
+# ATX headings, and the explicit ids that attr_list and raw HTML can set.
+HEADING_RE = re.compile(r'^#{1,6}\s+(.*?)\s*$')
+# The underline of a setext heading, and lines which cannot be the heading
+# text above one (list items, block quotes and tables)
+SETEXT_UNDERLINE_RE = re.compile(r'^ {0,3}(?:=+|-+)\s*$')
+NOT_SETEXT_TEXT_RE = re.compile(r'^\s*(?:[-*+>|]|\d+[.)])(?:\s|$)')
+HEADING_ATTR_ID_RE = re.compile(r'\s*\{[^}]*#([^\s}]+)[^}]*\}\s*$')
+HTML_ID_RE = re.compile(r'<[^>]*\b(?:id|name)=["\']([^"\']+)["\']')
+INLINE_LINK_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+
+
+class SyncLog:
+    """Buffered log output and counters for a doc sync.
+
+    Printing several lines per file and per rewritten link made output cost
+    scale with the size of the docs, and writes to a GitHub Actions log are
+    slow (see tools/buffer.py). Messages are instead collected in memory
+    alongside counters and written out in one go by flush(). Warnings are
+    always kept, info needs the default level, and detail is only recorded
+    with --verbose.
+    """
+
+    QUIET = 0
+    NORMAL = 1
+    VERBOSE = 2
+
+    def __init__(self, level: int = NORMAL):
+        self.level = level
+        self.lines: list[str] = []
+        self.files_copied = 0
+        self.files_skipped = 0
+        self.links_rewritten = 0
+        self.broken_links = 0
+
+    @property
+    def verbose(self) -> bool:
+        return self.level >= self.VERBOSE
+
+    def warning(self, message: str) -> None:
+        self.lines.append(f'Warning: {message}')
+
+    def info(self, message: str) -> None:
+        if self.level >= self.NORMAL:
+            self.lines.append(message)
+
+    def detail(self, message: str) -> None:
+        if self.level >= self.VERBOSE:
+            self.lines.append(message)
+
+    def summarise(self, label: str) -> None:
+        """Record a one line summary of the counters."""
+        self.info(
+            f'{label}: copied {self.files_copied} file(s), skipped '
+            f'{self.files_skipped}, rewrote {self.links_rewritten} link(s), '
+            f'found {self.broken_links} broken link(s)'
+        )
 
-def parse_order_file(order_path: Path) -> list[tuple[str, str]] | None:
+    def merge(self, other: 'SyncLog') -> None:
+        """Append another log's messages and add its counters to ours."""
+        self.lines.extend(other.lines)
+        self.files_copied += other.files_copied
+        self.files_skipped += other.files_skipped
+        self.links_rewritten += other.links_rewritten
+        self.broken_links += other.broken_links
+
+    def getvalue(self) -> str:
+        return ''.join(f'{line}\n' for line in self.lines)
+
+    def flush(self, stream=None) -> None:
+        """Write all buffered messages with a single write."""
+        if not self.lines:
+            return
+        stream = stream or sys.stdout
+        stream.write(self.getvalue())
+        stream.flush()
+        self.lines = []
+
+
+def parse_order_file(
+    order_path: Path, log: SyncLog
+) -> list[tuple[str, str]] | None:
     """Parse an order.yml file to get ordered list of files and titles.
 
     The order.yml format is a list of single-key dictionaries:
@@ -82,7 +201,7 @@ def parse_order_file(order_path: Path) -> list[tuple[str, str]] | None:
 
         data = yaml.safe_load(filtered_content)
         if not isinstance(data, list):
-            print(f'Warning: order.yml is not a list, ignoring')
+            log.warning(f'{order_path} is not a list, ignoring')
             return None
 
         result = []
@@ -91,16 +210,17 @@ def parse_order_file(order_path: Path) -> list[tuple[str, str]] | None:
                 filename, title = next(iter(item.items()))
                 result.append((filename, title))
             else:
-                print(f'Warning: Invalid entry in order.yml: {item}')
+                log.warning(f'Invalid entry in {order_path}: {item}')
 
         return result
     except yaml.YAMLError as e:
-        print(f'Warning: Failed to parse order.yml: {e}')
+        log.warning(f'Failed to parse {order_path}: {e}')
         return None
 
 
 def update_markdown_links(
-    content: str, component_name: str, file_rel_path: Path | None = None
+    content: str, component_name: str, file_rel_path: Path | None = None,
+    log: SyncLog | None = None,
 ) -> str:
     """Update internal markdown links to work in the new location.
 
@@ -115,68 +235,255 @@ def update_markdown_links(
         component_name: The component name for link rewriting
         file_rel_path: The file's path relative to the docs root (e.g.,
             Path('qcow2/qcow2-format.md')). Used to resolve relative links.
+        log: Optional SyncLog which counts rewritten links and, when
+            verbose, records each rewrite.
 
     Only updates links to .md files that don't already have an absolute path
     or external URL.
     """
-    # Pattern matches markdown links: ](path.md) or ](path.md#anchor)
-    # Captures the path before .md and any anchor
-    # Excludes links that start with http://, https://, or /
-    pattern = r'\]\((?!https?://)(?!/)([^)#]+\.md)(#[^)]*)?\)'
-
     # Determine the directory containing the current file
     if file_rel_path is not None:
-        file_dir = file_rel_path.parent
+        file_dir = file_rel_path.parent.as_posix()
     else:
-        file_dir = Path('.')
+        file_dir = '.'
 
     def replace_link(match: re.Match) -> str:
         path = match.group(1)
         anchor = match.group(2) or ''
-        print(f'            link fixup for path {path} with anchor {anchor}')
-
-        # Resolve the link relative to the file's directory
-        # This handles cases like '../index.md' from a subdirectory
-        link_path = Path(path)
-        if file_dir != Path('.'):
-            # Get the path relative to what would be the docs root
-            # We need to work with string manipulation since we don't have
-            # the actual filesystem paths here
-            resolved_parts = (file_dir / link_path).parts
-            # Normalize by removing . and resolving ..
-            normalized_parts = []
-            for part in resolved_parts:
-                if part == '.':
-                    continue
-                elif part == '..':
-                    if normalized_parts:
-                        normalized_parts.pop()
-                else:
-                    normalized_parts.append(part)
-            path = '/'.join(normalized_parts) if normalized_parts else path
+        new_path = f'/components/{component_name}/{resolve_link_path(file_dir, path)}'
+        replacement = f']({new_path}{anchor})'
+
+        if log is not None:
+            log.links_rewritten += 1
+            if log.verbose:
+                log.detail(f'        {path}{anchor} became {replacement}')
+        return replacement
+
+    return LINK_RE.sub(replace_link, content)
+
+
+def resolve_link_path(file_dir: str, path: str) -> str:
+    """Resolve a relative .md link target to a docs-root relative page path.
+
+    The target is normalised by normalise_link_path and its trailing '.md'
+    is turned into '/' because pages pretend to be directories for reasons.
+    """
+    path = normalise_link_path(file_dir, path)
+
+    # Pages pretend to be directories for reasons
+    if path.endswith('.md'):
+        path = path.replace('.md', '/')
+    return path
+
+
+@functools.lru_cache(maxsize=4096)
+def normalise_link_path(file_dir: str, path: str) -> str:
+    """Normalise a relative .md link target against the docs root.
+
+    `file_dir` is the POSIX path of the linking file's directory relative to
+    the docs root ('.' for the root itself). Links from subdirectories are
+    resolved against that directory (so '../index.md' works), while links
+    from the root only have a leading './' removed.
+
+    The result only depends on its arguments, so it is cached: the same
+    handful of targets are linked from many pages.
+    """
+    if file_dir != '.':
+        # Normalize by removing . and resolving .. without ever climbing
+        # above the docs root. We work on strings since we don't have the
+        # actual filesystem paths here.
+        normalized_parts: list[str] = []
+        for part in PurePosixPath(file_dir, path).parts:
+            if part == '.':
+                continue
+            elif part == '..':
+                if normalized_parts:
+                    normalized_parts.pop()
+            else:
+                normalized_parts.append(part)
+        if normalized_parts:
+            path = '/'.join(normalized_parts)
+    elif path.startswith('./'):
+        path = path[2:]
+    return path
+
+
+def slugify_heading(text: str) -> str:
+    """Turn heading text into an anchor the way mkdocs' toc extension does.
+
+    Inline links are reduced to their text first, since the anchor is
+    generated from the rendered heading rather than the markdown source.
+    """
+    text = INLINE_LINK_RE.sub(r'\1', text)
+    text = unicodedata.normalize('NFKD', text)
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[^\w\s-]', '', text).strip().lower()
+    return re.sub(r'[-\s]+', '-', text)
+
+
+def unfenced_lines(content: str):
+    """Yield (line number, line) for every line outside fenced code blocks."""
+    in_fence = False
+    for lineno, line in enumerate(content.split('\n'), 1):
+        stripped = line.strip()
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            in_fence = not in_fence
+            continue
+        if not in_fence:
+            yield lineno, line
+
+
+def extract_anchors(content: str) -> set[str]:
+    """Return every anchor a markdown page defines.
+
+    Covers ATX and setext heading anchors (including the _1, _2 ... suffixes
+    mkdocs adds to repeated headings), explicit attr_list ids and HTML id /
+    name attributes. Headings inside fenced code blocks are ignored.
+    """
+    anchors: set[str] = set()
+    previous: str | None = None
+    previous_lineno = 0
+    for lineno, line in unfenced_lines(content):
+        anchors.update(HTML_ID_RE.findall(line))
+
+        m = HEADING_RE.match(line)
+        if m:
+            text = m.group(1).rstrip('#').rstrip()
+        elif (previous and previous_lineno == lineno - 1
+                and SETEXT_UNDERLINE_RE.match(line)):
+            text = previous.strip()
         else:
-            # Remove leading ./ if present
-            if path.startswith('./'):
-                path = path[2:]
+            if line.strip() and not NOT_SETEXT_TEXT_RE.match(line):
+                previous, previous_lineno = line, lineno
+            else:
+                previous = None
+            continue
+        previous = None
 
-        # Pages pretend to be directories for reasons
-        if path.endswith('.md'):
-            path = path.replace('.md', '/')
+        attr = HEADING_ATTR_ID_RE.search(text)
+        if attr:
+            anchors.add(attr.group(1))
+            continue
 
-        # Build the new absolute path
-        new_path = f'/components/{component_name}/{path}'
-        replacement = f']({new_path}{anchor})'
+        slug = slugify_heading(text)
+        unique = slug
+        suffix = 0
+        while unique in anchors:
+            suffix += 1
+            unique = f'{slug}_{suffix}'
+        anchors.add(unique)
+    return anchors
 
-        print(f'            became {replacement}')
-        return replacement
 
-    return re.sub(pattern, replace_link, content)
+class DocFile:
+    """A markdown file found while indexing a docs tree.
+
+    The content is read once, when the tree is indexed, and the title and
+    heading anchors are extracted from it on first use.
+    """
+
+    def __init__(self, rel_path: PurePosixPath, content: str):
+        self.rel_path = rel_path
+        self.content = content
+        self._title: str | None = None
+        self._anchors: set[str] | None = None
+
+    @property
+    def title(self) -> str:
+        if self._title is None:
+            self._title = extract_title(self.content, self.rel_path.stem)
+        return self._title
+
+    @property
+    def anchors(self) -> set[str]:
+        if self._anchors is None:
+            self._anchors = extract_anchors(self.content)
+        return self._anchors
+
+
+class DocDir:
+    """A directory found while indexing a docs tree.
+
+    `order` is the parsed `order.yml` (or None), `files` maps basenames of
+    the markdown files directly in this directory to their DocFile, and
+    `has_markdown` records whether any markdown exists in this subtree.
+    """
+
+    def __init__(
+        self, rel_path: PurePosixPath,
+        order: list[tuple[str, str]] | None, has_order_file: bool,
+    ):
+        self.rel_path = rel_path
+        self.order = order
+        self.has_order_file = has_order_file
+        self.files: dict[str, DocFile] = {}
+        self.subdirs: list[str] = []
+        self.has_markdown = False
+
+
+class DocIndex:
+    """An in-memory index of a component's docs tree.
+
+    Built by index_docs in a single walk and then shared by
+    copy_all_markdown, build_nav_tree and link validation, so each
+    directory is listed and each file read exactly once per sync.
+    """
+
+    ROOT = PurePosixPath('.')
+
+    def __init__(self, source_dir: Path):
+        self.source_dir = source_dir
+        self.dirs: dict[PurePosixPath, DocDir] = {}
+        self.files: dict[PurePosixPath, DocFile] = {}
+
+    @property
+    def root(self) -> DocDir:
+        return self.dirs[self.ROOT]
+
+
+def index_docs(source_dir: Path, log: SyncLog) -> DocIndex:
+    """Walk source_dir once and return a DocIndex of its markdown.
+
+    The walk is bottom up, so a directory's `has_markdown` can be derived
+    from its own files and its already indexed children without searching
+    the subtree again.
+    """
+    index = DocIndex(source_dir)
+    for dirpath, dirnames, filenames in os.walk(source_dir, topdown=False):
+        abs_dir = Path(dirpath)
+        rel_dir = PurePosixPath(abs_dir.relative_to(source_dir).as_posix())
+
+        has_order_file = 'order.yml' in filenames
+        order = None
+        if has_order_file:
+            order = parse_order_file(abs_dir / 'order.yml', log)
+
+        doc_dir = DocDir(rel_dir, order, has_order_file)
+        for filename in sorted(filenames):
+            if not filename.endswith('.md'):
+                continue
+            rel_path = rel_dir / filename
+            content = (abs_dir / filename).read_text(encoding='utf-8')
+            doc_file = DocFile(rel_path, content)
+            doc_dir.files[filename] = doc_file
+            index.files[rel_path] = doc_file
+
+        doc_dir.subdirs = sorted(
+            name for name in dirnames if rel_dir / name in index.dirs
+        )
+        doc_dir.has_markdown = bool(doc_dir.files) or any(
+            index.dirs[rel_dir / name].has_markdown
+            for name in doc_dir.subdirs
+        )
+        index.dirs[rel_dir] = doc_dir
+
+    return index
 
 
 def copy_all_markdown(
-    component_name: str, source_dir: Path, dest_dir: Path
-) -> None:
-    """Copy markdown files under source_dir to dest_dir.
+    component_name: str, index: DocIndex, dest_dir: Path, log: SyncLog
+) -> set[PurePosixPath]:
+    """Copy the indexed markdown files to dest_dir.
 
     A root-level `order.yml` (`source_dir/order.yml`) is treated as a
     strict allowlist for root-level files: only `index.md` and files
@@ -190,47 +497,95 @@ def copy_all_markdown(
     regardless of whether the target appears in the nav.
 
     The subdirectory structure is preserved and internal markdown links
-    are rewritten via update_markdown_links.
+    are rewritten via update_markdown_links. Returns the set of docs-root
+    relative paths which were copied.
     """
     if dest_dir.exists():
         shutil.rmtree(dest_dir)
     dest_dir.mkdir(parents=True, exist_ok=True)
 
-    root_order = parse_order_file(source_dir / 'order.yml')
+    root_order = index.root.order
     root_allowlist: set[str] | None = None
     if root_order is not None:
         root_allowlist = {filename for filename, _ in root_order}
         root_allowlist.add('index.md')
 
-    for source_file in sorted(source_dir.rglob('*.md')):
-        rel_path = source_file.relative_to(source_dir)
-
+    copied: set[PurePosixPath] = set()
+    for rel_path in sorted(index.files):
         if (
             len(rel_path.parts) == 1
             and root_allowlist is not None
             and rel_path.name not in root_allowlist
         ):
-            print(
+            log.files_skipped += 1
+            log.detail(
                 f'Skipping (not in root order.yml allowlist): {rel_path}'
             )
             continue
 
         dest_file = dest_dir / rel_path
 
-        print('... Processing source file')
-        print(f'        From {source_file}')
-        print(f'        To {dest_file}')
+        log.detail(f'... {index.source_dir / rel_path} -> {dest_file}')
 
         dest_file.parent.mkdir(parents=True, exist_ok=True)
-        content = source_file.read_text(encoding='utf-8')
-        updated = update_markdown_links(content, component_name, rel_path)
+        updated = update_markdown_links(
+            index.files[rel_path].content, component_name, rel_path, log
+        )
         dest_file.write_text(updated, encoding='utf-8')
+        log.files_copied += 1
+        copied.add(rel_path)
+
+    return copied
+
+
+def validate_links(
+    index: DocIndex, published: set[PurePosixPath], log: SyncLog
+) -> int:
+    """Report links between published pages that will not resolve.
+
+    Every relative .md link in a published page must point at another
+    published page and, when it carries an anchor, at an anchor that page
+    defines. Same-page anchor links are checked too, and links inside fenced
+    code blocks are not. Each page is scanned once and targets are looked up
+    in the index, so the pass is linear in the total size of the docs.
+    Problems are logged as warnings and the number found is returned.
+    """
+    broken = 0
+    for rel_path in sorted(published):
+        doc_file = index.files[rel_path]
+        file_dir = rel_path.parent.as_posix()
+        for lineno, line in unfenced_lines(doc_file.content):
+            for m in LINK_RE.finditer(line):
+                path, anchor = m.group(1), m.group(2)
+                target = PurePosixPath(normalise_link_path(file_dir, path))
+                if target not in published:
+                    log.warning(
+                        f'{rel_path}:{lineno}: link to missing page {path}'
+                    )
+                    broken += 1
+                elif anchor and anchor[1:] not in index.files[target].anchors:
+                    log.warning(
+                        f'{rel_path}:{lineno}: link to missing anchor '
+                        f'{path}{anchor}'
+                    )
+                    broken += 1
+
+            for m in ANCHOR_LINK_RE.finditer(line):
+                if m.group(1) not in doc_file.anchors:
+                    log.warning(
+                        f'{rel_path}:{lineno}: link to missing anchor '
+                        f'#{m.group(1)}'
+                    )
+                    broken += 1
+
+    log.broken_links += broken
+    return broken
 
 
 def build_nav_tree(
-    source_dir: Path, current_rel: Path | None = None
+    index: DocIndex, log: SyncLog, current_rel: PurePosixPath | None = None
 ) -> dict:
-    """Build a nav tree for current_rel relative to source_dir.
+    """Build a nav tree for current_rel from the docs index.
 
     A directory's `order.yml` is a strict whitelist for that directory's
     nav: files not listed are hidden, and subdirectories are recursed
@@ -247,20 +602,24 @@ def build_nav_tree(
         }
     """
     if current_rel is None:
-        current_rel = Path('.')
-    abs_dir = source_dir / current_rel
-    order_entries = parse_order_file(abs_dir / 'order.yml')
+        current_rel = DocIndex.ROOT
+    doc_dir = index.dirs[current_rel]
+    order_entries = doc_dir.order
 
     index_entry: tuple[str, str] | None = None
     files: list[tuple[str, str]] = []
 
     if order_entries is not None:
         for filename, title in order_entries:
-            target = abs_dir / filename
-            if not target.exists():
-                print(
-                    f'Warning: order.yml entry not found, skipping: '
-                    f'{target}'
+            # Entries are normally markdown files in this directory, which
+            # are indexed. Anything else falls back to the filesystem.
+            target = index.source_dir / current_rel / filename
+            if (
+                current_rel / filename not in index.files
+                and not target.exists()
+            ):
+                log.warning(
+                    f'order.yml entry not found, skipping: {target}'
                 )
                 continue
             if filename == 'index.md':
@@ -268,30 +627,25 @@ def build_nav_tree(
             else:
                 files.append((filename, title))
     else:
-        for md in sorted(abs_dir.glob('*.md')):
-            content = md.read_text(encoding='utf-8')
-            title = extract_title(content, md.stem)
-            if md.name == 'index.md':
-                index_entry = (md.name, title)
+        for filename, doc_file in doc_dir.files.items():
+            if filename == 'index.md':
+                index_entry = (filename, doc_file.title)
             else:
-                files.append((md.name, title))
+                files.append((filename, doc_file.title))
         files.sort(key=lambda x: x[1].lower())
 
     subdirs: dict[str, dict] = {}
-    for child in sorted(abs_dir.iterdir()):
-        if not child.is_dir():
-            continue
-        if not any(child.rglob('*.md')):
+    for name in doc_dir.subdirs:
+        child = index.dirs[current_rel / name]
+        if not child.has_markdown:
             continue
         # When the current directory has an order.yml, only recurse into
         # subdirectories that also declare their own ordering. Without
         # an opt-in, an order.yml-controlled directory acts as a strict
         # whitelist for its nav.
-        if order_entries is not None and not (child / 'order.yml').exists():
+        if order_entries is not None and not child.has_order_file:
             continue
-        subdirs[child.name] = build_nav_tree(
-            source_dir, current_rel / child.name
-        )
+        subdirs[name] = build_nav_tree(index, log, child.rel_path)
 
     return {
         'index': index_entry,
@@ -391,7 +745,9 @@ def _emit_dir(
         )
 
 
-def copy_license_if_different(source_dir: Path, dest_dir: Path) -> bool:
+def copy_license_if_different(
+    source_dir: Path, dest_dir: Path, log: SyncLog
+) -> bool:
     """Copy the component's LICENSE file if it differs from the main repo.
 
     The source LICENSE is expected in the parent of source_dir (since source_dir
@@ -401,6 +757,7 @@ def copy_license_if_different(source_dir: Path, dest_dir: Path) -> bool:
     Args:
         source_dir: Source directory containing the component docs
         dest_dir: Destination directory in shakenfist docs
+        log: SyncLog to record the outcome in
 
     Returns:
         True if a license was copied, False otherwise.
@@ -408,7 +765,7 @@ def copy_license_if_different(source_dir: Path, dest_dir: Path) -> bool:
     # Source LICENSE is in the component's root (parent of docs directory)
     source_license = source_dir.parent / 'LICENSE'
     if not source_license.exists():
-        print('No LICENSE file found in component repository')
+        log.info('No LICENSE file found in component repository')
         return False
 
     # Main repo LICENSE: dest_dir is like .../shakenfist/docs/components/foo
@@ -426,41 +783,173 @@ def copy_license_if_different(source_dir: Path, dest_dir: Path) -> bool:
             break
 
     if main_license is None:
-        print('Warning: Could not find main repo LICENSE file')
+        log.warning('Could not find main repo LICENSE file')
         # Still copy the component license
         dest_license = dest_dir / 'LICENSE'
         shutil.copy2(source_license, dest_license)
-        print(f'Copied component LICENSE to {dest_license}')
+        log.info(f'Copied component LICENSE to {dest_license}')
         return True
 
     # Compare licenses
     if filecmp.cmp(source_license, main_license, shallow=False):
-        print('Component LICENSE matches main repo, not copying')
+        log.info('Component LICENSE matches main repo, not copying')
         return False
 
     # Licenses differ, copy the component license
     dest_license = dest_dir / 'LICENSE'
     shutil.copy2(source_license, dest_license)
-    print(f'Component LICENSE differs from main repo, copied to {dest_license}')
+    log.info(f'Component LICENSE differs from main repo, copied to {dest_license}')
     return True
 
 
+def read_display_name_override(source_dir: Path, log: SyncLog) -> str | None:
+    """Return the title from the component's `component.yml`, if any."""
+    component_yml_path = source_dir / 'component.yml'
+    if not component_yml_path.exists():
+        return None
+
+    try:
+        component_data = yaml.safe_load(
+            component_yml_path.read_text(encoding='utf-8')
+        )
+    except yaml.YAMLError as e:
+        log.warning(f'Failed to parse component.yml: {e}')
+        return None
+
+    if isinstance(component_data, dict):
+        title = component_data.get('title')
+        if title:
+            log.info(f'Using title from component.yml: {title}')
+            return title
+    return None
+
+
+def sync_component(
+    component_name: str, source_dir: Path, dest_dir: Path, log: SyncLog,
+    indent: int = 8,
+) -> str:
+    """Sync one component's docs into dest_dir and return its nav snippet."""
+    display_name_override = read_display_name_override(source_dir, log)
+
+    # Index the docs tree once, copy every markdown file (so cross-links
+    # resolve), check that those cross-links really do resolve, then build
+    # the nav tree from per-directory order.yml files.
+    index = index_docs(source_dir, log)
+    published = copy_all_markdown(component_name, index, dest_dir, log)
+    validate_links(index, published, log)
+    nav_tree = build_nav_tree(index, log)
+
+    # Copy component LICENSE if it differs from main repo
+    copy_license_if_different(source_dir, dest_dir, log)
+
+    log.summarise(component_name)
+    return generate_nav_snippet(
+        component_name, nav_tree, indent,
+        display_name_override=display_name_override,
+    )
+
+
+def _sync_component_worker(
+    component_name: str, source_dir: Path, dest_dir: Path, level: int,
+    indent: int,
+) -> tuple[str, SyncLog]:
+    """Run sync_component in a pool worker with a log of its own.
+
+    Workers run concurrently, so their logs are returned to the parent
+    and merged there in manifest order instead of interleaving.
+    """
+    log = SyncLog(level)
+    nav_snippet = sync_component(
+        component_name, source_dir, dest_dir, log, indent
+    )
+    return nav_snippet, log
+
+
+def load_manifest(manifest_path: Path) -> list[tuple[str, Path, Path]]:
+    """Load a component manifest for --manifest mode.
+
+    The manifest is a YAML list of mappings, one per component, in the
+    order the components should be synced:
+        - name: kerbside
+          source: /workspace/kerbside/docs
+          dest: /workspace/shakenfist/docs/components/kerbside
+
+    Relative source and dest paths are resolved against the directory
+    containing the manifest. Returns a list of (name, source, dest)
+    tuples, or raises ValueError if the manifest is malformed.
+    """
+    try:
+        data = yaml.safe_load(manifest_path.read_text(encoding='utf-8'))
+    except yaml.YAMLError as e:
+        raise ValueError(f'Failed to parse manifest: {e}')
+
+    if not isinstance(data, list) or not data:
+        raise ValueError('Manifest must be a non-empty list of components')
+
+    base_dir = manifest_path.parent
+    components = []
+    seen = set()
+    for entry in data:
+        if (
+            not isinstance(entry, dict)
+            or not all(entry.get(key) for key in ('name', 'source', 'dest'))
+        ):
+            raise ValueError(
+                f'Manifest entries need name, source and dest: {entry}'
+            )
+        name = str(entry['name'])
+        if name in seen:
+            raise ValueError(f'Component listed twice in manifest: {name}')
+        seen.add(name)
+        components.append(
+            (name, base_dir / entry['source'], base_dir / entry['dest'])
+        )
+    return components
+
+
+def substitute_placeholders(
+    template_content: str, nav_snippets: dict[str, str]
+) -> str:
+    """Replace every %%<component_name>%% placeholder in a single pass."""
+    if not nav_snippets:
+        return template_content
+    pattern = re.compile(
+        '%%(' + '|'.join(re.escape(name) for name in nav_snippets) + ')%%'
+    )
+    return pattern.sub(lambda m: nav_snippets[m.group(1)], template_content)
+
+
 def main():
+    buffer.install()
     parser = argparse.ArgumentParser(
         description='Sync component documentation into shakenfist docs'
     )
     parser.add_argument(
         'component_name',
+        nargs='?',
         help='Name of the component (e.g., kerbside, clingwrap)'
     )
     parser.add_argument(
         'source_dir',
+        nargs='?',
         help='Source directory containing the component docs'
     )
     parser.add_argument(
         'dest_dir',
+        nargs='?',
         help='Destination directory in shakenfist docs'
     )
+    parser.add_argument(
+        '--manifest',
+        help='YAML manifest of components to sync in parallel, instead of '
+             'a single component_name / source_dir / dest_dir'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='Number of worker processes for --manifest (default: CPU count)'
+    )
     parser.add_argument(
         '--indent',
         type=int,
@@ -475,61 +964,72 @@ def main():
         '--output',
         help='Output file for template substitution (requires --template)'
     )
+    parser.add_argument(
+        '--fail-on-broken-links',
+        action='store_true',
+        help='Exit non-zero if any page links to a missing page or anchor'
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        '--verbose',
+        action='store_true',
+        help='Log every copied file and rewritten link'
+    )
+    verbosity.add_argument(
+        '--quiet',
+        action='store_true',
+        help='Only log warnings'
+    )
 
     args = parser.parse_args()
 
-    source_dir = Path(args.source_dir)
-    dest_dir = Path(args.dest_dir)
-
-    if not source_dir.exists():
-        print(f'Error: Source directory does not exist: {source_dir}',
-              file=sys.stderr)
+    positionals = (args.component_name, args.source_dir, args.dest_dir)
+    if args.manifest:
+        if any(positionals):
+            print('Error: --manifest cannot be combined with a component '
+                  'name, source or destination', file=sys.stderr)
+            sys.exit(1)
+        try:
+            components = load_manifest(Path(args.manifest))
+        except (OSError, ValueError) as e:
+            print(f'Error: {e}', file=sys.stderr)
+            sys.exit(1)
+    elif all(positionals):
+        components = [
+            (args.component_name, Path(args.source_dir), Path(args.dest_dir))
+        ]
+    else:
+        print('Error: component_name, source_dir and dest_dir are required '
+              'unless --manifest is used', file=sys.stderr)
         sys.exit(1)
 
-    if not source_dir.is_dir():
-        print(f'Error: Source is not a directory: {source_dir}',
-              file=sys.stderr)
-        sys.exit(1)
+    # A manifest component without docs is skipped, and its placeholder
+    # removed from the template, so the other components still sync. A
+    # single component without docs is an error.
+    available = []
+    skipped = []
+    for name, source_dir, dest_dir in components:
+        if not source_dir.exists():
+            problem = f'Source directory does not exist: {source_dir}'
+        elif not source_dir.is_dir():
+            problem = f'Source is not a directory: {source_dir}'
+        else:
+            available.append((name, source_dir, dest_dir))
+            continue
+
+        if not args.manifest:
+            print(f'Error: {problem}', file=sys.stderr)
+            sys.exit(1)
+        print(f'Warning: Skipping {name}: {problem}', file=sys.stderr)
+        skipped.append(name)
+    components = available
 
     # Validate template/output args
     if args.output and not args.template:
         print('Error: --output requires --template', file=sys.stderr)
         sys.exit(1)
 
-    # Check for component.yml to override display name
-    display_name_override = None
-    component_yml_path = source_dir / 'component.yml'
-    if component_yml_path.exists():
-        try:
-            component_data = yaml.safe_load(
-                component_yml_path.read_text(encoding='utf-8')
-            )
-            if isinstance(component_data, dict):
-                title = component_data.get('title')
-                if title:
-                    display_name_override = title
-                    print(
-                        f'Using title from component.yml:'
-                        f' {display_name_override}'
-                    )
-        except yaml.YAMLError as e:
-            print(f'Warning: Failed to parse component.yml: {e}')
-
-    # Copy every markdown file (so cross-links resolve), then build the
-    # nav tree from per-directory order.yml files.
-    copy_all_markdown(args.component_name, source_dir, dest_dir)
-    nav_tree = build_nav_tree(source_dir)
-
-    # Copy component LICENSE if it differs from main repo
-    copy_license_if_different(source_dir, dest_dir)
-
-    # Generate the nav snippet
-    nav_snippet = generate_nav_snippet(
-        args.component_name, nav_tree, args.indent,
-        display_name_override=display_name_override,
-    )
-
-    # Handle template substitution or plain output
+    template_path = None
     if args.template:
         template_path = Path(args.template)
         if not template_path.exists():
@@ -537,18 +1037,59 @@ def main():
                   file=sys.stderr)
             sys.exit(1)
 
+    if args.verbose:
+        level = SyncLog.VERBOSE
+    elif args.quiet:
+        level = SyncLog.QUIET
+    else:
+        level = SyncLog.NORMAL
+    log = SyncLog(level)
+
+    nav_snippets: dict[str, str] = {name: '' for name in skipped}
+    if args.manifest:
+        # Components are independent, so sync them concurrently. Each one
+        # logs into its own SyncLog, merged here in manifest order.
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {
+                name: executor.submit(
+                    _sync_component_worker, name, source_dir, dest_dir,
+                    level, args.indent,
+                )
+                for name, source_dir, dest_dir in components
+            }
+            for name, future in futures.items():
+                nav_snippets[name], component_log = future.result()
+                log.info(f'=== {name} ===')
+                log.merge(component_log)
+        log.summarise(f'Total for {len(components)} components')
+    else:
+        name, source_dir, dest_dir = components[0]
+        nav_snippets[name] = sync_component(
+            name, source_dir, dest_dir, log, args.indent
+        )
+
+    # Handle template substitution or plain output
+    if template_path is not None:
         template_content = template_path.read_text(encoding='utf-8')
-        placeholder = f'%%{args.component_name}%%'
-        result = template_content.replace(placeholder, nav_snippet)
+        result = substitute_placeholders(template_content, nav_snippets)
 
         if args.output:
             output_path = Path(args.output)
             output_path.write_text(result, encoding='utf-8')
-            print(f'Wrote {output_path}')
+            log.info(f'Wrote {output_path}')
+            log.flush()
         else:
+            log.flush()
             print(result)
     else:
-        print(nav_snippet)
+        log.flush()
+        for nav_snippet in nav_snippets.values():
+            print(nav_snippet)
+
+    if args.fail_on_broken_links and log.broken_links:
+        print(f'Error: Found {log.broken_links} broken link(s)',
+              file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Copyright 2019 Michael Still and contributors
+#
+# Tests for remote_exec.py. Run with:
+#     python3 -m unittest discover -s tools -p 'test_*.py'
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import remote_exec
+
+
+class FakeSsh(object):
+    """Stand in for ssh, tracking masters the way ControlPath=%C does.
+
+    %C hashes the user as well as the host, so a master started for
+    user@host is only found by control commands which name user@host too.
+    """
+
+    def __init__(self):
+        self.masters = set()
+        self.spawned = 0
+
+    def __call__(self, args, **kwargs):
+        destination = args[-1]
+        returncode = 0
+        if '-O' in args:
+            operation = args[args.index('-O') + 1]
+            if operation == 'check':
+                returncode = 0 if destination in self.masters else 255
+            elif operation == 'exit':
+                if destination in self.masters:
+                    self.masters.remove(destination)
+                else:
+                    returncode = 255
+        elif 'ControlMaster=yes' in args:
+            self.masters.add(destination)
+            self.spawned += 1
+        return subprocess.CompletedProcess(args, returncode)
+
+
+class RemoteExecutorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.executor = remote_exec.RemoteExecutor(
+            user='debian', control_dir=self.tmp.name)
+        self.ssh = FakeSsh()
+        patcher = mock.patch('remote_exec.subprocess.run', self.ssh)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_connect_twice_spawns_one_master(self):
+        self.executor.connect('10.0.0.1')
+        self.executor.connect('10.0.0.1')
+        self.assertEqual(1, self.ssh.spawned)
+
+    def test_close_stops_master(self):
+        self.executor.connect('10.0.0.1')
+        self.executor.close('10.0.0.1')
+        self.assertEqual(set(), self.ssh.masters)
+
+    def test_localhost_needs_no_master(self):
+        self.executor.connect('localhost')
+        self.assertEqual(0, self.ssh.spawned)
+
+
+if __name__ == '__main__':
+    unittest.main()